@@ -18,13 +18,20 @@ import { BACKEND_URL } from "../constants/config";
 
 type Movimiento = {
   id: number;
-  tipo: "acumulado" | "canjeado";
+  tipo: "acumulado" | "canjeado" | "vencido";
   puntos: number;
   descripcion?: string | null;
   referencia?: string | null;
   fecha: string; // ISO
 };
 
+type HistorialPagina = {
+  items: Movimiento[];
+  next_cursor: string | null;
+};
+
+const PAGE_SIZE = 30;
+
 export default function HistorialScreen() {
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
@@ -32,14 +39,19 @@ export default function HistorialScreen() {
   const [nombre, setNombre] = useState("");
   const [correo, setCorreo] = useState("");
   const [clienteId, setClienteId] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
+  // Primera página (montaje / pull-to-refresh)
   const fetchHistorial = useCallback(async () => {
     if (!clienteId) return;
     try {
-      const { data } = await axios.get<Movimiento[]>(
-        `${BACKEND_URL}/movimientos/historial/${clienteId}`
+      const { data } = await axios.get<HistorialPagina>(
+        `${BACKEND_URL}/movimientos/historial/${clienteId}/paginado`,
+        { params: { limit: PAGE_SIZE } }
       );
-      setItems(data);
+      setItems(data.items);
+      setNextCursor(data.next_cursor);
     } catch (err: any) {
       const status = err?.response?.status;
       const detail = err?.response?.data?.detail;
@@ -71,6 +83,24 @@ export default function HistorialScreen() {
     })();
   }, []);
 
+  // Siguientes páginas al llegar al final de la lista
+  const fetchMore = useCallback(async () => {
+    if (!clienteId || !nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const { data } = await axios.get<HistorialPagina>(
+        `${BACKEND_URL}/movimientos/historial/${clienteId}/paginado`,
+        { params: { limit: PAGE_SIZE, cursor: nextCursor } }
+      );
+      setItems((prev) => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch {
+      // se reintenta en el siguiente onEndReached
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [clienteId, nextCursor, loadingMore]);
+
   useEffect(() => {
     if (clienteId) fetchHistorial();
   }, [clienteId, fetchHistorial]);
@@ -92,7 +122,7 @@ export default function HistorialScreen() {
         />
         <View style={{ flex: 1 }}>
           <Text style={styles.rowTitle}>
-            {isAcc ? "Acumulado" : "Canjeado"} · {isAcc ? "+" : "-"}
+            {isAcc ? "Acumulado" : item.tipo === "vencido" ? "Vencido" : "Canjeado"} · {isAcc ? "+" : "-"}
             {item.puntos} pts
           </Text>
           <Text style={styles.rowSub}>
@@ -146,6 +176,11 @@ export default function HistorialScreen() {
               refreshControl={
                 <RefreshControl refreshing={refreshing} onRefresh={onRefresh} />
               }
+              onEndReached={fetchMore}
+              onEndReachedThreshold={0.5}
+              ListFooterComponent={
+                loadingMore ? <ActivityIndicator style={{ marginVertical: 8 }} /> : null
+              }
               contentContainerStyle={{ paddingTop: 4, paddingBottom: 10 }}
               showsVerticalScrollIndicator={false}
             />
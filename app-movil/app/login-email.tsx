@@ -43,6 +43,7 @@ export default function LoginEmail() {
         ["@cliente_id", String(data.id_cliente)],
         ["@cliente_correo", data.correo],
         ["@cliente_nombre", data.nombre],
+        ["@token", data.access_token],
       ]);
       router.replace("/");
     } catch (err: any) {
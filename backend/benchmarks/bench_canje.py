@@ -0,0 +1,226 @@
+# benchmarks/bench_canje.py
+"""
+Canjes por segundo con contención y verificación de que ningún saldo queda
+negativo.
+
+N hilos (cajeros), cada uno con su sesión, canjean en paralelo contra un
+conjunto chico de clientes (--clientes) para forzar choques sobre la misma
+fila de saldo. Se intenta canjear bastante más de lo disponible: los rechazos
+por saldo son esperados; lo que no puede pasar es que el disponible quede < 0
+ni que difiera de lo que dicen los movimientos.
+
+    python -m benchmarks.bench_canje --url mysql+mysqlconnector://... --hilos 16
+    python -m benchmarks.bench_canje            # sqlite temporal
+
+Sin --url se usa un sqlite temporal (sirve para validar la lógica; sqlite
+serializa las escrituras de toda la BD, el número útil sale de MySQL). Con
+--url el esquema ya debe existir (alembic upgrade head). Reporta una línea JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.database arma las URLs de MySQL al importarse; con puerto vacío create_engine
+# falla. Los benchmarks no las usan: cada uno crea su engine con --url.
+for _var in ("DB_PORT", "MOVING_PORT"):
+    os.environ.setdefault(_var, "3306")
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import create_engine, event, func, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+import models  # noqa: E402,F401  (registra todas las tablas en Base)
+from db.database import Base  # noqa: E402
+from models.clientes import Cliente  # noqa: E402
+from models.movimientos_puntos import MovimientoPuntos  # noqa: E402
+from models.saldos_clientes import SaldoCliente  # noqa: E402
+from schemas.movimientos_puntos import CanjearRequest  # noqa: E402
+from services.movimientos_service import canjear_puntos, recalcular_saldos  # noqa: E402
+
+
+def sembrar_clientes(db: Session, n: int, saldo: int, prefijo: str = "bench-canje") -> List[int]:
+    """Crea `n` clientes con un acumulado de `saldo` puntos. Devuelve sus ids."""
+    marca = f"{prefijo}-{time.time_ns()}"
+    ids = []
+    for i in range(n):
+        cli = Cliente(nombre=f"Bench {i}", correo=f"{marca}-{i}@example.com")
+        db.add(cli)
+        db.flush()
+        ids.append(cli.id_cliente)
+    db.execute(insert(MovimientoPuntos), [
+        {"id_cliente": cid, "tipo": "acumulado", "puntos": saldo, "referencia": f"{marca}-SEED"}
+        for cid in ids
+    ])
+    db.commit()
+    recalcular_saldos(db, ids)
+    return ids
+
+
+def verificar_saldos(db: Session, ids: Iterable[int]) -> Dict[str, int]:
+    """
+    Compara saldos_clientes con la suma de movimientos. Devuelve el mínimo
+    disponible y cuántos clientes no cuadran (debe ser 0).
+    """
+    ids = list(ids)
+    m = MovimientoPuntos
+    db.rollback()
+    saldos = dict(db.execute(
+        select(SaldoCliente.id_cliente, SaldoCliente.disponible).where(SaldoCliente.id_cliente.in_(ids))
+    ).all())
+    por_tipo: Dict[int, Dict[str, int]] = {}
+    for cid, tipo, total in db.execute(
+        select(m.id_cliente, m.tipo, func.sum(m.puntos)).where(m.id_cliente.in_(ids)).group_by(m.id_cliente, m.tipo)
+    ):
+        por_tipo.setdefault(cid, {})[tipo] = int(total)
+    descuadres = 0
+    for cid in ids:
+        t = por_tipo.get(cid, {})
+        esperado = t.get("acumulado", 0) - t.get("canjeado", 0) - t.get("vencido", 0)
+        if int(saldos.get(cid, 0)) != esperado or esperado < 0:
+            descuadres += 1
+    return {
+        "min_disponible": min((int(v) for v in saldos.values()), default=0),
+        "descuadres": descuadres,
+    }
+
+
+def correr_estres(
+    session_factory: Callable[[], Session],
+    ids: List[int],
+    *,
+    hilos: int = 8,
+    intentos: int = 50,
+    puntos: int = 7,
+) -> Dict[str, float]:
+    """
+    Cada hilo hace `intentos` canjes de `puntos`, rotando entre los clientes.
+    Un hilo extra muestrea el mínimo disponible mientras corre la prueba.
+    """
+    barrera = threading.Barrier(hilos + 1)
+    lock = threading.Lock()
+    cont = {"ok": 0, "rechazados": 0, "bloqueos": 0}
+    min_visto = [None]
+    terminado = threading.Event()
+
+    def cajero(n: int) -> None:
+        db = session_factory()
+        locales = {"ok": 0, "rechazados": 0, "bloqueos": 0}
+        try:
+            barrera.wait()
+            for i in range(intentos):
+                cid = ids[(n + i) % len(ids)]
+                try:
+                    canjear_puntos(db, CanjearRequest(id_cliente=cid, puntos=puntos, referencia=f"T{n}-{i}"))
+                    locales["ok"] += 1
+                except HTTPException as e:
+                    if e.status_code != 400:
+                        raise
+                    locales["rechazados"] += 1
+                except OperationalError:
+                    # Timeout de lock / deadlock: la caja reintenta; aquí solo se cuenta
+                    db.rollback()
+                    locales["bloqueos"] += 1
+        finally:
+            db.close()
+            with lock:
+                for k, v in locales.items():
+                    cont[k] += v
+
+    def muestreo() -> None:
+        db = session_factory()
+        try:
+            while not terminado.is_set():
+                v = db.scalar(select(func.min(SaldoCliente.disponible)).where(SaldoCliente.id_cliente.in_(ids)))
+                db.rollback()
+                if v is not None and (min_visto[0] is None or v < min_visto[0]):
+                    min_visto[0] = int(v)
+                time.sleep(0.005)
+        finally:
+            db.close()
+
+    trabajadores = [threading.Thread(target=cajero, args=(n,)) for n in range(hilos)]
+    monitor = threading.Thread(target=muestreo)
+    for t in trabajadores:
+        t.start()
+    monitor.start()
+    barrera.wait()
+    t0 = time.perf_counter()
+    for t in trabajadores:
+        t.join()
+    segundos = time.perf_counter() - t0
+    terminado.set()
+    monitor.join()
+
+    total = hilos * intentos
+    return {
+        "hilos": hilos,
+        "clientes": len(ids),
+        "intentos": total,
+        "canjes_ok": cont["ok"],
+        "rechazados_saldo": cont["rechazados"],
+        "bloqueos": cont["bloqueos"],
+        "segundos": round(segundos, 3),
+        "canjes_por_seg": round(cont["ok"] / segundos, 1) if segundos else 0.0,
+        "intentos_por_seg": round(total / segundos, 1) if segundos else 0.0,
+        "min_disponible_visto": min_visto[0],
+    }
+
+
+def _sqlite_inmediato(engine) -> None:
+    # pysqlite abre la transacción tarde; BEGIN IMMEDIATE evita el deadlock
+    # SHARED -> RESERVED entre escritores (receta de la documentación de SQLAlchemy)
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _rec):
+        dbapi_conn.isolation_level = None
+        dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def crear_engine_estres(url: str):
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+        _sqlite_inmediato(engine)
+        return engine
+    return create_engine(url, pool_size=64, max_overflow=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="URL SQLAlchemy (default: sqlite temporal)")
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--clientes", type=int, default=4, help="clientes en disputa")
+    parser.add_argument("--saldo", type=int, default=1000, help="puntos iniciales por cliente")
+    parser.add_argument("--intentos", type=int, default=200, help="canjes por hilo")
+    parser.add_argument("--puntos", type=int, default=7, help="puntos por canje")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_canje.db')}"
+    engine = crear_engine_estres(url)
+    if args.url is None:
+        Base.metadata.create_all(engine)
+    Fabrica = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    with Fabrica() as db:
+        ids = sembrar_clientes(db, args.clientes, args.saldo)
+    r = correr_estres(Fabrica, ids, hilos=args.hilos, intentos=args.intentos, puntos=args.puntos)
+    with Fabrica() as db:
+        r.update(verificar_saldos(db, ids))
+    print(json.dumps(r))
+    engine.dispose()
+    if r["descuadres"] or r["min_disponible"] < 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# benchmarks/bench_endpoints.py
+"""
+Latencia y throughput de los endpoints calientes, en proceso (ASGI, sin red).
+
+Escenarios:
+  acumular_qr   POST /caja/acumular-qr           (referencia única por petición)
+  canjear_qr    POST /caja/canjear-qr            (1 punto, clientes con saldo)
+  escaneo       GET  /caja/escaneo               (opcional: identidad + saldo + máximo canjeable)
+  resumen       GET  /movimientos/resumen/{id}
+  historial     GET  /movimientos/historial/{id}/paginado   (primera página)
+  historial_completo GET /movimientos/historial/{id}  (opcional: sin límite)
+  login         POST /app/login                  (bcrypt con BCRYPT_ROUNDS)
+
+Los clientes se eligen con el mismo sesgo que generar_datos (los "pesados"
+reciben más tráfico). Cada escenario corre --peticiones (o --duracion seg) con
+--concurrencia tareas sobre httpx.AsyncClient + ASGITransport y el app real,
+con get_session apuntando a --url. Por escenario sale una línea JSON con
+p50/p95/p99/max (ms), rps, códigos HTTP y el commit, para comparar entre
+commits con --comparar:
+
+    python -m benchmarks.generar_datos --url sqlite:///bench.db --clientes 20000 --movimientos 2000000
+    python -m benchmarks.bench_endpoints --url sqlite:///bench.db --concurrencia 16 --salida base.jsonl
+    git checkout otra-rama
+    python -m benchmarks.bench_endpoints --url sqlite:///bench.db --concurrencia 16 --comparar base.jsonl
+
+Ojo: acumular_qr y canjear_qr escriben en la BD; usa una copia de los datos.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.database arma las URLs de MySQL al importarse; con puerto vacío create_engine
+# falla. Los benchmarks no las usan: cada uno crea su engine con --url.
+for _var in ("DB_PORT", "MOVING_PORT"):
+    os.environ.setdefault(_var, "3306")
+
+import httpx  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from benchmarks.generar_datos import BENCH_PASSWORD, cliente_sesgado, crear_engine_carga  # noqa: E402
+from db.database import get_session  # noqa: E402
+from models.clientes import Cliente  # noqa: E402
+from models.saldos_clientes import SaldoCliente  # noqa: E402
+
+ESCENARIOS_DEFAULT = ("acumular_qr", "canjear_qr", "resumen", "historial", "login")
+
+Escenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+# -----------------------------
+# Datos de la corrida
+# -----------------------------
+class Muestra:
+    """Ids y correos de la BD contra los que se generan las peticiones."""
+
+    def __init__(self, db: Session, sesgo: float, max_login: int = 1000):
+        self.sesgo = sesgo
+        self.ids: List[int] = list(db.scalars(select(SaldoCliente.id_cliente).order_by(SaldoCliente.id_cliente)))
+        # canjear_qr canjea 1 punto: con 100 de saldo aguanta una corrida larga
+        self.con_saldo: List[int] = list(db.scalars(
+            select(SaldoCliente.id_cliente)
+            .where(SaldoCliente.disponible >= 100)
+            .order_by(SaldoCliente.id_cliente)
+        ))
+        self.correos: List[str] = list(db.scalars(
+            select(Cliente.correo)
+            .where(Cliente.password_hash.is_not(None), Cliente.correo.like("bench-%"))
+            .limit(max_login)
+        ))
+        if not self.ids:
+            raise SystemExit("La BD no tiene saldos: corre antes benchmarks.generar_datos")
+
+    def cliente(self, rnd: random.Random) -> int:
+        return cliente_sesgado(rnd, self.ids, self.sesgo)
+
+    def cliente_con_saldo(self, rnd: random.Random) -> int:
+        return cliente_sesgado(rnd, self.con_saldo or self.ids, self.sesgo)
+
+
+def escenarios(m: Muestra) -> Dict[str, Escenario]:
+    sucursal = "BENCH"
+
+    async def acumular_qr(c, rnd):
+        return await c.post("/caja/acumular-qr", json={
+            "qr_data": f"CLI:{m.cliente(rnd)}",
+            "puntos": rnd.randint(1, 200),
+            "referencia": f"BQ-{uuid.uuid4().hex[:20]}",
+            "id_sucursal": sucursal,
+        })
+
+    async def canjear_qr(c, rnd):
+        return await c.post("/caja/canjear-qr", json={
+            "qr_data": f"CLI:{m.cliente_con_saldo(rnd)}",
+            "importe": "50.00",
+            "puntos": 1,
+            "referencia": f"BC-{uuid.uuid4().hex[:20]}",
+            "id_sucursal": sucursal,
+        })
+
+    async def escaneo(c, rnd):
+        return await c.get("/caja/escaneo", params={"qr_data": f"CLI:{m.cliente(rnd)}", "importe": "350.00"})
+
+    async def resumen(c, rnd):
+        return await c.get(f"/movimientos/resumen/{m.cliente(rnd)}")
+
+    async def historial(c, rnd):
+        return await c.get(f"/movimientos/historial/{m.cliente(rnd)}/paginado", params={"limit": 50})
+
+    async def historial_completo(c, rnd):
+        return await c.get(f"/movimientos/historial/{m.cliente(rnd)}")
+
+    async def login(c, rnd):
+        if not m.correos:
+            raise SystemExit("No hay clientes bench con contraseña (generar_datos --con-password)")
+        return await c.post("/app/login", json={"correo": rnd.choice(m.correos), "password": BENCH_PASSWORD})
+
+    return {
+        "acumular_qr": acumular_qr,
+        "canjear_qr": canjear_qr,
+        "escaneo": escaneo,
+        "resumen": resumen,
+        "historial": historial,
+        "historial_completo": historial_completo,
+        "login": login,
+    }
+
+
+# -----------------------------
+# Medición
+# -----------------------------
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+async def medir(
+    cliente: httpx.AsyncClient,
+    escenario: Escenario,
+    *,
+    concurrencia: int,
+    peticiones: int,
+    duracion: Optional[float] = None,
+    semilla: int = 1,
+) -> Dict:
+    """
+    Corre `escenario` con `concurrencia` tareas hasta completar `peticiones`
+    (o hasta `duracion` seg si se indica). Devuelve latencias y códigos.
+    """
+    latencias: List[float] = []
+    codigos: Dict[str, int] = {}
+    restantes = [peticiones]
+    fin = time.perf_counter() + duracion if duracion else None
+
+    async def tarea(n: int) -> None:
+        rnd = random.Random(semilla * 1000 + n)
+        while True:
+            if fin is not None:
+                if time.perf_counter() >= fin:
+                    return
+            else:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+            t = time.perf_counter()
+            r = await escenario(cliente, rnd)
+            latencias.append(time.perf_counter() - t)
+            codigos[str(r.status_code)] = codigos.get(str(r.status_code), 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(tarea(n) for n in range(concurrencia)))
+    segundos = time.perf_counter() - t0
+
+    latencias.sort()
+    ms = [x * 1000 for x in latencias]
+    errores = sum(v for k, v in codigos.items() if k.startswith("5"))
+    return {
+        "peticiones": len(ms),
+        "errores_5xx": errores,
+        "codigos": dict(sorted(codigos.items())),
+        "segundos": round(segundos, 3),
+        "rps": round(len(ms) / segundos, 1) if segundos else 0.0,
+        "p50_ms": round(percentil(ms, 50), 2),
+        "p95_ms": round(percentil(ms, 95), 2),
+        "p99_ms": round(percentil(ms, 99), 2),
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+    }
+
+
+@contextmanager
+def sesiones_de(app, fabrica: sessionmaker):
+    """Apunta get_session del app a `fabrica` mientras dura el bloque."""
+    async def _get_session():
+        db = fabrica()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+    previo = app.dependency_overrides.get(get_session)
+    app.dependency_overrides[get_session] = _get_session
+    try:
+        yield
+    finally:
+        if previo is None:
+            app.dependency_overrides.pop(get_session, None)
+        else:
+            app.dependency_overrides[get_session] = previo
+
+
+def _commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def correr(
+    engine: Engine,
+    nombres: Iterable[str] = ESCENARIOS_DEFAULT,
+    *,
+    concurrencia: int = 8,
+    peticiones: int = 500,
+    duracion: Optional[float] = None,
+    calentamiento: int = 20,
+    sesgo: float = 3.0,
+    semilla: int = 1,
+) -> List[Dict]:
+    """Corre los escenarios en orden y devuelve una fila de resultados por escenario."""
+    from main import app  # importa routers y services solo al correr
+
+    fabrica = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    with fabrica() as db:
+        muestra = Muestra(db, sesgo)
+    disponibles = escenarios(muestra)
+    meta = {
+        "commit": _commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "db": engine.dialect.name,
+        "concurrencia": concurrencia,
+        "clientes": len(muestra.ids),
+    }
+
+    resultados = []
+    transporte = httpx.ASGITransport(app=app)
+    with sesiones_de(app, fabrica):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            for nombre in nombres:
+                esc = disponibles[nombre]
+                if calentamiento:
+                    await medir(cliente, esc, concurrencia=concurrencia, peticiones=calentamiento, semilla=semilla + 7)
+                r = await medir(
+                    cliente, esc,
+                    concurrencia=concurrencia, peticiones=peticiones, duracion=duracion, semilla=semilla,
+                )
+                resultados.append({"escenario": nombre, **meta, **r})
+    return resultados
+
+
+def comparar(base: Iterable[Dict], actual: Iterable[Dict]) -> List[Dict]:
+    """Diferencia relativa (%) de p50/p95/p99 y rps por escenario; negativo en p* es mejora."""
+    previos = {b["escenario"]: b for b in base}
+    salida = []
+    for a in actual:
+        b = previos.get(a["escenario"])
+        if b is None:
+            continue
+        fila = {"escenario": a["escenario"], "base": b.get("commit"), "actual": a.get("commit")}
+        for k in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            fila[f"{k}_delta_pct"] = round((a[k] - b[k]) / b[k] * 100, 1) if b[k] else None
+        salida.append(fila)
+    return salida
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="BD con datos de benchmarks.generar_datos")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS_DEFAULT))
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=500, help="por escenario")
+    parser.add_argument("--duracion", type=float, default=None, help="seg por escenario (ignora --peticiones)")
+    parser.add_argument("--calentamiento", type=int, default=20)
+    parser.add_argument("--sesgo", type=float, default=3.0)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", default=None, help="agrega las líneas JSON a este archivo")
+    parser.add_argument("--comparar", default=None, help="JSONL de una corrida anterior")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # una línea por petición
+    nombres = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    engine = crear_engine_carga(args.url)
+    try:
+        resultados = asyncio.run(correr(
+            engine, nombres,
+            concurrencia=args.concurrencia,
+            peticiones=args.peticiones,
+            duracion=args.duracion,
+            calentamiento=args.calentamiento,
+            sesgo=args.sesgo,
+            semilla=args.semilla,
+        ))
+    finally:
+        engine.dispose()
+
+    base = None
+    if args.comparar:
+        # Se lee antes de escribir: --salida y --comparar pueden ser el mismo archivo
+        with open(args.comparar, encoding="utf-8") as f:
+            base = [json.loads(linea) for linea in f if linea.strip()]
+
+    for r in resultados:
+        print(json.dumps(r))
+    if args.salida:
+        with open(args.salida, "a", encoding="utf-8") as f:
+            for r in resultados:
+                f.write(json.dumps(r) + "\n")
+    if base is not None:
+        for fila in comparar(base, resultados):
+            print(json.dumps({"comparacion": True, **fila}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_historial.py
+"""
+Historial completo de un cliente: ruta ORM + Pydantic contra tuplas + orjson.
+
+  orm     historial_de_cliente (objetos MovimientoPuntos) validados y
+          serializados con List[MovimientoPuntosOut], como hacía FastAPI con
+          el response_model
+  tuplas  historial_filas (solo las columnas de salida) + orjson, lo que hoy
+          sirve GET /movimientos/historial/{id}
+
+Usa el cliente con más movimientos de --url; si no llega a --movimientos, crea
+uno con benchmarks.generar_datos. Cada repetición abre su propia sesión (sin
+identity map caliente). Antes de medir verifica que los dos caminos produzcan
+exactamente los mismos bytes. Sale una línea JSON por camino con
+p50/p95/max (ms), filas y bytes, y una línea final con el speedup:
+
+    python -m benchmarks.bench_historial --url sqlite:///hist.db --movimientos 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.database arma las URLs de MySQL al importarse; con puerto vacío create_engine
+# falla. Los benchmarks no las usan: cada uno crea su engine con --url.
+for _var in ("DB_PORT", "MOVING_PORT"):
+    os.environ.setdefault(_var, "3306")
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from benchmarks.bench_endpoints import percentil  # noqa: E402
+from benchmarks.generar_datos import crear_engine_carga, generar  # noqa: E402
+from models.movimientos_puntos import MovimientoPuntos  # noqa: E402
+from schemas.movimientos_puntos import MovimientoPuntosOut  # noqa: E402
+from services.movimientos_service import historial_de_cliente, historial_filas  # noqa: E402
+
+_HISTORIAL = TypeAdapter(List[MovimientoPuntosOut])
+
+
+def historial_orm(db: Session, id_cliente: int) -> bytes:
+    movs = historial_de_cliente(db, id_cliente)
+    return _HISTORIAL.dump_json(_HISTORIAL.validate_python(movs, from_attributes=True))
+
+
+def historial_tuplas(db: Session, id_cliente: int) -> bytes:
+    return orjson.dumps(historial_filas(db, id_cliente))
+
+
+CAMINOS: Dict[str, Callable[[Session, int], bytes]] = {"orm": historial_orm, "tuplas": historial_tuplas}
+
+
+def cliente_con_historial(engine: Engine, movimientos: int) -> Tuple[int, int]:
+    """(id_cliente, filas) del cliente más pesado; lo crea si no alcanza `movimientos`."""
+    consulta = (
+        select(MovimientoPuntos.id_cliente, func.count())
+        .group_by(MovimientoPuntos.id_cliente)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    with engine.connect() as conn:
+        fila = conn.execute(consulta).first()
+    if fila is None or fila[1] < movimientos:
+        generar(engine, clientes=1, movimientos=movimientos, con_password=0)
+        with engine.connect() as conn:
+            fila = conn.execute(consulta).first()
+    return fila[0], fila[1]
+
+
+def correr(engine: Engine, id_cliente: int, *, repeticiones: int = 20, calentamiento: int = 2) -> List[Dict]:
+    fabrica = sessionmaker(bind=engine, autoflush=False)
+
+    def una(camino: Callable[[Session, int], bytes]) -> Tuple[float, bytes]:
+        db = fabrica()
+        try:
+            t0 = time.perf_counter()
+            cuerpo = camino(db, id_cliente)
+            return time.perf_counter() - t0, cuerpo
+        finally:
+            db.close()
+
+    cuerpos = {nombre: una(camino)[1] for nombre, camino in CAMINOS.items()}
+    if cuerpos["orm"] != cuerpos["tuplas"]:
+        raise SystemExit("Los dos caminos no producen el mismo JSON")
+    filas = len(orjson.loads(cuerpos["tuplas"]))
+
+    resultados = []
+    for nombre, camino in CAMINOS.items():
+        for _ in range(calentamiento):
+            una(camino)
+        tiempos = sorted(una(camino)[0] * 1000.0 for _ in range(repeticiones))
+        resultados.append({
+            "camino": nombre,
+            "filas": filas,
+            "bytes": len(cuerpos[nombre]),
+            "repeticiones": repeticiones,
+            "p50_ms": round(percentil(tiempos, 50), 2),
+            "p95_ms": round(percentil(tiempos, 95), 2),
+            "max_ms": round(tiempos[-1], 2),
+        })
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL SQLAlchemy (sqlite se crea si no existe)")
+    parser.add_argument("--movimientos", type=int, default=10_000, help="filas mínimas del historial")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--calentamiento", type=int, default=2)
+    args = parser.parse_args()
+
+    engine = crear_engine_carga(args.url)
+    try:
+        id_cliente, _ = cliente_con_historial(engine, args.movimientos)
+        resultados = correr(engine, id_cliente, repeticiones=args.repeticiones, calentamiento=args.calentamiento)
+    finally:
+        engine.dispose()
+
+    for r in resultados:
+        print(json.dumps(r))
+    orm, tuplas = (r["p50_ms"] for r in resultados)
+    print(json.dumps({"id_cliente": id_cliente, "speedup_p50": round(orm / tuplas, 2) if tuplas else None}))
+
+
+if __name__ == "__main__":
+    main()
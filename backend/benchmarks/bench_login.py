@@ -0,0 +1,77 @@
+# benchmarks/bench_login.py
+"""
+Logins por segundo por núcleo del pool de hashing de contraseñas.
+
+Mide verificar_async() (bcrypt en el pool acotado), que es el costo dominante
+de /app/login, con N logins concurrentes desde un event loop, igual que los
+reciben los routers. Reporta una línea JSON por configuración de hilos.
+
+    python -m benchmarks.bench_login --rounds 12 --workers 1,2,4 --segundos 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+
+from services.password_hashing import PasswordHasher, _bcrypt_hash  # noqa: E402
+
+
+async def _correr(hasher: PasswordHasher, hashed: str, concurrencia: int, segundos: float) -> dict:
+    fin = time.perf_counter() + segundos
+    ok = rechazados = 0
+
+    async def cliente():
+        nonlocal ok, rechazados
+        while time.perf_counter() < fin:
+            try:
+                assert await hasher.verificar_async("secreto1", hashed)
+                ok += 1
+            except HTTPException:
+                rechazados += 1
+                await asyncio.sleep(0.001)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    return {"ok": ok, "rechazados": rechazados, "segundos": time.perf_counter() - t0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, os.cpu_count() or 1})))
+    parser.add_argument("--concurrencia", type=int, default=0, help="logins simultáneos (default: 2 x workers)")
+    parser.add_argument("--cola", type=int, default=-1, help="PASSWORD_HASH_QUEUE (default: 4 x workers)")
+    parser.add_argument("--segundos", type=float, default=5.0)
+    args = parser.parse_args()
+
+    hashed = _bcrypt_hash("secreto1", args.rounds)
+    for workers in (int(w) for w in args.workers.split(",")):
+        cola = args.cola if args.cola >= 0 else 4 * workers
+        concurrencia = args.concurrencia or 2 * workers
+        hasher = PasswordHasher(workers=workers, cola_max=cola, rounds=args.rounds)
+        try:
+            r = asyncio.run(_correr(hasher, hashed, concurrencia, args.segundos))
+        finally:
+            hasher.cerrar()
+        por_seg = r["ok"] / r["segundos"]
+        print(json.dumps({
+            "bench": "login_bcrypt",
+            "rounds": args.rounds,
+            "workers": workers,
+            "cola_max": cola,
+            "concurrencia": concurrencia,
+            "logins": r["ok"],
+            "rechazados_503": r["rechazados"],
+            "logins_por_seg": round(por_seg, 2),
+            "logins_por_seg_por_nucleo": round(por_seg / min(workers, os.cpu_count() or 1), 2),
+        }))
+
+
+if __name__ == "__main__":
+    main()
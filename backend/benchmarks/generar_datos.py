@@ -0,0 +1,218 @@
+# benchmarks/generar_datos.py
+"""
+Datos sintéticos con volúmenes realistas para los benchmarks de endpoints.
+
+- Clientes con id explícito (a partir del máximo actual), correo
+  bench-<id>@example.com; los primeros --con-password tienen contraseña
+  BENCH_PASSWORD (bcrypt con BCRYPT_ROUNDS) para /app/login.
+- Movimientos en orden cronológico (fecha e id crecen juntos) repartidos con
+  sesgo: cliente = N * u^sesgo, permutado para que los "pesados" no sean
+  solo los ids bajos. Con sesgo 3 el 10 % de los clientes concentra ~46 %.
+- ~85 % acumulados y ~15 % canjes; un canje solo se genera si el saldo
+  corrido del cliente alcanza, así ningún saldo queda negativo.
+- Al final se reconstruye saldos_clientes con recalcular_saldos.
+
+Inserta con executemany en lotes (--lote) y una transacción por lote.
+
+    python -m benchmarks.generar_datos --url sqlite:///bench.db --clientes 200000 --movimientos 20000000
+    python -m benchmarks.generar_datos --url mysql+mysqlconnector://... --clientes 200000
+
+Con sqlite se crea el esquema si falta; con MySQL debe existir (alembic upgrade head).
+El progreso sale por stderr y el resumen como una línea JSON por stdout.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db.database arma las URLs de MySQL al importarse; con puerto vacío create_engine
+# falla. Los benchmarks no las usan: cada uno crea su engine con --url.
+for _var in ("DB_PORT", "MOVING_PORT"):
+    os.environ.setdefault(_var, "3306")
+
+from sqlalchemy import create_engine, event, func, insert, select  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import models  # noqa: E402,F401  (registra todas las tablas en Base)
+from db.database import Base  # noqa: E402
+from models.clientes import Cliente  # noqa: E402
+from models.movimientos_puntos import MovimientoPuntos  # noqa: E402
+from services.movimientos_service import recalcular_saldos  # noqa: E402
+from services.password_hashing import _bcrypt_hash  # noqa: E402
+
+BENCH_PASSWORD = "bench-secreto"
+SUCURSALES = [f"S{n:02d}" for n in range(1, 31)]
+# Primo grande: (rango * _PERMUTA) % n reparte a los clientes "pesados"
+_PERMUTA = 2_654_435_761
+
+
+def correo_bench(id_cliente: int) -> str:
+    return f"bench-{id_cliente}@example.com"
+
+
+def cliente_sesgado(rnd: random.Random, ids: List[int], sesgo: float) -> int:
+    """Elige un id de `ids` con la distribución sesgada del generador."""
+    n = len(ids)
+    rango = min(int(n * rnd.random() ** sesgo), n - 1)
+    return ids[(rango * _PERMUTA) % n]
+
+
+def crear_engine_carga(url: str) -> Engine:
+    if not url.startswith("sqlite"):
+        return create_engine(url)
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _rec):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.close()
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _lotes(filas: Iterator[dict], lote: int) -> Iterator[List[dict]]:
+    buf: List[dict] = []
+    for f in filas:
+        buf.append(f)
+        if len(buf) >= lote:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def generar(
+    engine: Engine,
+    *,
+    clientes: int,
+    movimientos: int,
+    sesgo: float = 3.0,
+    meses: int = 24,
+    con_password: int = 1000,
+    lote: int = 10_000,
+    semilla: int = 42,
+    progreso: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    rnd = random.Random(semilla)
+    t0 = time.perf_counter()
+
+    with engine.connect() as conn:
+        base_id = conn.scalar(select(func.max(Cliente.id_cliente))) or 0
+        base_mov = conn.scalar(select(func.max(MovimientoPuntos.id))) or 0
+    ids = list(range(base_id + 1, base_id + clientes + 1))
+
+    # ---- clientes ----
+    hashed = _bcrypt_hash(BENCH_PASSWORD, int(os.getenv("BCRYPT_ROUNDS", "12")))
+    registro0 = datetime.now() - timedelta(days=30 * meses)
+    filas_cli = (
+        {
+            "id_cliente": cid,
+            "nombre": f"Cliente Bench {cid}",
+            "correo": correo_bench(cid),
+            "telefono": f"55{cid:08d}"[-10:],
+            "password_hash": hashed if i < con_password else None,
+            "fecha_registro": registro0 + timedelta(seconds=i * 30),
+        }
+        for i, cid in enumerate(ids)
+    )
+    for bloque in _lotes(filas_cli, lote):
+        with engine.begin() as conn:
+            conn.execute(insert(Cliente), bloque)
+
+    # ---- movimientos ----
+    saldo: Dict[int, int] = {}
+    inicio = datetime.now() - timedelta(days=30 * meses)
+    paso = timedelta(days=30 * meses) / max(movimientos, 1)
+    cont = {"acumulado": 0, "canjeado": 0}
+
+    def filas_mov() -> Iterator[dict]:
+        for i in range(movimientos):
+            cid = cliente_sesgado(rnd, ids, sesgo)
+            tipo, puntos = "acumulado", rnd.randint(1, 200)
+            if rnd.random() < 0.15 and saldo.get(cid, 0) >= 10:
+                tipo, puntos = "canjeado", rnd.randint(10, min(saldo[cid], 500))
+            saldo[cid] = saldo.get(cid, 0) + (puntos if tipo == "acumulado" else -puntos)
+            cont[tipo] += 1
+            yield {
+                "id": base_mov + i + 1,
+                "id_cliente": cid,
+                "tipo": tipo,
+                "puntos": puntos,
+                "descripcion": None,
+                "referencia": f"BENCH-{base_mov + i + 1}",
+                "id_sucursal": rnd.choice(SUCURSALES),
+                "fecha": inicio + paso * i,
+            }
+
+    hechos = 0
+    for bloque in _lotes(filas_mov(), lote):
+        with engine.begin() as conn:
+            conn.execute(insert(MovimientoPuntos), bloque)
+        hechos += len(bloque)
+        if progreso is not None:
+            progreso({"movimientos": hechos, "segundos": round(time.perf_counter() - t0, 1)})
+
+    saldos = 0
+    with Session(engine) as db:
+        for i in range(0, len(ids), 5000):  # IN acotado por lote
+            saldos += recalcular_saldos(db, ids[i:i + 5000])
+
+    return {
+        "clientes": clientes,
+        "primer_id": ids[0] if ids else None,
+        "movimientos": movimientos,
+        "acumulados": cont["acumulado"],
+        "canjes": cont["canjeado"],
+        "saldos": saldos,
+        "con_password": min(con_password, clientes),
+        "segundos": round(time.perf_counter() - t0, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL SQLAlchemy de la BD destino")
+    parser.add_argument("--clientes", type=int, default=200_000)
+    parser.add_argument("--movimientos", type=int, default=20_000_000)
+    parser.add_argument("--sesgo", type=float, default=3.0, help="1 = uniforme; mayor = más concentrado")
+    parser.add_argument("--meses", type=int, default=24, help="antigüedad de los datos")
+    parser.add_argument("--con-password", type=int, default=1000, help="clientes con contraseña para /app/login")
+    parser.add_argument("--lote", type=int, default=10_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = crear_engine_carga(args.url)
+    ultimo = [0.0]
+
+    def progreso(p: Dict) -> None:
+        if p["segundos"] - ultimo[0] >= 5:
+            ultimo[0] = p["segundos"]
+            print(json.dumps(p), file=sys.stderr, flush=True)
+
+    r = generar(
+        engine,
+        clientes=args.clientes,
+        movimientos=args.movimientos,
+        sesgo=args.sesgo,
+        meses=args.meses,
+        con_password=args.con_password,
+        lote=args.lote,
+        semilla=args.semilla,
+        progreso=progreso,
+    )
+    engine.dispose()
+    print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
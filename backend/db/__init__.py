@@ -1,4 +1,6 @@
 from .database import (
     Base, engine, SessionLocal, get_db,
-    engine_moving, SessionMoving, get_moving_db
+    engine_moving, SessionMoving, get_moving_db,
+    DB_ASYNC, async_engine, AsyncSessionLocal, get_async_db,
+    get_session, run_in_session,
 )
\ No newline at end of file
@@ -1,18 +1,32 @@
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from .pool import (
+    pool_kwargs, instrumentar_pool, InstrumentedQueuePool, InstrumentedAsyncQueuePool,
+)
+from utils.metrics import instrumentar_sql
+from .replicas import DB_REPLICA_ASYNC_URLS, DB_REPLICA_URLS, leer_de_primario, replicas
+
 # ---------------------------
 # Base de datos de lealtad
 # ---------------------------
 LEALTAD_DB_URL = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
-engine = create_engine(LEALTAD_DB_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+# Pool configurable por env (DB_POOL_*) e instrumentado (ver db/pool.py)
+engine = create_engine(LEALTAD_DB_URL, poolclass=InstrumentedQueuePool, **pool_kwargs("DB"))
+instrumentar_pool(engine, "lealtad")
+instrumentar_sql(engine, "lealtad")
+# expire_on_commit=False: tras el commit los objetos conservan sus valores y
+# serializarlos no dispara un SELECT extra por objeto (igual que en modo async).
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -22,12 +36,109 @@ def get_db():
     finally:
         db.close()
 
+# ---------------------------
+# Modo async (opcional): DB_ASYNC=1
+# ---------------------------
+# Con DB_ASYNC=1 los routers reciben una AsyncSession (aiomysql) y las consultas
+# ya no ocupan un hilo del threadpool mientras esperan a MySQL.
+DB_ASYNC = os.getenv("DB_ASYNC", "0").strip().lower() in ("1", "true", "yes")
+LEALTAD_DB_ASYNC_URL = os.getenv("DB_ASYNC_URL") or (
+    f"mysql+aiomysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+)
+
+async_engine = (
+    create_async_engine(LEALTAD_DB_ASYNC_URL, poolclass=InstrumentedAsyncQueuePool, **pool_kwargs("DB"))
+    if DB_ASYNC else None
+)
+if async_engine is not None:
+    instrumentar_pool(async_engine.sync_engine, "lealtad_async")
+    instrumentar_sql(async_engine.sync_engine, "lealtad_async")
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if DB_ASYNC else None
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_session():
+    """
+    Dependencia de los routers: AsyncSession si DB_ASYNC=1, Session clásica si no.
+    Úsala junto con run_in_session() para llamar a los services.
+    """
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+async def run_in_session(db, fn, *args, **kwargs):
+    """
+    Ejecuta un service sync `fn(db, *args, **kwargs)`:
+    - AsyncSession: vía run_sync (greenlet, sin hilos). Solo cede el event loop
+      mientras espera a la BD; el Python de `fn` corre EN el event loop, así
+      que solo sirve para services cortos (consultas y armado de filas).
+    - Session: en el threadpool, como un endpoint `def`.
+    El trabajo de CPU (parseo del import, lectura del archivo frío) va aparte
+    por run_in_threadpool: ver routers/clientes.py (import) y
+    movimientos_service.completar_historial.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# ---------------------------
+# Réplicas de lectura (opcional): DB_REPLICA_URLS / DB_REPLICA_ASYNC_URLS
+# ---------------------------
+# Ver db/replicas.py. Cada réplica usa los mismos DB_POOL_* que el primario.
+def _fabricas_replica():
+    sync, asincronas = [], []
+    for n, url in enumerate(DB_REPLICA_URLS, 1):
+        eng = create_engine(url, poolclass=InstrumentedQueuePool, **pool_kwargs("DB"))
+        instrumentar_pool(eng, f"lealtad_replica{n}")
+        instrumentar_sql(eng, f"lealtad_replica{n}")
+        sync.append(sessionmaker(bind=eng, autocommit=False, autoflush=False, expire_on_commit=False))
+    for n, url in enumerate(DB_REPLICA_ASYNC_URLS, 1):
+        eng = create_async_engine(url, poolclass=InstrumentedAsyncQueuePool, **pool_kwargs("DB"))
+        instrumentar_pool(eng.sync_engine, f"lealtad_replica{n}_async")
+        instrumentar_sql(eng.sync_engine, f"lealtad_replica{n}_async")
+        asincronas.append(async_sessionmaker(bind=eng, autoflush=False, expire_on_commit=False))
+    return sync, asincronas
+
+replicas.configurar(*_fabricas_replica())
+
+async def get_read_session(request: Request, primario=Depends(get_session)):
+    """
+    Dependencia de las rutas de solo lectura: sesión de una réplica, o la del
+    primario si no hay réplicas o si el cliente del request escribió hace poco.
+    La sesión del primario se crea igual (perezosa: no toma conexión si no se usa).
+    """
+    fabrica = replicas.elegir(isinstance(primario, AsyncSession))
+    if fabrica is None or leer_de_primario(request):
+        yield primario
+        return
+    db = fabrica()
+    try:
+        yield db
+    finally:
+        if isinstance(db, AsyncSession):
+            await db.close()
+        else:
+            await run_in_threadpool(db.close)
+
 # ---------------------------
 # Base de datos de Moving (usuarios)
 # ---------------------------
 MOVING_DB_URL = f"mysql+mysqlconnector://{os.getenv('MOVING_USER')}:{os.getenv('MOVING_PASSWORD')}@{os.getenv('MOVING_HOST')}:{os.getenv('MOVING_PORT')}/{os.getenv('MOVING_DB')}"
 
-engine_moving = create_engine(MOVING_DB_URL)
+engine_moving = create_engine(MOVING_DB_URL, poolclass=InstrumentedQueuePool, **pool_kwargs("MOVING"))
+instrumentar_pool(engine_moving, "moving")
+instrumentar_sql(engine_moving, "moving")
 SessionMoving = sessionmaker(bind=engine_moving, autocommit=False, autoflush=False)
 BaseMoving = declarative_base()
 
@@ -0,0 +1,192 @@
+# db/pool.py
+"""
+Configuración e instrumentación de los pools de conexiones.
+
+Cada engine toma su configuración de variables de entorno con un prefijo
+(DB_ para lealtad, MOVING_ para Moving):
+
+    <PREFIJO>_POOL_SIZE        conexiones permanentes           (5)
+    <PREFIJO>_MAX_OVERFLOW     conexiones extra en picos        (10)
+    <PREFIJO>_POOL_TIMEOUT     seg. esperando una conexión      (30)
+    <PREFIJO>_POOL_RECYCLE     seg. antes de reciclar (< wait_timeout de MySQL) (1800)
+    <PREFIJO>_POOL_PRE_PING    1/0, valida la conexión al sacarla (1)
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Límites (ms) del histograma de espera al sacar una conexión
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _env_int(nombre: str, default: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(default)))
+    except ValueError:
+        return default
+
+
+def pool_kwargs(prefijo: str) -> Dict[str, Any]:
+    """kwargs de pool para create_engine / create_async_engine."""
+    return {
+        "pool_size": _env_int(f"{prefijo}_POOL_SIZE", 5),
+        "max_overflow": _env_int(f"{prefijo}_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int(f"{prefijo}_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int(f"{prefijo}_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.getenv(f"{prefijo}_POOL_PRE_PING", "1").strip().lower() in ("1", "true", "yes"),
+    }
+
+
+class PoolStats:
+    """
+    Contadores de un pool. Se actualizan desde los hooks del pool (varios hilos),
+    por eso todo pasa por un lock; las secciones críticas son de pocas instrucciones.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)  # último = +Inf
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def registrar_espera(self, ms: float) -> None:
+        i = 0
+        while i < len(WAIT_BUCKETS_MS) and ms > WAIT_BUCKETS_MS[i]:
+            i += 1
+        with self._lock:
+            self.wait_total_ms += ms
+            if ms > self.wait_max_ms:
+                self.wait_max_ms = ms
+            self.wait_buckets[i] += 1
+
+    def registrar_checkout(self) -> None:
+        pool = self.pool
+        with self._lock:
+            self.checkouts += 1
+            if pool is not None:
+                self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+                self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def incr(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.pool
+        with self._lock:
+            data = {
+                "nombre": self.nombre,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total_ms, 3),
+                "wait_avg_ms": round(self.wait_total_ms / max(1, sum(self.wait_buckets)), 3),
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_buckets_ms": {
+                    **{str(le): n for le, n in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                    "+Inf": self.wait_buckets[-1],
+                },
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+        if pool is not None:
+            data.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+
+class _InstrumentedPoolMixin:
+    """Mide el tiempo de espera de connect() (incluye esperar por una conexión libre)."""
+
+    stats: "PoolStats | None" = None
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.incr("timeouts")
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.registrar_espera((time.perf_counter() - t0) * 1000.0)
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: conserva los contadores
+        nuevo = super().recreate()
+        nuevo.stats = self.stats
+        if self.stats is not None:
+            self.stats.pool = nuevo
+        return nuevo
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry: Dict[str, PoolStats] = {}
+
+
+def instrumentar_pool(engine, nombre: str) -> PoolStats:
+    """
+    Engancha contadores al pool de `engine` (sync o el sync_engine de uno async)
+    y lo registra para el endpoint interno de estadísticas.
+    """
+    pool = engine.pool
+    stats = PoolStats(nombre)
+    stats.pool = pool
+    if isinstance(pool, _InstrumentedPoolMixin):
+        pool.stats = stats
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        stats.incr("connects")
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        stats.registrar_checkout()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        stats.incr("checkins")
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_conn, conn_record, exception):
+        stats.incr("invalidations")
+
+    _registry[nombre] = stats
+    return stats
+
+
+def desregistrar_pool(nombre: str) -> None:
+    """Quita un pool del endpoint de estadísticas (engines temporales, pruebas)."""
+    _registry.pop(nombre, None)
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [s.snapshot() for s in _registry.values()]
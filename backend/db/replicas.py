@@ -0,0 +1,129 @@
+# db/replicas.py
+"""
+Réplicas de lectura con lectura-de-lo-escrito (read-your-writes).
+
+- DB_REPLICA_URLS: URLs SQLAlchemy (sync) separadas por coma. Sin ellas todo
+  va al primario, como antes. DB_REPLICA_ASYNC_URLS: lo mismo para DB_ASYNC=1
+  (p. ej. mysql+aiomysql://...); si falta, en modo async se lee del primario.
+  Las réplicas se reparten round-robin.
+- get_read_session (db/database.py) es la dependencia de las rutas GET: da una
+  sesión de réplica salvo que el cliente del request haya escrito hace menos de
+  DB_REPLICA_STICKY_SEG seg (default 5, debe cubrir el retraso de replicación),
+  en cuyo caso da la del primario.
+- Los services marcan al cliente con marcar_escritura() tras cada commit (en
+  los mismos puntos donde invalidan la caché del resumen). Las lecturas dentro
+  de casos de uso que escriben (p. ej. el saldo en canjear_puntos) usan la
+  sesión del caso de uso, que siempre es la del primario.
+- DB_REPLICA_STICKY_BACKEND=shared guarda las marcas en el almacén compartido
+  de services/cache.py (CACHE_REDIS_URL), para que valgan entre workers; con
+  "memory" (default) cada worker conoce solo sus propias escrituras.
+
+El cliente del request sale, en orden, del path ({id_cliente} / {cliente_id}),
+de qr_data=CLI:<id> o del claim id_cliente del token de app.
+"""
+import itertools
+import os
+import threading
+from typing import Any, Callable, List, Optional, Sequence
+
+from services.cache import MemoryBackend, SharedBackend
+
+DB_REPLICA_URLS = [u.strip() for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u.strip()]
+DB_REPLICA_ASYNC_URLS = [u.strip() for u in os.getenv("DB_REPLICA_ASYNC_URLS", "").split(",") if u.strip()]
+DB_REPLICA_STICKY_SEG = float(os.getenv("DB_REPLICA_STICKY_SEG", "5"))
+
+
+class Replicas:
+    """Fábricas de sesión de las réplicas (sync y async) y la elección round-robin."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configurar()
+
+    def configurar(self, sync: Sequence[Callable] = (), asincronas: Sequence[Callable] = ()) -> None:
+        with self._lock:
+            self.sync: List[Callable] = list(sync)
+            self.asincronas: List[Callable] = list(asincronas)
+            self._turno = itertools.count()
+
+    def elegir(self, asincrona: bool) -> Optional[Callable]:
+        fabricas = self.asincronas if asincrona else self.sync
+        if not fabricas:
+            return None
+        return fabricas[next(self._turno) % len(fabricas)]
+
+
+class EscriturasRecientes:
+    """Clientes que escribieron hace menos de `ventana` seg (se leen del primario)."""
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+
+    @staticmethod
+    def _key(id_cliente: int) -> str:
+        return f"primario:{int(id_cliente)}"
+
+    def marcar(self, *ids_cliente: int) -> None:
+        for i in ids_cliente:
+            self.backend.set(self._key(i), 1)
+
+    def reciente(self, id_cliente: int) -> bool:
+        return self.backend.get(self._key(id_cliente)) is not None
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def crear_escrituras_recientes() -> EscriturasRecientes:
+    tipo = os.getenv("DB_REPLICA_STICKY_BACKEND", "memory").strip().lower()
+    if tipo == "shared":
+        import redis  # dependencia opcional: solo si se usa el backend compartido
+
+        return EscriturasRecientes(
+            SharedBackend(
+                redis.Redis.from_url(os.environ["CACHE_REDIS_URL"]),
+                ttl=DB_REPLICA_STICKY_SEG,
+                prefix="lealtad:sticky:",
+            )
+        )
+    return EscriturasRecientes(MemoryBackend(max_items=100_000, ttl=DB_REPLICA_STICKY_SEG))
+
+
+replicas = Replicas()
+escrituras_recientes = crear_escrituras_recientes()
+
+
+def marcar_escritura(*ids_cliente: int) -> None:
+    """Lo llaman los services después del commit de una escritura del cliente."""
+    if replicas.sync or replicas.asincronas:
+        escrituras_recientes.marcar(*ids_cliente)
+
+
+def _id_int(valor: Any) -> Optional[int]:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def cliente_del_request(request) -> Optional[int]:
+    for k in ("id_cliente", "cliente_id"):
+        if k in request.path_params:
+            return _id_int(request.path_params[k])
+    qr = request.query_params.get("qr_data") or ""
+    if qr[:4].upper() == "CLI:":
+        return _id_int(qr[4:])
+    auth = request.headers.get("authorization") or ""
+    if auth[:7].lower() == "bearer ":
+        from utils.token import decode_access_token  # utils.token importa db.database
+
+        payload = decode_access_token(auth[7:].strip()) or {}
+        if payload.get("origin") == "app":
+            return _id_int(payload.get("id_cliente"))
+    return None
+
+
+def leer_de_primario(request) -> bool:
+    """True si este request de lectura debe ir al primario (cliente con escritura reciente)."""
+    cid = cliente_del_request(request)
+    return cid is not None and escrituras_recientes.reciente(cid)
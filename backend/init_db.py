@@ -1,5 +1,7 @@
-from db.database import Base, engine
+from db.database import Base, engine, SessionLocal
 import models
+from models import MovimientoPuntos, SaldoCliente
+from services.movimientos_service import recalcular_saldos
 import time
 
 print("📦 Inicializando base de datos...")
@@ -7,4 +9,13 @@ print("📦 Inicializando base de datos...")
 time.sleep(5)
 Base.metadata.create_all(bind=engine)
 
-print("✅ Tablas creadas correctamente.")
\ No newline at end of file
+# Si saldos_clientes se acaba de crear sobre una BD con movimientos, lo llenamos
+db = SessionLocal()
+try:
+    if db.query(SaldoCliente).first() is None and db.query(MovimientoPuntos).first() is not None:
+        n = recalcular_saldos(db)
+        print(f"🧮 Saldos materializados: {n} clientes.")
+finally:
+    db.close()
+
+print("✅ Tablas creadas correctamente.")
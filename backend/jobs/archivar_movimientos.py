@@ -0,0 +1,57 @@
+# jobs/archivar_movimientos.py
+"""
+Pasa al archivo frío los movimientos de meses completos anteriores al
+horizonte (ver services/archivo_service.py). Requiere pyarrow (requirements-archivo.txt).
+
+    python -m jobs.archivar_movimientos --meses 24
+    ARCHIVO_DIR=/mnt/archivo python -m jobs.archivar_movimientos --meses 24 --fecha 2026-10-01
+
+Imprime una línea JSON por mes confirmado. Si se interrumpe, basta con volver
+a correrlo: los meses ya archivados no tienen filas que mover.
+Escribe siempre en ARCHIVO_DIR: los lectores de la app resuelven las partes
+contra ese mismo directorio, así que no hay opción para cambiarlo.
+El horizonte debe ser mayor que PUNTOS_VIGENCIA_MESES (jobs/vencer_puntos.py).
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import SessionLocal  # noqa: E402
+from services.archivo_service import (  # noqa: E402
+    ARCHIVO_DIR,
+    ARCHIVO_LOTE,
+    ARCHIVO_MESES,
+    archivar_movimientos,
+    corte_archivo,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses", type=int, default=ARCHIVO_MESES)
+    parser.add_argument("--fecha", type=datetime.fromisoformat, help="fecha de ejecución (default: hoy)")
+    parser.add_argument("--lote", type=int, default=ARCHIVO_LOTE, help="filas por record batch")
+    args = parser.parse_args()
+    if not ARCHIVO_DIR:
+        parser.error("falta ARCHIVO_DIR (el mismo que usa la app)")
+
+    corte = corte_archivo(args.meses, args.fecha)
+    db = SessionLocal()
+    try:
+        res = archivar_movimientos(
+            db,
+            corte=corte,
+            lote=args.lote,
+            progreso=lambda p: print(json.dumps(p), file=sys.stderr, flush=True),
+        )
+    finally:
+        db.close()
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
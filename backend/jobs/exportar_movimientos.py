@@ -0,0 +1,109 @@
+# jobs/exportar_movimientos.py
+"""
+Exporta movimientos a un archivo (o stdout) en CSV o NDJSON, directo contra la BD.
+
+    python -m jobs.exportar_movimientos --desde 2026-01-01 --hasta 2026-02-01 \\
+        --formato csv --salida enero.csv
+    # si se interrumpe, reanuda desde la última fila completa del archivo:
+    python -m jobs.exportar_movimientos ... --salida enero.csv --reanudar
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import SessionLocal  # noqa: E402
+from services.export_service import COLUMNAS_EXPORT, cursor_de_fila, exportar_movimientos  # noqa: E402
+
+
+def _ultima_linea_completa(ruta: str) -> Optional[tuple]:
+    """
+    Devuelve (bytes_validos, linea) de la última línea terminada en salto de
+    línea; recorta lo que quede a medias al final del archivo.
+    """
+    with open(ruta, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        fin = f.tell()
+        bloque = min(fin, 64 * 1024)
+        f.seek(fin - bloque)
+        cola = f.read(bloque)
+    corte = cola.rfind(b"\n")
+    if corte < 0:
+        return None
+    validos = fin - bloque + corte + 1
+    previa = cola.rfind(b"\n", 0, corte)
+    return validos, cola[previa + 1:corte].decode("utf-8").rstrip("\r")
+
+
+def cursor_para_reanudar(ruta: str, formato: str) -> Optional[str]:
+    """Cursor después de la última fila completa del archivo (None si no hay filas)."""
+    if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+        return None
+    ultima = _ultima_linea_completa(ruta)
+    if ultima is None:
+        return None
+    validos, linea = ultima
+    if formato == "ndjson":
+        d = json.loads(linea)
+    else:
+        valores = next(csv.reader([linea]))
+        if valores == list(COLUMNAS_EXPORT):
+            d = None  # solo está el encabezado
+        else:
+            d = dict(zip(COLUMNAS_EXPORT, valores))
+    # Descarta una fila cortada a la mitad
+    with open(ruta, "r+b") as f:
+        f.truncate(validos)
+    if d is None:
+        return None
+    return cursor_de_fila(datetime.fromisoformat(d["fecha"]), int(d["id"]))
+
+
+def _fecha(valor: str) -> datetime:
+    return datetime.fromisoformat(valor)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formato", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--desde", type=_fecha, help="inclusiva (ISO)")
+    parser.add_argument("--hasta", type=_fecha, help="exclusiva (ISO)")
+    parser.add_argument("--tipo", choices=["acumulado", "canjeado", "vencido"])
+    parser.add_argument("--sucursal", dest="id_sucursal")
+    parser.add_argument("--cursor", help="cursor explícito para reanudar")
+    parser.add_argument("--salida", help="archivo de salida (default: stdout)")
+    parser.add_argument("--reanudar", action="store_true", help="continúa el archivo de --salida")
+    args = parser.parse_args()
+
+    cursor = args.cursor
+    modo = "w"
+    if args.reanudar:
+        if not args.salida:
+            parser.error("--reanudar requiere --salida")
+        cursor = cursor or cursor_para_reanudar(args.salida, args.formato)
+        modo = "a"
+        if cursor is None and os.path.exists(args.salida):
+            modo = "w"  # no había filas completas: se empieza de cero
+
+    salida = open(args.salida, modo, encoding="utf-8", newline="") if args.salida else sys.stdout
+    db = SessionLocal()
+    try:
+        for chunk in exportar_movimientos(
+            db, formato=args.formato, desde=args.desde, hasta=args.hasta,
+            tipo=args.tipo, id_sucursal=args.id_sucursal, cursor=cursor,
+        ):
+            salida.write(chunk)
+            salida.flush()
+    finally:
+        db.close()
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
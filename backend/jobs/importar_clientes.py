@@ -0,0 +1,61 @@
+# jobs/importar_clientes.py
+"""
+Importa la base de clientes de SAP (CSV con encabezado o NDJSON) directo contra la BD.
+
+    python -m jobs.importar_clientes clientes_sap.csv --lote 5000 --rechazos rechazos.ndjson
+    zcat clientes.ndjson.gz | python -m jobs.importar_clientes - --formato ndjson
+
+Upsert por codigo_sap o correo (ver services/import_service.py). Las filas
+rechazadas se escriben en --rechazos (una por línea, JSON) y la carga sigue.
+El progreso sale por stderr tras cada lote; el resumen final, por stdout.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import SessionLocal  # noqa: E402
+from services.import_service import IMPORT_BATCH, importar_clientes  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo", help="ruta del archivo, o - para stdin")
+    parser.add_argument("--formato", choices=("csv", "ndjson"), default=None, help="default: por extensión")
+    parser.add_argument("--lote", type=int, default=IMPORT_BATCH, help="filas por commit")
+    parser.add_argument("--rechazos", default=None, help="archivo NDJSON con las filas rechazadas")
+    args = parser.parse_args()
+
+    formato = args.formato or ("ndjson" if args.archivo.endswith((".ndjson", ".jsonl")) else "csv")
+    if args.archivo == "-":
+        entrada = open(sys.stdin.fileno(), encoding="utf-8-sig", newline="", closefd=False)
+    else:
+        entrada = open(args.archivo, encoding="utf-8-sig", newline="")
+    rechazos = open(args.rechazos, "w", encoding="utf-8") if args.rechazos else None
+
+    def on_rechazo(r: dict) -> None:
+        if rechazos is not None:
+            rechazos.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    def progreso(p: dict) -> None:
+        print(json.dumps(p), file=sys.stderr, flush=True)
+
+    db = SessionLocal()
+    try:
+        res = importar_clientes(
+            db, entrada, formato=formato, lote=args.lote, on_rechazo=on_rechazo, progreso=progreso,
+        )
+    finally:
+        db.close()
+        entrada.close()
+        if rechazos is not None:
+            rechazos.close()
+
+    res.pop("rechazos")  # ya quedaron en --rechazos
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# jobs/purgar_idempotencia.py
+"""
+Borra las Idempotency-Key vencidas (ver services/idempotency.py). Pensado para cron:
+
+    python -m jobs.purgar_idempotencia
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import SessionLocal  # noqa: E402
+from services.idempotency import purgar_vencidas  # noqa: E402
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        print(f"Claves vencidas borradas: {purgar_vencidas(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# jobs/vencer_puntos.py
+"""
+Vence los puntos acumulados hace más de N meses (ver services/vencimiento_service.py).
+
+    python -m jobs.vencer_puntos --meses 12
+    python -m jobs.vencer_puntos --meses 12 --fecha 2026-10-01 --dry-run
+    # reanudar tras una interrupción (o simplemente volver a correrlo: es idempotente)
+    python -m jobs.vencer_puntos --meses 12 --fecha 2026-10-01 --desde-id 84000
+
+Imprime una línea JSON por rango confirmado; "ultimo_id" es el --desde-id para reanudar.
+Usa el mismo --fecha al reanudar para conservar el corte.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import SessionLocal  # noqa: E402
+from services.vencimiento_service import VENC_CHUNK, fecha_corte, vencer_puntos  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses", type=int, default=int(os.getenv("PUNTOS_VIGENCIA_MESES", "12")))
+    parser.add_argument("--fecha", type=datetime.fromisoformat, help="fecha de ejecución (default: hoy)")
+    parser.add_argument("--desde-id", type=int, default=0)
+    parser.add_argument("--hasta-id", type=int)
+    parser.add_argument("--chunk", type=int, default=VENC_CHUNK)
+    parser.add_argument("--dry-run", action="store_true", help="calcula sin escribir")
+    args = parser.parse_args()
+
+    corte = fecha_corte(args.meses, args.fecha)
+    db = SessionLocal()
+    try:
+        res = vencer_puntos(
+            db,
+            corte=corte,
+            desde_id=args.desde_id,
+            hasta_id=args.hasta_id,
+            chunk=args.chunk,
+            dry_run=args.dry_run,
+            progreso=lambda p: print(json.dumps(p), file=sys.stderr, flush=True),
+        )
+    finally:
+        db.close()
+    print(json.dumps(res))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,14 @@ from sqlalchemy import text
 import logging
 import os
 
-from db.database import get_db
+from db.database import get_session, run_in_session
 from routers import clientes, movimientos, auth
 from routers import caja
 from routers import app_mobile
+from routers import internal
 from utils.logging_conf import setup_logging
+from utils.metrics import MetricsMiddleware
+from utils.request_context import RequestIdMiddleware
 
 # 1) Logging
 setup_logging()
@@ -42,11 +45,16 @@ app.add_middleware(
     allow_headers=["*"],              # más simple: permite todo header (incluye Authorization)
 )
 
+# Métricas (/metrics): se agrega después de CORS para quedar por fuera y medir todo
+app.add_middleware(MetricsMiddleware)
+# Request ID (X-Request-ID): el más externo, así todo lo demás ya lo ve en sus logs
+app.add_middleware(RequestIdMiddleware)
+
 # 4) Healthcheck
 @app.get("/healthz")
-def healthz(db: Session = Depends(get_db)):
+async def healthz(db: Session = Depends(get_session)):
     try:
-        db.execute(text("SELECT 1"))
+        await run_in_session(db, lambda s: s.execute(text("SELECT 1")))
         return {"status": "ok", "db": "ok"}
     except Exception:
         raise HTTPException(status_code=500, detail="db_error")
@@ -62,6 +70,8 @@ app.include_router(movimientos.router)
 app.include_router(auth.router)
 app.include_router(caja.router)
 app.include_router(app_mobile.router)
+app.include_router(internal.router)
+app.include_router(internal.metrics_router)
 
 # 7) Error handler global
 @app.exception_handler(Exception)
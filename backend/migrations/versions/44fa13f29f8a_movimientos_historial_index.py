@@ -0,0 +1,26 @@
+"""indice (id_cliente, fecha, id) para historial paginado
+
+Revision ID: 44fa13f29f8a
+Revises: e18c9bbf7aea
+Create Date: 2026-10-18 11:03:17.228104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '44fa13f29f8a'
+down_revision: Union[str, None] = 'e18c9bbf7aea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_mov_cliente_fecha_id', 'movimientos_puntos', ['id_cliente', 'fecha', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mov_cliente_fecha_id', table_name='movimientos_puntos')
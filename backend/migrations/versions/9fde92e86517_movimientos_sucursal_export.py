@@ -0,0 +1,28 @@
+"""movimientos: id_sucursal + indice (fecha, id) para exportación
+
+Revision ID: 9fde92e86517
+Revises: 44fa13f29f8a
+Create Date: 2026-10-18 12:20:05.114872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9fde92e86517'
+down_revision: Union[str, None] = '44fa13f29f8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('movimientos_puntos', sa.Column('id_sucursal', sa.String(length=50), nullable=True))
+    op.create_index('ix_mov_fecha_id', 'movimientos_puntos', ['fecha', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mov_fecha_id', table_name='movimientos_puntos')
+    op.drop_column('movimientos_puntos', 'id_sucursal')
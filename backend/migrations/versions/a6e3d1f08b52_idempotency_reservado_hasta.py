@@ -0,0 +1,27 @@
+"""idempotency_keys.reservado_hasta: plazo de las reservas en proceso
+
+Revision ID: a6e3d1f08b52
+Revises: f2b7c9e4a1d8
+Create Date: 2026-10-18 17:20:44.102317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3d1f08b52'
+down_revision: Union[str, None] = 'f2b7c9e4a1d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Las reservas en proceso existentes quedan con NULL: se pueden tomar de inmediato
+    op.add_column('idempotency_keys', sa.Column('reservado_hasta', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'reservado_hasta')
@@ -0,0 +1,27 @@
+"""saldos_clientes.vencido: puntos vencidos por cliente
+
+Revision ID: b3c1d5e7a902
+Revises: 9fde92e86517
+Create Date: 2026-10-18 13:05:48.301227
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c1d5e7a902'
+down_revision: Union[str, None] = '9fde92e86517'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Aún no existen movimientos "vencido": basta con el default 0
+    op.add_column('saldos_clientes', sa.Column('vencido', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('saldos_clientes', 'vencido')
@@ -0,0 +1,26 @@
+"""indice (fecha_registro, id_cliente) para el listado paginado de clientes
+
+Revision ID: c47e2a9d1b36
+Revises: b3c1d5e7a902
+Create Date: 2026-10-18 14:02:11.907345
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47e2a9d1b36'
+down_revision: Union[str, None] = 'b3c1d5e7a902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_clientes_fecha_registro_id', 'clientes', ['fecha_registro', 'id_cliente'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clientes_fecha_registro_id', table_name='clientes')
@@ -0,0 +1,37 @@
+"""idempotency_keys: respuestas guardadas por Idempotency-Key
+
+Revision ID: d5a8f0c3e614
+Revises: c47e2a9d1b36
+Create Date: 2026-10-18 14:40:27.553019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8f0c3e614'
+down_revision: Union[str, None] = 'c47e2a9d1b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+    sa.Column('endpoint', sa.String(length=64), nullable=False),
+    sa.Column('clave', sa.String(length=100), nullable=False),
+    sa.Column('huella', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('creado', sa.DateTime(), nullable=False),
+    sa.Column('expira', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('endpoint', 'clave')
+    )
+    op.create_index('ix_idempotency_expira', 'idempotency_keys', ['expira'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_idempotency_expira', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
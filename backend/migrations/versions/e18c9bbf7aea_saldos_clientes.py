@@ -0,0 +1,50 @@
+"""saldos_clientes: saldo materializado por cliente
+
+Revision ID: e18c9bbf7aea
+Revises: 7dc8aa8469d0
+Create Date: 2026-10-18 10:12:41.512903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18c9bbf7aea'
+down_revision: Union[str, None] = '7dc8aa8469d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saldos_clientes',
+    sa.Column('id_cliente', sa.Integer(), nullable=False),
+    sa.Column('acumulado', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('canjeado', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('disponible', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_movimiento_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['id_cliente'], ['clientes.id_cliente'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_cliente')
+    )
+
+    # Backfill: un solo INSERT ... SELECT con agregación condicional
+    op.execute(
+        """
+        INSERT INTO saldos_clientes (id_cliente, acumulado, canjeado, disponible, last_movimiento_id)
+        SELECT
+            id_cliente,
+            COALESCE(SUM(CASE WHEN tipo = 'acumulado' THEN puntos ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN tipo = 'canjeado' THEN puntos ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN tipo = 'acumulado' THEN puntos ELSE 0 END), 0)
+              - COALESCE(SUM(CASE WHEN tipo = 'canjeado' THEN puntos ELSE 0 END), 0),
+            MAX(id)
+        FROM movimientos_puntos
+        GROUP BY id_cliente
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('saldos_clientes')
@@ -0,0 +1,52 @@
+"""archivo frío de movimientos: saldos_apertura y archivo_partes
+
+Revision ID: f2b7c9e4a1d8
+Revises: d5a8f0c3e614
+Create Date: 2026-10-18 16:12:09.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c9e4a1d8'
+down_revision: Union[str, None] = 'd5a8f0c3e614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saldos_apertura',
+    sa.Column('id_cliente', sa.Integer(), nullable=False),
+    sa.Column('acumulado', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('canjeado', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('vencido', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('corte', sa.DateTime(), nullable=False),
+    sa.Column('last_movimiento_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['id_cliente'], ['clientes.id_cliente'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_cliente')
+    )
+    op.create_table('archivo_partes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mes', sa.String(length=7), nullable=False),
+    sa.Column('archivo', sa.String(length=255), nullable=False),
+    sa.Column('filas', sa.Integer(), nullable=False),
+    sa.Column('id_desde', sa.Integer(), nullable=False),
+    sa.Column('id_hasta', sa.Integer(), nullable=False),
+    sa.Column('fecha_desde', sa.DateTime(), nullable=False),
+    sa.Column('fecha_hasta', sa.DateTime(), nullable=False),
+    sa.Column('indice', sa.Text(), nullable=False),
+    sa.Column('creado', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('archivo')
+    )
+    op.create_index(op.f('ix_archivo_partes_mes'), 'archivo_partes', ['mes'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_archivo_partes_mes'), table_name='archivo_partes')
+    op.drop_table('archivo_partes')
+    op.drop_table('saldos_apertura')
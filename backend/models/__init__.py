@@ -1,5 +1,8 @@
 # models/__init__.py
 from .clientes import Cliente
 from .movimientos_puntos import MovimientoPuntos
+from .saldos_clientes import SaldoCliente
+from .idempotency_keys import IdempotencyKey
+from .archivo import SaldoApertura, ParteArchivo
 
-__all__ = ["Cliente", "MovimientoPuntos"]
\ No newline at end of file
+__all__ = ["Cliente", "MovimientoPuntos", "SaldoCliente", "IdempotencyKey", "SaldoApertura", "ParteArchivo"]
\ No newline at end of file
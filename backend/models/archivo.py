@@ -0,0 +1,56 @@
+# models/archivo.py
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+
+from db.database import Base
+
+
+class SaldoApertura(Base):
+    """
+    Totales por cliente de los movimientos que ya se movieron al archivo frío
+    (ver services/archivo_service.py). Sumados a los movimientos "calientes"
+    dan los totales históricos completos (recalcular_saldos, vencimiento).
+    """
+    __tablename__ = "saldos_apertura"
+
+    id_cliente = Column(
+        Integer,
+        ForeignKey("clientes.id_cliente", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    acumulado = Column(Integer, nullable=False, default=0, server_default="0")
+    canjeado = Column(Integer, nullable=False, default=0, server_default="0")
+    vencido = Column(Integer, nullable=False, default=0, server_default="0")
+    # Todo lo del cliente anterior a `corte` está en el archivo
+    corte = Column(DateTime, nullable=False)
+    last_movimiento_id = Column(Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<SaldoApertura id_cliente={self.id_cliente} acumulado={self.acumulado} "
+            f"canjeado={self.canjeado} vencido={self.vencido} corte={self.corte}>"
+        )
+
+
+class ParteArchivo(Base):
+    """
+    Un archivo Arrow del archivo frío. Se registra en la misma transacción que
+    borra sus filas de movimientos_puntos: los lectores solo ven partes
+    registradas, así un archivo escrito por una corrida que falló no se lee.
+    """
+    __tablename__ = "archivo_partes"
+
+    id = Column(Integer, primary_key=True)
+    mes = Column(String(7), nullable=False, index=True)  # "YYYY-MM"
+    archivo = Column(String(255), nullable=False, unique=True)  # relativo a ARCHIVO_DIR
+    filas = Column(Integer, nullable=False)
+    id_desde = Column(Integer, nullable=False)
+    id_hasta = Column(Integer, nullable=False)
+    fecha_desde = Column(DateTime, nullable=False)
+    fecha_hasta = Column(DateTime, nullable=False)
+    # JSON [[primer id_cliente, último id_cliente], ...] por record batch: las
+    # filas van ordenadas por cliente y solo se leen los batches que lo contienen
+    indice = Column(Text, nullable=False)
+    creado = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ParteArchivo {self.archivo} filas={self.filas}>"
@@ -1,7 +1,7 @@
 # models/clientes.py
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -32,5 +32,18 @@ class Cliente(Base):
         passive_deletes=True,
     )
 
+    # Saldo materializado (1 a 1)
+    saldo = relationship(
+        "SaldoCliente",
+        back_populates="cliente",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    __table_args__ = (
+        # Listado paginado por fecha de registro (keyset sobre fecha_registro, id_cliente)
+        Index("ix_clientes_fecha_registro_id", "fecha_registro", "id_cliente"),
+    )
+
     def __repr__(self) -> str:
         return f"<Cliente id={self.id_cliente} correo={self.correo!r} nombre={self.nombre!r}>"
\ No newline at end of file
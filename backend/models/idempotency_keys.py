@@ -0,0 +1,30 @@
+# models/idempotency_keys.py
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from db.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Respuesta original de un POST enviado con header Idempotency-Key.
+    status_code NULL = la solicitud original sigue en proceso (hasta
+    reservado_hasta; después un reintento puede tomar la clave).
+    """
+    __tablename__ = "idempotency_keys"
+
+    endpoint = Column(String(64), primary_key=True)
+    clave = Column(String(100), primary_key=True)
+    # sha256 del cuerpo: la misma clave con otro cuerpo se rechaza
+    huella = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(Text, nullable=True)
+    creado = Column(DateTime, nullable=False)
+    expira = Column(DateTime, nullable=False)
+    reservado_hasta = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_idempotency_expira", "expira"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey {self.endpoint}:{self.clave} status={self.status_code}>"
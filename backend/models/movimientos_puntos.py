@@ -18,10 +18,12 @@ class MovimientoPuntos(Base):
         index=True,
         nullable=False,
     )
-    tipo = Column(String(20), nullable=False)  # "acumulado" | "canjeado"
+    tipo = Column(String(20), nullable=False)  # "acumulado" | "canjeado" | "vencido"
     puntos = Column(Integer, nullable=False)
     descripcion: Optional[str] = Column(String(255), nullable=True)
     referencia: Optional[str] = Column(String(64), nullable=True)
+    # Sucursal que registró el movimiento (id_sucursal de Moving); None si no se envió
+    id_sucursal: Optional[str] = Column(String(50), nullable=True)
     fecha = Column(DateTime, server_default=func.now(), nullable=False)
 
     cliente = relationship(
@@ -32,6 +34,10 @@ class MovimientoPuntos(Base):
 
     __table_args__ = (
         Index("uix_mov_ref", "id_cliente", "referencia", "tipo", unique=True),
+        # Historial paginado por (fecha, id) dentro de cada cliente
+        Index("ix_mov_cliente_fecha_id", "id_cliente", "fecha", "id"),
+        # Exportación por rango de fechas (keyset sobre fecha, id)
+        Index("ix_mov_fecha_id", "fecha", "id"),
     )
 
     def __repr__(self) -> str:
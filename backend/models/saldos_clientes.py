@@ -0,0 +1,32 @@
+# models/saldos_clientes.py
+from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy.orm import relationship
+
+from db.database import Base
+
+
+class SaldoCliente(Base):
+    """
+    Saldo materializado por cliente. Se actualiza en la misma transacción que
+    cada movimiento para que leer el saldo sea una búsqueda por PK.
+    """
+    __tablename__ = "saldos_clientes"
+
+    id_cliente = Column(
+        Integer,
+        ForeignKey("clientes.id_cliente", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    acumulado = Column(Integer, nullable=False, default=0, server_default="0")
+    canjeado = Column(Integer, nullable=False, default=0, server_default="0")
+    vencido = Column(Integer, nullable=False, default=0, server_default="0")
+    disponible = Column(Integer, nullable=False, default=0, server_default="0")
+    last_movimiento_id = Column(Integer, nullable=True)
+
+    cliente = relationship("Cliente", back_populates="saldo")
+
+    def __repr__(self) -> str:
+        return (
+            f"<SaldoCliente id_cliente={self.id_cliente} acumulado={self.acumulado} "
+            f"canjeado={self.canjeado} vencido={self.vencido} disponible={self.disponible}>"
+        )
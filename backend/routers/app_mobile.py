@@ -2,14 +2,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr, Field
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from db.database import get_db
+from db.database import get_db, get_read_session, get_session, run_in_session
 from services.clientes_service import (
     get_or_create_cliente,
     set_password_cliente,
-    autenticar_cliente,
+    login_cliente,
 )
+from services.eventos import RespuestaSSE, broker_eventos
+from services.movimientos_service import resumen_de_cliente
+from services.password_hashing import password_hasher
 from schemas.clientes import ClienteOut
+from utils.token import create_access_token, build_token_claims_for_app, get_current_cliente_id
 
 router = APIRouter(prefix="/app", tags=["App Móvil"])
 
@@ -27,11 +32,17 @@ class LoginRequest(BaseModel):
     correo: EmailStr
     password: str
 
+class AppLoginOut(ClienteOut):
+    # Los campos del cliente se conservan para la app actual; el token es adicional
+    access_token: str
+    token_type: str = "bearer"
+
 # ---- Endpoints ----
 @router.post("/identify", response_model=ClienteOut)
-def identify(req: IdentifyRequest, db: Session = Depends(get_db)):
-    cliente, _ = get_or_create_cliente(
+async def identify(req: IdentifyRequest, db: Session = Depends(get_session)):
+    cliente, _ = await run_in_session(
         db,
+        get_or_create_cliente,
         correo=req.correo,
         nombre=req.nombre,
         telefono=req.telefono,
@@ -39,13 +50,44 @@ def identify(req: IdentifyRequest, db: Session = Depends(get_db)):
     return cliente
 
 @router.post("/set-password")
-def set_password(req: SetPasswordRequest, db: Session = Depends(get_db)):
-    set_password_cliente(db, req.correo, req.password)
+async def set_password(req: SetPasswordRequest, db: Session = Depends(get_session)):
+    # bcrypt fuera de la sesión: el pool de hashing responde 503 si está saturado
+    password_hash = await password_hasher.hash_async(req.password.strip())
+    await run_in_session(db, set_password_cliente, req.correo, req.password, password_hash=password_hash)
     return {"ok": True}
 
-@router.post("/login", response_model=ClienteOut)
-def login(req: LoginRequest, db: Session = Depends(get_db)):
-    cli = autenticar_cliente(db, req.correo, req.password)
+@router.post("/login", response_model=AppLoginOut)
+async def login(req: LoginRequest, db: Session = Depends(get_session)):
+    cli = await login_cliente(db, req.correo, req.password)
     if not cli:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Correo o contraseña inválidos.")
-    return cli
\ No newline at end of file
+    token = create_access_token(build_token_claims_for_app(cli))
+    return AppLoginOut(**ClienteOut.model_validate(cli).model_dump(), access_token=token)
+
+@router.get("/resumen")
+async def mi_resumen(
+    id_cliente: int = Depends(get_current_cliente_id),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Resumen de puntos del cliente autenticado (token de app).
+    La identidad sale del token: no hay búsqueda del cliente por correo.
+    """
+    return await run_in_session(db, resumen_de_cliente, id_cliente)
+
+@router.get("/eventos")
+async def mis_eventos(
+    id_cliente: int = Depends(get_current_cliente_id),
+    db: Session = Depends(get_db),
+):
+    """
+    Server-Sent Events del cliente autenticado (token de app): un evento
+    "saldo" con el delta ({tipo, puntos, ...}) en cuanto se confirma cada
+    acumulación, canje o vencimiento; "resync" si se perdieron eventos y hay
+    que pedir /app/resumen. Ver services/eventos.py.
+    """
+    # La sesión que usó get_current_cliente_id (misma instancia) se suelta ya:
+    # la conexión SSE puede durar horas y no debe retener nada del pool
+    await run_in_threadpool(db.close)
+    # RespuestaSSE libera la suscripción aunque el stream nunca llegue a empezar
+    return RespuestaSSE(broker_eventos, broker_eventos.suscribir(id_cliente))
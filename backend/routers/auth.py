@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 
-from db.database import get_moving_db
+from db.database import get_moving_db, run_in_session
 from services.auth_service import authenticate_caja_user, build_token_claims_for_caja
 from utils.token import create_access_token, decode_access_token, oauth2_scheme
 
@@ -59,7 +59,7 @@ async def login(
         )
 
     # Autenticación contra base Moving (usuarios de caja)
-    user = authenticate_caja_user(db_moving, username, password)
+    user = await run_in_session(db_moving, authenticate_caja_user, username, password)
     claims = build_token_claims_for_caja(user)
     token = create_access_token(claims)
 
@@ -1,15 +1,17 @@
 # routers/caja.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, condecimal
 from decimal import Decimal, ROUND_DOWN
 import math
 import os
 
-from db.database import get_db
-from services.movimientos_service import acumular_puntos, canjear_puntos
-from services.movimientos_service import resumen_de_cliente
-from schemas.movimientos_puntos import MovimientoPuntosOut, AcumularRequest, CanjearRequest
+from db.database import get_read_session, get_session, run_in_session
+from services.movimientos_service import acumular_puntos, canjear_hasta, acumular_lote
+from services.movimientos_service import resumen_de_cliente, escaneo_cliente
+from schemas.movimientos_puntos import MovimientoPuntosOut, AcumularRequest
+from schemas.movimientos_puntos import AcumularLoteRequest, AcumularLoteResponse
+from services.idempotency import ejecutar_idempotente
 
 router = APIRouter(prefix="/caja", tags=["Caja / Escaneo"])
 
@@ -35,6 +37,11 @@ def parse_qr_payload(qr_data: str) -> int:
 # Por defecto 1 punto = $1.00
 POINT_VALUE = Decimal(os.getenv("POINT_VALUE", "1.0")).quantize(Decimal("0.01"))
 
+def max_por_importe_de(importe) -> int:
+    """Puntos que cubre el importe del ticket (1 punto = $POINT_VALUE), hacia abajo."""
+    imp = Decimal(str(importe)).quantize(Decimal("0.01"))
+    return int((imp / POINT_VALUE).to_integral_value(rounding=ROUND_DOWN))
+
 # === Modelos de request/response ===
 
 class AcumularQRRequest(BaseModel):
@@ -42,6 +49,7 @@ class AcumularQRRequest(BaseModel):
     puntos: int = Field(gt=0)
     descripcion: str | None = None
     referencia: str = Field(min_length=1, max_length=64)  # ticket único
+    id_sucursal: str | None = Field(default=None, max_length=50)
 
 class ResolverQRResponse(BaseModel):
     id_cliente: int
@@ -54,6 +62,7 @@ class CanjearQRRequest(BaseModel):
     puntos: int | None = Field(default=None, ge=1)
     referencia: str | None = Field(default=None, max_length=64)
     descripcion: str | None = None
+    id_sucursal: str | None = Field(default=None, max_length=50)
 
 class CanjearSugerenciaResponse(BaseModel):
     id_cliente: int
@@ -62,13 +71,30 @@ class CanjearSugerenciaResponse(BaseModel):
     max_canjeable: int
     point_value: float
 
+class EscaneoResponse(BaseModel):
+    id_cliente: int
+    nombre: str
+    codigo_sap: str | None = None
+    puntos_disponibles: int
+    max_por_importe: int
+    max_canjeable: int
+    point_value: float
+
+def _mov_json(mov) -> dict:
+    return MovimientoPuntosOut.model_validate(mov).model_dump(mode="json")
+
 # === Endpoints ===
 
 @router.post("/acumular-qr", response_model=MovimientoPuntosOut, status_code=status.HTTP_201_CREATED)
-def acumular_por_qr(payload: AcumularQRRequest, db: Session = Depends(get_db)):
+async def acumular_por_qr(
+    payload: AcumularQRRequest,
+    db: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Acumula puntos usando un QR (CLI:<id_cliente>).
     Valida doble captura por 'referencia' (única por cliente).
+    Con header Idempotency-Key, un reintento repite la respuesta original.
     """
     id_cliente = parse_qr_payload(payload.qr_data)
     req = AcumularRequest(
@@ -76,9 +102,41 @@ def acumular_por_qr(payload: AcumularQRRequest, db: Session = Depends(get_db)):
         puntos=payload.puntos,
         descripcion=payload.descripcion,
         referencia=payload.referencia,
+        id_sucursal=payload.id_sucursal,
+    )
+    return await ejecutar_idempotente(
+        db, idempotency_key, "caja.acumular_qr", payload,
+        lambda: run_in_session(db, acumular_puntos, req),
+        _mov_json, status_code=status.HTTP_201_CREATED,
+    )
+
+@router.post("/acumular-lote", response_model=AcumularLoteResponse)
+async def acumular_por_lote(
+    payload: AcumularLoteRequest,
+    db: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    Acumula muchos tickets en un solo request (reenvío de SAP / sucursal que se pone al día).
+    No falla por item: devuelve el estado de cada uno (creado / duplicado / cliente_no_encontrado).
+    """
+    async def _acumular() -> AcumularLoteResponse:
+        resultados = await run_in_session(db, acumular_lote, payload.items)
+        conteo = {"creado": 0, "duplicado": 0, "cliente_no_encontrado": 0, "invalido": 0}
+        for r in resultados:
+            conteo[r["estado"]] += 1
+        return AcumularLoteResponse(
+            creados=conteo["creado"],
+            duplicados=conteo["duplicado"],
+            clientes_no_encontrados=conteo["cliente_no_encontrado"],
+            invalidos=conteo["invalido"],
+            resultados=resultados,
+        )
+
+    return await ejecutar_idempotente(
+        db, idempotency_key, "caja.acumular_lote", payload,
+        _acumular, lambda r: r.model_dump(mode="json"),
     )
-    mov = acumular_puntos(db, req)
-    return mov
 
 @router.get("/resolver-qr", response_model=ResolverQRResponse)
 def resolver_qr(qr_data: str):
@@ -86,17 +144,16 @@ def resolver_qr(qr_data: str):
     return ResolverQRResponse(id_cliente=parse_qr_payload(qr_data))
 
 @router.get("/canjear-sugerencia", response_model=CanjearSugerenciaResponse)
-def canjear_sugerencia(qr_data: str, importe: float, db: Session = Depends(get_db)):
+async def canjear_sugerencia(qr_data: str, importe: float, db: Session = Depends(get_read_session)):
     """
     Devuelve cuánto se podría canjear como máximo dado el importe y el saldo del cliente.
     1 punto = $POINT_VALUE (configurable).
     """
     id_cliente = parse_qr_payload(qr_data)
-    resumen = resumen_de_cliente(db, id_cliente)
+    resumen = await run_in_session(db, resumen_de_cliente, id_cliente)
     disponible = int(resumen["puntos_disponibles"])
 
-    imp = Decimal(str(importe)).quantize(Decimal("0.01"))
-    max_por_importe = int((imp / POINT_VALUE).to_integral_value(rounding=ROUND_DOWN))
+    max_por_importe = max_por_importe_de(importe)
     max_canjeable = max(0, min(disponible, max_por_importe))
 
     return CanjearSugerenciaResponse(
@@ -107,45 +164,58 @@ def canjear_sugerencia(qr_data: str, importe: float, db: Session = Depends(get_d
         point_value=float(POINT_VALUE),
     )
 
+@router.get("/escaneo", response_model=EscaneoResponse)
+async def escaneo(
+    qr_data: str,
+    importe: Decimal = Query(gt=0, max_digits=12, decimal_places=2),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Todo lo que la caja muestra al escanear, en un request y una sentencia SQL:
+    identidad, nombre, saldo y máximo canjeable para el `importe` del ticket.
+    Reemplaza a resolver-qr + canjear-sugerencia.
+    """
+    cli = await run_in_session(db, escaneo_cliente, parse_qr_payload(qr_data))
+    max_por_importe = max_por_importe_de(importe)
+    return EscaneoResponse(
+        **cli,
+        max_por_importe=max_por_importe,
+        max_canjeable=max(0, min(cli["puntos_disponibles"], max_por_importe)),
+        point_value=float(POINT_VALUE),
+    )
+
 @router.post("/canjear-qr", response_model=MovimientoPuntosOut, status_code=status.HTTP_201_CREATED)
-def canjear_por_qr(payload: CanjearQRRequest, db: Session = Depends(get_db)):
+async def canjear_por_qr(
+    payload: CanjearQRRequest,
+    db: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Canjea puntos usando QR + importe de la venta.
     Reglas:
       - No puedes canjear más puntos que el saldo disponible del cliente.
       - No puedes canjear más puntos de los que cubre el importe (1 punto = $POINT_VALUE).
     Si 'puntos' viene vacío, aplica el máximo permitido por reglas anteriores.
+    Con header Idempotency-Key, un reintento no vuelve a canjear.
     """
     id_cliente = parse_qr_payload(payload.qr_data)
 
-    # Saldo del cliente
-    resumen = resumen_de_cliente(db, id_cliente)
-    disponible = int(resumen["puntos_disponibles"])
-
     imp = Decimal(str(payload.importe)).quantize(Decimal("0.01"))
-    max_por_importe = int((imp / POINT_VALUE).to_integral_value(rounding=ROUND_DOWN))
-    max_canjeable = max(0, min(disponible, max_por_importe))
-
-    if max_canjeable <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No hay puntos suficientes o el importe es muy bajo para canjear."
-        )
-
-    puntos_req = payload.puntos if payload.puntos is not None else max_canjeable
-    if puntos_req <= 0:
-        raise HTTPException(status_code=400, detail="puntos debe ser > 0.")
-    if puntos_req > max_canjeable:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Máximo canjeable: {max_canjeable} puntos (saldo: {disponible}, importe: {imp})."
-        )
-
-    req = CanjearRequest(
-        id_cliente=id_cliente,
-        puntos=puntos_req,
-        descripcion=payload.descripcion,
-        referencia=(payload.referencia or "").strip() or None,
-    )
-    mov = canjear_puntos(db, req)
-    return mov
\ No newline at end of file
+    max_por_importe = max_por_importe_de(imp)
+
+    # El service lee el saldo una sola vez y valida contra él (sin resumen previo)
+    return await ejecutar_idempotente(
+        db, idempotency_key, "caja.canjear_qr", payload,
+        lambda: run_in_session(
+            db,
+            canjear_hasta,
+            id_cliente,
+            max_por_importe=max_por_importe,
+            importe=imp,
+            puntos=payload.puntos,
+            descripcion=payload.descripcion,
+            referencia=(payload.referencia or "").strip() or None,
+            id_sucursal=payload.id_sucursal,
+        ),
+        _mov_json, status_code=status.HTTP_201_CREATED,
+    )
\ No newline at end of file
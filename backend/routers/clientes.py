@@ -1,42 +1,86 @@
 # routers/clientes.py
-from fastapi import APIRouter, Depends, Query
+import io
+from datetime import datetime
+from fastapi import APIRouter, Depends, File, Query, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 from pydantic import EmailStr
 
-from db.database import get_db
-from schemas.clientes import ClienteCreate, ClienteOut
+from db.database import get_db, get_read_session, get_session, run_in_session
+from schemas.clientes import ClienteCreate, ClienteOut, ClientesPagina, OrdenClientes
+from schemas.clientes import ImportClientesResultado
 from services.clientes_service import (
     crear_cliente as svc_crear_cliente,
     listar_clientes as svc_listar_clientes,
     obtener_cliente as svc_obtener_cliente,
     eliminar_cliente as svc_eliminar_cliente,
     obtener_por_correo as svc_obtener_por_correo,
+    CLIENTES_LIMIT_MAX,
 )
+from services.import_service import FormatoImport, IMPORT_BATCH, IMPORT_BATCH_MAX, importar_clientes
 
 router = APIRouter(prefix="/clientes", tags=["Clientes"])
 
 @router.post("/", response_model=ClienteOut)
-def crear_cliente(payload: ClienteCreate, db: Session = Depends(get_db)):
-    return svc_crear_cliente(db, payload)
+async def crear_cliente(payload: ClienteCreate, db: Session = Depends(get_session)):
+    return await run_in_session(db, svc_crear_cliente, payload)
 
-@router.get("/", response_model=List[ClienteOut])
-def obtener_clientes(db: Session = Depends(get_db)):
-    return svc_listar_clientes(db)
+@router.get("/", response_model=ClientesPagina)
+async def obtener_clientes(
+    limit: int = Query(50, ge=1, le=CLIENTES_LIMIT_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    orden: OrdenClientes = Query("id", description="id | fecha_registro; prefijo '-' = descendente"),
+    desde: Optional[datetime] = Query(None, description="fecha_registro inicial (inclusiva)"),
+    hasta: Optional[datetime] = Query(None, description="fecha_registro final (exclusiva)"),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Clientes por páginas. Para la siguiente página envía el `next_cursor`
+    recibido (con el mismo `orden` y filtros); es None cuando no hay más.
+    """
+    return await run_in_session(
+        db, svc_listar_clientes,
+        limit=limit, cursor=cursor, orden=orden, desde=desde, hasta=hasta,
+    )
+
+@router.post("/import", response_model=ImportClientesResultado)
+async def importar(
+    archivo: UploadFile = File(..., description="CSV con encabezado o NDJSON"),
+    formato: Optional[FormatoImport] = Query(None, description="csv | ndjson (default: por extensión)"),
+    lote: int = Query(IMPORT_BATCH, ge=1, le=IMPORT_BATCH_MAX),
+    db: Session = Depends(get_db),
+):
+    """
+    Alta/actualización masiva de clientes desde SAP (upsert por codigo_sap o
+    correo). Las filas con error se reportan con su línea y no detienen la
+    carga. Para cargas muy grandes usa jobs/importar_clientes.py.
+    """
+    # Parseo y validación son CPU: siempre en el threadpool con una Session
+    # sync, también con DB_ASYNC=1 (run_sync correría todo en el event loop)
+    if formato is None:
+        nombre = (archivo.filename or "").lower()
+        formato = "ndjson" if nombre.endswith((".ndjson", ".jsonl")) else "csv"
+    # El archivo ya está en un SpooledTemporaryFile: se lee línea por línea
+    texto = io.TextIOWrapper(archivo.file, encoding="utf-8-sig", newline="")
+    try:
+        return await run_in_threadpool(importar_clientes, db, texto, formato=formato, lote=lote)
+    finally:
+        texto.detach()
 
 # Colocar antes de "/{cliente_id}" para evitar ambigüedad
 @router.get("/by-correo", response_model=ClienteOut)
-def obtener_cliente_por_correo(
+async def obtener_cliente_por_correo(
     correo: EmailStr = Query(..., description="Correo del cliente"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_session),
 ):
     # El service ya lanza 404 si no encuentra
-    return svc_obtener_por_correo(db, correo)
+    return await run_in_session(db, svc_obtener_por_correo, correo)
 
 @router.get("/{cliente_id}", response_model=ClienteOut)
-def obtener_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    return svc_obtener_cliente(db, cliente_id)
+async def obtener_cliente(cliente_id: int, db: Session = Depends(get_read_session)):
+    return await run_in_session(db, svc_obtener_cliente, cliente_id)
 
 @router.delete("/{cliente_id}", response_model=ClienteOut)
-def eliminar_cliente(cliente_id: int, db: Session = Depends(get_db)):
-    return svc_eliminar_cliente(db, cliente_id)
\ No newline at end of file
+async def eliminar_cliente(cliente_id: int, db: Session = Depends(get_session)):
+    return await run_in_session(db, svc_eliminar_cliente, cliente_id)
\ No newline at end of file
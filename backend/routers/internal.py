@@ -0,0 +1,72 @@
+# routers/internal.py
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from db.pool import pool_stats
+from services.cache import resumen_cache
+from services.caja_directory import caja_directory
+from services.password_hashing import password_hasher
+from utils.metrics import metricas
+
+router = APIRouter(prefix="/internal", tags=["Interno"])
+# /metrics va en la raíz, donde Prometheus lo busca por defecto
+metrics_router = APIRouter(tags=["Interno"])
+
+# Se exige INTERNAL_TOKEN en el header X-Internal-Token. Sin token configurado
+# los endpoints se niegan, salvo INTERNAL_OPEN=1 (solo desarrollo / red cerrada).
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "")
+INTERNAL_OPEN = os.getenv("INTERNAL_OPEN", "0") == "1"
+
+
+def require_internal_token(x_internal_token: str | None = Header(default=None)):
+    if INTERNAL_TOKEN:
+        if x_internal_token is not None and hmac.compare_digest(x_internal_token, INTERNAL_TOKEN):
+            return
+    elif INTERNAL_OPEN:
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado.")
+
+
+@router.get("/pool-stats", dependencies=[Depends(require_internal_token)])
+def obtener_pool_stats():
+    """
+    Estado de los pools de conexiones (lealtad, moving y async si aplica):
+    espera al sacar conexión (total / promedio / máx / histograma), conexiones
+    en uso, overflow actual y picos, timeouts e invalidaciones.
+    """
+    return {"pools": pool_stats()}
+
+
+@router.get("/cache-stats", dependencies=[Depends(require_internal_token)])
+def obtener_cache_stats():
+    """Hits / misses / invalidaciones de la caché de resumen."""
+    return {"resumen": resumen_cache.stats()}
+
+
+@router.get("/hash-stats", dependencies=[Depends(require_internal_token)])
+def obtener_hash_stats():
+    """Ocupación del pool de hashing de contraseñas y rechazos por saturación (503)."""
+    return {"password_hasher": password_hasher.stats()}
+
+
+@router.get("/caja-directory-stats", dependencies=[Depends(require_internal_token)])
+def obtener_caja_directory_stats():
+    """Tamaño y edad del snapshot de usuarios de caja, hits / misses y refrescos."""
+    return {"caja_directory": caja_directory.stats()}
+
+
+@metrics_router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_internal_token)],
+)
+def obtener_metricas():
+    """
+    Métricas en formato de texto de Prometheus: latencia, status e in-flight
+    por ruta, sentencias SQL y tiempo en BD por request, duración de
+    sentencias por engine y estado de los pools.
+    """
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
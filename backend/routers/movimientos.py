@@ -1,23 +1,39 @@
 # routers/movimientos.py
-from fastapi import APIRouter, Depends, status
+import hashlib
+from datetime import datetime
+
+import orjson
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
-from db.database import get_db
+from db.database import get_read_session, get_session, run_in_session
 from schemas.movimientos_puntos import (
     MovimientoPuntosCreate,
     MovimientoPuntosOut,
     AcumularRequest,
     CanjearRequest,
+    HistorialPagina,
+    TipoMovimientoConsulta,
 )
 from services.movimientos_service import (
     registrar_movimiento,
     acumular_puntos,
     canjear_puntos,
-    historial_de_cliente,
+    completar_historial,
+    historial_filas_db,
+    historial_paginado_async,
     resumen_de_cliente,
+    version_cliente,
+    HISTORIAL_LIMIT_MAX,
 )
+from services.archivo_service import verificar_archivo
+from services.export_service import exportar_stream, FormatoExport
+from services.idempotency import ejecutar_idempotente
+from utils.etag import cabeceras_etag, etag_coincide, etag_debil, no_modificado
+from utils.json_rapido import RespuestaJSON
 
 router = APIRouter(
     prefix="/movimientos",
@@ -27,38 +43,95 @@ router = APIRouter(
 # -----------------------------
 # Schemas de respuesta
 # -----------------------------
+def _mov_json(mov) -> dict:
+    return MovimientoPuntosOut.model_validate(mov).model_dump(mode="json")
+
+
 class ResumenResponse(BaseModel):
     cliente: str
     puntos_acumulados: int
     puntos_canjeados: int
+    puntos_vencidos: int = 0
     puntos_disponibles: int
 
 
+# -----------------------------
+# GET condicional (ver utils/etag.py)
+# -----------------------------
+def _historial_si_cambio(db: Session, id_cliente: int, if_none_match: Optional[str]):
+    """
+    (etag, (filas, pendiente)) de historial_filas_db; el segundo es None si el
+    cliente ya tiene la versión actual.
+    """
+    # Versión antes que filas: si algo se escribe en medio, el ETag queda viejo
+    # y el siguiente GET baja todo de nuevo (nunca al revés)
+    etag = etag_debil("h", version_cliente(db, id_cliente))
+    if etag_coincide(if_none_match, etag):
+        return etag, None
+    return etag, historial_filas_db(db, id_cliente)
+
+
+def _resumen_con_etag(db: Session, id_cliente: int):
+    """
+    (etag, resumen). El ETag es un hash del contenido, así que siempre se arma
+    el resumen: con la entrada en caché el 304 no toca la BD; en un miss se
+    cargan las dos búsquedas por PK del resumen igual que sin If-None-Match
+    (el 304 solo ahorra bytes). No se usa version_cliente porque el nombre
+    cambia sin movimientos (import de SAP) y ese ETag no lo vería.
+    """
+    resumen = resumen_de_cliente(db, id_cliente)
+    return etag_debil("r", hashlib.blake2b(orjson.dumps(resumen), digest_size=8).hexdigest()), resumen
+
+
 # -----------------------------
 # CRUD genérico (útil en Swagger)
 # -----------------------------
 @router.post("/", response_model=MovimientoPuntosOut, status_code=status.HTTP_201_CREATED)
-def crear_movimiento(payload: MovimientoPuntosCreate, db: Session = Depends(get_db)):
-    return registrar_movimiento(db, payload)
+async def crear_movimiento(
+    payload: MovimientoPuntosCreate,
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    return await ejecutar_idempotente(
+        db, idempotency_key, "movimientos.crear", payload,
+        lambda: run_in_session(db, registrar_movimiento, payload),
+        _mov_json, status_code=status.HTTP_201_CREATED,
+    )
 
 
 # -----------------------------
 # Acciones de dominio
 # -----------------------------
 @router.post("/acumular", response_model=MovimientoPuntosOut, status_code=status.HTTP_201_CREATED)
-def acumular(payload: AcumularRequest, db: Session = Depends(get_db)):
+async def acumular(
+    payload: AcumularRequest,
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Acumula puntos para un cliente.
     """
-    return acumular_puntos(db, payload)
+    return await ejecutar_idempotente(
+        db, idempotency_key, "movimientos.acumular", payload,
+        lambda: run_in_session(db, acumular_puntos, payload),
+        _mov_json, status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.post("/canjear", response_model=MovimientoPuntosOut, status_code=status.HTTP_201_CREATED)
-def canjear(payload: CanjearRequest, db: Session = Depends(get_db)):
+async def canjear(
+    payload: CanjearRequest,
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Canjea puntos para un cliente (valida saldo disponible).
     """
-    return canjear_puntos(db, payload)
+    return await ejecutar_idempotente(
+        db, idempotency_key, "movimientos.canjear", payload,
+        lambda: run_in_session(db, canjear_puntos, payload),
+        _mov_json, status_code=status.HTTP_201_CREATED,
+    )
 
 
 # -----------------------------
@@ -66,20 +139,86 @@ def canjear(payload: CanjearRequest, db: Session = Depends(get_db)):
 # -----------------------------
 @router.get("/historial/{id_cliente}", response_model=List[MovimientoPuntosOut])
 @router.get("/cliente/{id_cliente}/historial", response_model=List[MovimientoPuntosOut])  # legacy
-def obtener_historial(id_cliente: int, db: Session = Depends(get_db)):
+async def obtener_historial(
+    id_cliente: int,
+    db: Session = Depends(get_read_session),
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
     Devuelve el historial de movimientos de un cliente.
+    Con If-None-Match igual al ETag vigente responde 304 sin cuerpo.
     (Se exponen dos rutas por compatibilidad con el móvil legacy)
     """
-    return historial_de_cliente(db, id_cliente)
+    # Tuplas -> orjson: sin objetos ORM ni validación por fila (ver historial_filas_db)
+    etag, resultado = await run_in_session(db, _historial_si_cambio, id_cliente, if_none_match)
+    if resultado is None:
+        return no_modificado(etag)
+    return RespuestaJSON(await completar_historial(*resultado), headers=cabeceras_etag(etag))
+
+
+@router.get("/historial/{id_cliente}/paginado", response_model=HistorialPagina)
+async def obtener_historial_paginado(
+    id_cliente: int,
+    limit: int = Query(50, ge=1, le=HISTORIAL_LIMIT_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    tipo: Optional[TipoMovimientoConsulta] = None,
+    desde: Optional[datetime] = Query(None, description="Fecha inicial (inclusiva)"),
+    hasta: Optional[datetime] = Query(None, description="Fecha final (exclusiva)"),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Historial por páginas (más reciente primero). Para la siguiente página,
+    envía el `next_cursor` recibido; es None cuando no hay más.
+    """
+    return RespuestaJSON(await historial_paginado_async(
+        db, id_cliente, limit=limit, cursor=cursor, tipo=tipo, desde=desde, hasta=hasta,
+    ))
+
+
+@router.get("/export")
+async def exportar(
+    formato: FormatoExport = "csv",
+    desde: Optional[datetime] = Query(None, description="Fecha inicial (inclusiva)"),
+    hasta: Optional[datetime] = Query(None, description="Fecha final (exclusiva)"),
+    tipo: Optional[TipoMovimientoConsulta] = None,
+    id_sucursal: Optional[str] = Query(None, max_length=50),
+    cursor: Optional[str] = Query(
+        None, description="Reanuda después de la última fila recibida (ver jobs/exportar_movimientos.py)"
+    ),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Exporta movimientos en CSV o NDJSON ordenados por (fecha, id), en streaming
+    con memoria constante. Pensado para contabilidad y conciliación con SAP.
+    """
+    # 500 antes de enviar bytes si el archivo frío quedó apagado con partes registradas
+    await run_in_session(db, verificar_archivo)
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        exportar_stream(
+            db, formato=formato, desde=desde, hasta=hasta,
+            tipo=tipo, id_sucursal=id_sucursal, cursor=cursor,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="movimientos.{formato}"'},
+    )
 
 
 @router.get("/resumen/{id_cliente}", response_model=ResumenResponse)
 @router.get("/cliente/{id_cliente}/resumen", response_model=ResumenResponse)  # legacy
-def obtener_resumen(id_cliente: int, db: Session = Depends(get_db)):
+async def obtener_resumen(
+    id_cliente: int,
+    db: Session = Depends(get_read_session),
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
     Devuelve el resumen de puntos del cliente:
-    { cliente, puntos_acumulados, puntos_canjeados, puntos_disponibles }.
+    { cliente, puntos_acumulados, puntos_canjeados, puntos_vencidos, puntos_disponibles }.
+    Con If-None-Match igual al ETag vigente responde 304 sin cuerpo; el resumen
+    se lee igual (caché o BD), el 304 solo ahorra la respuesta.
     (Se exponen dos rutas por compatibilidad con el móvil legacy)
     """
-    return resumen_de_cliente(db, id_cliente)
\ No newline at end of file
+    etag, resumen = await run_in_session(db, _resumen_con_etag, id_cliente)
+    if etag_coincide(if_none_match, etag):
+        return no_modificado(etag)
+    return RespuestaJSON(resumen, headers=cabeceras_etag(etag))
\ No newline at end of file
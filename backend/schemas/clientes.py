@@ -1,5 +1,5 @@
 # schemas/clientes.py
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, constr, ConfigDict
 
@@ -38,4 +38,30 @@ class ClienteBaseOut(BaseModel):
     fecha_registro: Optional[datetime] = None
 
 # Alias para usar en routers
-ClienteOut = ClienteBaseOut
\ No newline at end of file
+ClienteOut = ClienteBaseOut
+
+# Orden del listado paginado; "-" = descendente
+OrdenClientes = Literal["id", "-id", "fecha_registro", "-fecha_registro"]
+
+class ClientesPagina(BaseModel):
+    items: List[ClienteOut]
+    # None cuando ya no hay más páginas
+    next_cursor: Optional[str] = None
+
+# -------------------------
+# Importación masiva (SAP)
+# -------------------------
+
+class RechazoImport(BaseModel):
+    linea: int
+    motivo: str
+
+class ImportClientesResultado(BaseModel):
+    procesados: int
+    aplicados: int  # altas + actualizaciones
+    rechazados: int
+    lotes: int
+    # Detalle de los primeros IMPORT_MAX_RECHAZOS rechazos
+    rechazos: List[RechazoImport]
+    segundos: float
+    filas_por_seg: float
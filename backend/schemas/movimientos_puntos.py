@@ -1,11 +1,13 @@
 # schemas/movimientos_puntos.py
 from datetime import datetime
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 
 from pydantic import BaseModel, Field, ConfigDict
 
 # Tipos permitidos para movimiento
 TipoMovimiento = Literal["acumulado", "canjeado"]
+# "vencido" solo lo genera el job de vencimiento; aparece en consultas, no se captura
+TipoMovimientoConsulta = Literal["acumulado", "canjeado", "vencido"]
 
 
 class MovimientoPuntosBase(BaseModel):
@@ -14,6 +16,7 @@ class MovimientoPuntosBase(BaseModel):
     descripcion: Optional[str] = Field(default=None, max_length=255)
     # folio/ticket único por cliente (ajusta long máx. a lo que tengas en BD)
     referencia: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    id_sucursal: Optional[str] = Field(default=None, max_length=50)
 
 
 class MovimientoPuntosCreate(MovimientoPuntosBase):
@@ -28,6 +31,7 @@ class MovimientoPuntosUpdate(BaseModel):
 
 
 class MovimientoPuntosOut(MovimientoPuntosBase):
+    tipo: TipoMovimientoConsulta
     id: int
     id_cliente: int
     fecha: datetime
@@ -36,6 +40,12 @@ class MovimientoPuntosOut(MovimientoPuntosBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class HistorialPagina(BaseModel):
+    items: List[MovimientoPuntosOut]
+    # None cuando ya no hay más páginas
+    next_cursor: Optional[str] = None
+
+
 # Esquemas “amistosos” para caja
 class AcumularRequest(BaseModel):
     id_cliente: int
@@ -43,10 +53,34 @@ class AcumularRequest(BaseModel):
     descripcion: Optional[str] = Field(default=None, max_length=255)
     # requerido para bloquear doble acumulación por ticket
     referencia: str = Field(min_length=1, max_length=64)
+    id_sucursal: Optional[str] = Field(default=None, max_length=50)
 
 
 class CanjearRequest(BaseModel):
     id_cliente: int
     puntos: int = Field(gt=0)
     descripcion: Optional[str] = Field(default=None, max_length=255)
-    referencia: Optional[str] = Field(default=None, min_length=1, max_length=64)
\ No newline at end of file
+    referencia: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    id_sucursal: Optional[str] = Field(default=None, max_length=50)
+
+# Acumulación por lote (caja / reenvíos de SAP)
+EstadoLote = Literal["creado", "duplicado", "cliente_no_encontrado", "invalido"]
+
+
+class AcumularLoteRequest(BaseModel):
+    items: List[AcumularRequest] = Field(min_length=1)
+
+
+class AcumularLoteItemOut(BaseModel):
+    indice: int
+    id_cliente: int
+    referencia: str
+    estado: EstadoLote
+
+
+class AcumularLoteResponse(BaseModel):
+    creados: int
+    duplicados: int
+    clientes_no_encontrados: int
+    invalidos: int
+    resultados: List[AcumularLoteItemOut]
@@ -0,0 +1,484 @@
+# services/archivo_service.py
+"""
+Archivo frío de movimientos: los movimientos anteriores a un horizonte
+(ARCHIVO_MESES, default 24) salen de movimientos_puntos y pasan a archivos
+columnares comprimidos, uno o más por mes.
+
+- Formato: Arrow IPC (archivo, no stream) con compresión zstd por buffer, en
+  record batches de ARCHIVO_LOTE filas. Se abre con memory map: leer un
+  cliente descomprime solo los batches que lo contienen.
+- Ruta: ARCHIVO_DIR/YYYY-MM/movimientos-<id_desde>-<id_hasta>.arrow. Las filas
+  van ordenadas por (id_cliente, fecha, id) y archivo_partes.indice guarda el
+  rango de id_cliente de cada batch.
+- Por mes, una transacción: se escribe el archivo (temporal + fsync + rename),
+  se registra en archivo_partes, se suman los totales del mes a
+  saldos_apertura y se borran las filas. Si algo falla se hace rollback y se
+  borra el archivo; un archivo que quedó sin registrar (caída entre el rename
+  y el commit) no se lee, y la siguiente corrida lo sobreescribe con el mismo
+  nombre.
+- saldos_apertura + movimientos calientes = historia completa del cliente:
+  recalcular_saldos y el vencimiento lo usan; saldos_clientes no cambia.
+- Lectores: historial_paginado / historial_filas y la exportación siguen en el
+  archivo cuando el rango lo pide. Sin ARCHIVO_DIR el archivo está apagado;
+  si aun así hay partes registradas (se archivó con otra configuración) los
+  lectores fallan con RuntimeError en vez de omitir esas filas.
+- El job escribe siempre en ARCHIVO_DIR, el mismo directorio contra el que
+  los lectores resuelven archivo_partes.archivo.
+
+Consideraciones:
+- ARCHIVO_DIR debe ser un almacenamiento compartido por todos los servidores
+  de la app (los lectores abren los archivos directamente).
+- El índice único (id_cliente, referencia, tipo) ya no ve las referencias
+  archivadas: el horizonte debe superar la ventana en que SAP puede reenviar
+  tickets, y también la vigencia de los puntos (vencer_puntos se niega a
+  cortar dentro del archivo).
+- Los archivos no se tocan al eliminar un cliente: sus filas archivadas
+  siguen apareciendo en la exportación.
+
+pyarrow es dependencia opcional (requirements-archivo.txt): solo la necesitan
+el job y los lectores cuando ARCHIVO_DIR está configurado.
+"""
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, select
+from sqlalchemy.orm import Session
+
+from models.archivo import ParteArchivo, SaldoApertura
+from models.movimientos_puntos import MovimientoPuntos
+
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR", "")
+ARCHIVO_MESES = int(os.getenv("ARCHIVO_MESES", "24"))
+ARCHIVO_LOTE = int(os.getenv("ARCHIVO_LOTE", "65536"))  # filas por record batch
+ARCHIVO_COMPRESION = "zstd"
+
+COLUMNAS_ARCHIVO = (
+    "id", "id_cliente", "tipo", "puntos", "referencia", "descripcion", "id_sucursal", "fecha",
+)
+_IN_CHUNK = 1000
+
+
+def archivo_activo() -> bool:
+    return bool(ARCHIVO_DIR)
+
+
+def _archivo_apagado() -> RuntimeError:
+    return RuntimeError(
+        "Hay movimientos en el archivo frío (archivo_partes) pero ARCHIVO_DIR no está configurado."
+    )
+
+
+def _esquema():
+    import pyarrow as pa  # dependencia opcional: solo con ARCHIVO_DIR
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("id_cliente", pa.int64()),
+        ("tipo", pa.string()),
+        ("puntos", pa.int64()),
+        ("referencia", pa.string()),
+        ("descripcion", pa.string()),
+        ("id_sucursal", pa.string()),
+        ("fecha", pa.timestamp("s")),
+    ])
+
+
+def corte_archivo(meses: int, hoy: Optional[datetime] = None) -> datetime:
+    """Primer día del mes de hace `meses` meses: se archivan meses completos."""
+    hoy = hoy or datetime.now()
+    total = hoy.year * 12 + (hoy.month - 1) - meses
+    anio, mes = divmod(total, 12)
+    return datetime(anio, mes + 1, 1)
+
+
+def _mes_siguiente(inicio: datetime) -> datetime:
+    return datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+
+
+# -----------------------------
+# Escritura (job)
+# -----------------------------
+def _escribir_parte(filas_por_lote: Iterator[Sequence[Sequence[Any]]], ruta: str) -> Dict[str, Any]:
+    """
+    Escribe el archivo de un mes (temporal + fsync + rename a `ruta`) y devuelve
+    filas, índice de batches, rango de fechas y totales por cliente.
+    """
+    import pyarrow as pa  # dependencia opcional: solo con ARCHIVO_DIR
+    import pyarrow.ipc
+
+    esquema = _esquema()
+    tmp = ruta + ".tmp"
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    meta: Dict[str, Any] = {"filas": 0, "indice": [], "totales": {}, "fechas": []}
+    opciones = pa.ipc.IpcWriteOptions(compression=ARCHIVO_COMPRESION)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, esquema, options=opciones) as w:
+            for filas in filas_por_lote:
+                columnas = list(zip(*filas))
+                w.write_batch(pa.record_batch(
+                    [pa.array(c, type=esquema.field(i).type) for i, c in enumerate(columnas)],
+                    schema=esquema,
+                ))
+                meta["filas"] += len(filas)
+                meta["indice"].append([filas[0][1], filas[-1][1]])
+                meta["fechas"] += [min(columnas[7]), max(columnas[7])]
+                for id_mov, cid, tipo, puntos, *_ in filas:
+                    t = meta["totales"].setdefault(cid, {"acumulado": 0, "canjeado": 0, "vencido": 0, "last_id": 0})
+                    t[tipo] += puntos
+                    t["last_id"] = max(t["last_id"], id_mov)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return meta
+
+
+def _sumar_aperturas(db: Session, totales: Dict[int, Dict[str, int]], corte: datetime) -> None:
+    """Suma los totales del mes a saldos_apertura (set-based, sin commit)."""
+    t = SaldoApertura.__table__
+    ids = list(totales)
+    existentes = set()
+    for i in range(0, len(ids), _IN_CHUNK):
+        existentes.update(db.scalars(select(t.c.id_cliente).where(t.c.id_cliente.in_(ids[i:i + _IN_CHUNK]))))
+
+    filas = [
+        {
+            "b_id": cid,
+            "b_acum": totales[cid]["acumulado"],
+            "b_canj": totales[cid]["canjeado"],
+            "b_venc": totales[cid]["vencido"],
+            "b_last": totales[cid]["last_id"],
+        }
+        for cid in ids
+    ]
+    actualizar = [f for f in filas if f["b_id"] in existentes]
+    if actualizar:
+        db.execute(
+            t.update()
+            .where(t.c.id_cliente == bindparam("b_id"))
+            .values(
+                acumulado=t.c.acumulado + bindparam("b_acum"),
+                canjeado=t.c.canjeado + bindparam("b_canj"),
+                vencido=t.c.vencido + bindparam("b_venc"),
+                corte=case((t.c.corte > corte, t.c.corte), else_=corte),
+                last_movimiento_id=case(
+                    (t.c.last_movimiento_id > bindparam("b_last"), t.c.last_movimiento_id),
+                    else_=bindparam("b_last"),
+                ),
+            ),
+            actualizar,
+        )
+    nuevos = [f for f in filas if f["b_id"] not in existentes]
+    if nuevos:
+        db.execute(
+            t.insert(),
+            [
+                {
+                    "id_cliente": f["b_id"],
+                    "acumulado": f["b_acum"],
+                    "canjeado": f["b_canj"],
+                    "vencido": f["b_venc"],
+                    "corte": corte,
+                    "last_movimiento_id": f["b_last"],
+                }
+                for f in nuevos
+            ],
+        )
+
+
+def _archivar_mes(db: Session, directorio: str, inicio: datetime, lote: int) -> Optional[Dict[str, Any]]:
+    m = MovimientoPuntos
+    fin = _mes_siguiente(inicio)
+    rango = (m.fecha >= inicio, m.fecha < fin)
+    id_desde, id_hasta = db.execute(select(func.min(m.id), func.max(m.id)).where(*rango)).one()
+    if id_hasta is None:
+        return None
+    # Filas insertadas mientras se escribe (p. ej. con fecha del mes) quedan para otra parte
+    rango += (m.id <= id_hasta,)
+
+    mes = f"{inicio:%Y-%m}"
+    relativo = os.path.join(mes, f"movimientos-{id_desde}-{id_hasta}.arrow")
+    ruta = os.path.join(directorio, relativo)
+    result = db.execute(
+        select(*(getattr(m, c) for c in COLUMNAS_ARCHIVO))
+        .where(*rango)
+        .order_by(m.id_cliente, m.fecha, m.id)
+        .execution_options(stream_results=True, yield_per=lote)
+    )
+    try:
+        meta = _escribir_parte(result.partitions(), ruta)
+    finally:
+        result.close()
+
+    try:
+        db.add(ParteArchivo(
+            mes=mes,
+            archivo=relativo,
+            filas=meta["filas"],
+            id_desde=id_desde,
+            id_hasta=id_hasta,
+            fecha_desde=min(meta["fechas"]),
+            fecha_hasta=max(meta["fechas"]),
+            indice=json.dumps(meta["indice"], separators=(",", ":")),
+            creado=datetime.now().replace(microsecond=0),
+        ))
+        _sumar_aperturas(db, meta["totales"], fin)
+        borradas = db.execute(delete(m).where(*rango).execution_options(synchronize_session=False)).rowcount
+        if borradas != meta["filas"]:
+            raise RuntimeError(f"{mes}: se escribieron {meta['filas']} filas pero se borrarían {borradas}")
+        db.commit()
+    except BaseException:
+        db.rollback()
+        os.remove(ruta)
+        raise
+    return {"mes": mes, "archivo": relativo, "filas": meta["filas"], "clientes": len(meta["totales"])}
+
+
+def archivar_movimientos(
+    db: Session,
+    *,
+    corte: datetime,
+    lote: int = ARCHIVO_LOTE,
+    progreso: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Archiva, mes por mes y del más viejo al más nuevo, los movimientos con
+    fecha < corte (corte debe ser el día 1 de un mes, ver corte_archivo).
+    Se puede interrumpir y volver a correr: los meses ya confirmados no tienen
+    filas calientes que archivar. `progreso` recibe el acumulado tras cada mes.
+    """
+    if not archivo_activo():
+        raise ValueError("Falta el directorio del archivo (ARCHIVO_DIR).")
+    if corte != corte.replace(day=1, hour=0, minute=0, second=0, microsecond=0):
+        raise ValueError("El corte del archivo debe ser el inicio de un mes.")
+
+    primera = db.scalar(select(func.min(MovimientoPuntos.fecha)).where(MovimientoPuntos.fecha < corte))
+    db.rollback()
+    res: Dict[str, Any] = {"corte": corte.isoformat(), "meses": 0, "filas": 0, "partes": []}
+    if primera is None:
+        return res
+
+    mes = datetime(primera.year, primera.month, 1)
+    while mes < corte:
+        parte = _archivar_mes(db, ARCHIVO_DIR, mes, lote)
+        if parte is not None:
+            res["meses"] += 1
+            res["filas"] += parte["filas"]
+            res["partes"].append(parte["archivo"])
+            if progreso is not None:
+                progreso(dict(parte))
+        mes = _mes_siguiente(mes)
+    return res
+
+
+# -----------------------------
+# Lectura
+# -----------------------------
+@lru_cache(maxsize=64)
+def _lector(ruta: str):
+    """Reader Arrow sobre memory map; los archivos no cambian una vez registrados."""
+    import pyarrow as pa  # dependencia opcional: solo con ARCHIVO_DIR
+    import pyarrow.ipc
+
+    return pa.ipc.open_file(pa.memory_map(ruta, "r"))
+
+
+def _ruta(parte: ParteArchivo) -> str:
+    return os.path.join(ARCHIVO_DIR, parte.archivo)
+
+
+def _filtrar(tabla, filtros: Sequence[Tuple[str, Any]]):
+    """Filtros sobre una tabla Arrow: (op, valor) con op "tipo", "sucursal", "desde", "hasta"."""
+    import pyarrow.compute as pc  # dependencia opcional: solo con ARCHIVO_DIR
+
+    mascara = None
+    for op, valor in filtros:
+        if op == "tipo":
+            cond = pc.equal(tabla["tipo"], valor)
+        elif op == "sucursal":
+            cond = pc.equal(tabla["id_sucursal"], valor)
+        elif op == "desde":
+            cond = pc.greater_equal(tabla["fecha"], valor)
+        elif op == "hasta":
+            cond = pc.less(tabla["fecha"], valor)
+        elif op in ("antes_de", "despues_de"):
+            c_fecha, c_id = valor
+            cmp = pc.less if op == "antes_de" else pc.greater
+            cond = pc.or_(
+                cmp(tabla["fecha"], c_fecha),
+                pc.and_(pc.equal(tabla["fecha"], c_fecha), cmp(tabla["id"], c_id)),
+            )
+        else:
+            raise ValueError(op)
+        mascara = cond if mascara is None else pc.and_(mascara, cond)
+    return tabla if mascara is None else tabla.filter(mascara)
+
+
+def _filtros(
+    *,
+    tipo: Optional[str] = None,
+    id_sucursal: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> List[Tuple[str, Any]]:
+    filtros: List[Tuple[str, Any]] = []
+    if tipo:
+        filtros.append(("tipo", tipo))
+    if id_sucursal:
+        filtros.append(("sucursal", id_sucursal))
+    if desde is not None:
+        filtros.append(("desde", desde))
+    if hasta is not None:
+        filtros.append(("hasta", hasta))
+    return filtros
+
+
+def _partes(db: Session, desde: Optional[datetime], hasta: Optional[datetime]) -> List[ParteArchivo]:
+    p = ParteArchivo
+    q = select(p)
+    if desde is not None:
+        q = q.where(p.fecha_hasta >= desde)
+    if hasta is not None:
+        q = q.where(p.fecha_desde < hasta)
+    return list(db.scalars(q.order_by(p.mes, p.id_desde)))
+
+
+def verificar_archivo(db: Session) -> None:
+    """RuntimeError si hay partes registradas y el archivo está apagado (antes de empezar un stream)."""
+    if not archivo_activo() and db.scalar(select(ParteArchivo.archivo).limit(1)) is not None:
+        raise _archivo_apagado()
+
+
+def corte_de_cliente(db: Session, id_cliente: int) -> Optional[datetime]:
+    """Todo lo archivado del cliente es anterior a esto; None si no tiene nada archivado."""
+    corte = db.scalar(select(SaldoApertura.corte).where(SaldoApertura.id_cliente == id_cliente))
+    if corte is not None and not archivo_activo():
+        raise _archivo_apagado()
+    return corte
+
+
+PlanHistorial = List[List[Tuple[str, List[int]]]]  # por mes (desc): [(ruta, [batches])]
+
+
+def plan_historial(
+    db: Session,
+    id_cliente: int,
+    *,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> PlanHistorial:
+    """
+    Parte de BD del historial archivado: qué batches de qué archivos contienen
+    al cliente, agrupados por mes del más reciente al más viejo. La lectura
+    (CPU) la hace leer_historial, fuera del event loop.
+    """
+    meses: Dict[str, List[Tuple[str, List[int]]]] = {}
+    for parte in _partes(db, desde, hasta):
+        if cursor is not None and parte.fecha_desde > cursor[0]:
+            continue
+        batches = [
+            i for i, (primero, ultimo) in enumerate(json.loads(parte.indice))
+            if primero <= id_cliente <= ultimo
+        ]
+        if batches:
+            meses.setdefault(parte.mes, []).append((_ruta(parte), batches))
+    return [meses[m] for m in sorted(meses, reverse=True)]
+
+
+def leer_historial(
+    plan: PlanHistorial,
+    id_cliente: int,
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    tipo: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Movimientos archivados del cliente, del más reciente al más viejo, como
+    dicts con COLUMNAS_ARCHIVO. `cursor` = (fecha, id) de la última fila ya
+    entregada. Solo se descomprimen los batches del plan, y se deja de leer
+    meses al juntar `limit` filas.
+    """
+    import pyarrow as pa  # dependencia opcional: solo con ARCHIVO_DIR
+    import pyarrow.compute as pc
+
+    filtros = _filtros(tipo=tipo, desde=desde, hasta=hasta)
+    if cursor is not None:
+        filtros.append(("antes_de", cursor))
+    salida: List[Dict[str, Any]] = []
+    for partes in plan:
+        batches = []
+        for ruta, indices in partes:
+            lector = _lector(ruta)
+            for i in indices:
+                b = lector.get_batch(i)
+                batches.append(b.filter(pc.equal(b["id_cliente"], id_cliente)))
+        tabla = _filtrar(pa.Table.from_batches(batches), filtros)
+        salida += tabla.sort_by([("fecha", "descending"), ("id", "descending")]).to_pylist()
+        if limit is not None and len(salida) >= limit:
+            return salida[:limit]
+    return salida
+
+
+def historial_archivado(db: Session, id_cliente: int, **filtros: Any) -> List[Dict[str, Any]]:
+    """plan_historial + leer_historial en el mismo hilo (jobs y código sync)."""
+    plan = plan_historial(
+        db, id_cliente, cursor=filtros.get("cursor"), desde=filtros.get("desde"), hasta=filtros.get("hasta")
+    )
+    return leer_historial(plan, id_cliente, **filtros)
+
+
+def partes_para_exportar(
+    db: Session,
+    *,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+) -> List[List[str]]:
+    """Archivos (rutas absolutas) a leer para el rango, agrupados por mes y en orden."""
+    partes = _partes(db, desde, hasta)
+    if partes and not archivo_activo():
+        raise _archivo_apagado()
+    meses: Dict[str, List[str]] = {}
+    for parte in partes:
+        if cursor is not None and parte.fecha_hasta < cursor[0]:
+            continue
+        meses.setdefault(parte.mes, []).append(_ruta(parte))
+    return [meses[m] for m in sorted(meses)]
+
+
+def filas_archivadas(
+    meses: List[List[str]],
+    *,
+    tamanio: int,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    **filtros: Any,
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Filas archivadas en orden (fecha, id) ascendente, en listas de hasta
+    `tamanio` tuplas con COLUMNAS_ARCHIVO. Se ordena en memoria un mes a la vez.
+    """
+    import pyarrow as pa  # dependencia opcional: solo con ARCHIVO_DIR
+
+    condiciones = _filtros(**filtros)
+    if cursor is not None:
+        condiciones.append(("despues_de", cursor))
+    for rutas in meses:
+        tabla = pa.concat_tables(_lector(r).read_all() for r in rutas)
+        tabla = _filtrar(tabla, condiciones).sort_by([("fecha", "ascending"), ("id", "ascending")])
+        for i in range(0, tabla.num_rows, tamanio):
+            parte = tabla.slice(i, tamanio)
+            yield list(zip(*(parte[c].to_pylist() for c in COLUMNAS_ARCHIVO)))
+
+
+def max_fecha_archivada(db: Session) -> Optional[datetime]:
+    return db.scalar(select(func.max(ParteArchivo.fecha_hasta)))
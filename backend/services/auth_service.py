@@ -1,42 +1,36 @@
 # services/auth_service.py
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 import hashlib
 
 from db.database import get_moving_db  # si lo usas en routers
 from models.moving_user import MovingUser  # tu modelo de Moving
+from services.caja_directory import UsuarioCaja, caja_directory
 
-def authenticate_caja_user(db_moving: Session, username: str, password: str) -> MovingUser:
-    if not username or not password:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Faltan credenciales")
+def _sha1_coincide(password: str, pass_hash: str | None) -> bool:
+    # SHA-1 hex; compara case-insensitive por seguridad (DB puede tener mayúsculas)
+    sha1_hex = hashlib.sha1(password.encode("utf-8")).hexdigest()
+    return (pass_hash or "").strip().lower() == sha1_hex
 
-    username_norm = username.strip().upper()
-
-    # Busca por USER normalizado y activo=1
-    user: MovingUser | None = (
-        db_moving.query(MovingUser)
-        .filter(
-            func.upper(MovingUser.user) == username_norm,
-            MovingUser.activo == 1
-        )
-        .first()
-    )
-    if not user:
-        # Usuario no existe o inactivo
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
 
-    # Calcula SHA-1 del password ingresado
-    sha1_hex = hashlib.sha1(password.encode("utf-8")).hexdigest()  # minúsculas
+def authenticate_caja_user(db_moving: Session, username: str, password: str) -> UsuarioCaja:
+    """
+    Autentica contra el directorio en memoria (services/caja_directory.py):
+    el snapshot resuelve el nombre y Moving solo se consulta por PK para
+    confirmar que el usuario sigue activo y con la misma contraseña.
+    """
+    if not username or not password:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Faltan credenciales")
 
-    # Compara case-insensitive por seguridad (DB puede tener mayúsculas)
-    if (user.pass_hash or "").strip().lower() != sha1_hex.lower():
+    user = caja_directory.buscar(db_moving, username, vigente=True)
+    if not user or not _sha1_coincide(password, user.pass_hash):
+        # Usuario no existe, inactivo o contraseña incorrecta
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
 
     return user
 
 
-def build_token_claims_for_caja(user: MovingUser) -> dict:
+def build_token_claims_for_caja(user: MovingUser | UsuarioCaja) -> dict:
     # nombre completo desde nombre + paterno + materno (si existen)
     nombre_parts = [p for p in [user.nombre, user.paterno, user.materno] if p]
     full_name = " ".join(nombre_parts)
@@ -0,0 +1,212 @@
+# services/cache.py
+"""
+Caché del resumen de puntos por cliente.
+
+Backends:
+- "memory": LRU acotado + TTL dentro del proceso (default).
+- "shared": almacén compartido entre workers con API tipo redis
+  (get / set(ex=) / delete). En pruebas se le pasa cualquier objeto
+  con esa API en lugar de un cliente real.
+- "off": sin caché.
+
+Config por env: RESUMEN_CACHE_BACKEND, RESUMEN_CACHE_TTL (seg),
+RESUMEN_CACHE_MAX (entradas, solo memory), CACHE_REDIS_URL (shared).
+
+La invalidación es explícita: los services llaman a invalidar() después de
+cada commit que cambia el saldo o borra al cliente. Con "memory" y varios
+workers, los demás procesos pueden servir un valor viejo hasta el TTL.
+
+Cada llave tiene un contador de generación que invalidar() incrementa (y
+clear() todas); get_or_load() no guarda lo que cargó si la generación cambió
+mientras corría el loader (el valor pudo leerse antes del commit que
+invalidó). Con "memory" el contador vive en el proceso; con "shared" vive en
+el almacén (INCR), así una invalidación en un worker también frena la carga
+en vuelo de otro. Con "shared" queda la ventana entre releer la generación y
+el SET (dos llamadas al almacén), mucho menor que la del loader.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class MemoryBackend:
+    def __init__(self, max_items: int = 10000, ttl: float = 30.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return valor
+
+    def set(self, key: str, valor: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, valor)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for k in keys:
+                self._data.pop(k, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SharedBackend:
+    """
+    Adaptador sobre un cliente tipo redis; los valores viajan como JSON.
+    `prefix` debe ser exclusivo de cada uso: clear() borra todo lo que empieza así.
+    """
+
+    def __init__(self, client: Any, ttl: float = 30.0, prefix: str = "lealtad:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, valor: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(valor), ex=max(1, int(self.ttl)))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+    def clear(self) -> None:
+        """Sube la época de las generaciones y borra los valores con SCAN + DEL (no bloquea como KEYS)."""
+        self.client.incr(self.prefix + "gen:epoca")
+        generaciones = (self.prefix + "gen:").encode()
+        lote = []
+        for k in self.client.scan_iter(match=self.prefix + "*", count=1000):
+            if (k if isinstance(k, bytes) else k.encode()).startswith(generaciones):
+                continue
+            lote.append(k)
+            if len(lote) >= 500:
+                self.client.delete(*lote)
+                lote = []
+        if lote:
+            self.client.delete(*lote)
+
+    # ---- generaciones (ver ResumenCache) ----
+    def generacion(self, ranura: int) -> Tuple[Any, Any]:
+        return tuple(self.client.mget(self.prefix + "gen:epoca", f"{self.prefix}gen:{ranura}"))
+
+    def avanzar(self, *ranuras: int) -> None:
+        for r in ranuras:
+            self.client.incr(f"{self.prefix}gen:{r}")
+
+
+# Ranuras del contador de generación. Dos clientes en la misma ranura solo
+# provocan que alguna carga no se guarde; nunca un valor viejo.
+_GENERACIONES = 4096
+
+
+class ResumenCache:
+    def __init__(self, backend: Optional[Any]):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._generacion = [0] * _GENERACIONES
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(id_cliente: int) -> str:
+        return f"resumen:{int(id_cliente)}"
+
+    def _compartida(self) -> bool:
+        return isinstance(self.backend, SharedBackend)
+
+    def get_or_load(self, id_cliente: int, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        if self.backend is None:
+            return loader()
+        clave = self._key(id_cliente)
+        ranura = int(id_cliente) % _GENERACIONES
+        if self._compartida():
+            generacion = self.backend.generacion(ranura)
+        else:
+            with self._lock:
+                generacion = self._generacion[ranura]
+        valor = self.backend.get(clave)
+        with self._lock:
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if valor is not None:
+            return dict(valor)
+        valor = loader()
+        if self._compartida():
+            if self.backend.generacion(ranura) == generacion:
+                self.backend.set(clave, dict(valor))
+            return valor
+        # Comparar y guardar bajo el lock: invalidar() sube la generación con el mismo lock
+        with self._lock:
+            if self._generacion[ranura] == generacion:
+                self.backend.set(clave, dict(valor))
+        return valor
+
+    def invalidar(self, *ids_cliente: int) -> None:
+        if self.backend is None or not ids_cliente:
+            return
+        ranuras = {int(i) % _GENERACIONES for i in ids_cliente}
+        if self._compartida():
+            self.backend.avanzar(*ranuras)
+        with self._lock:
+            for r in ranuras:
+                self._generacion[r] += 1
+            self.invalidations += len(ids_cliente)
+        self.backend.delete(*[self._key(i) for i in ids_cliente])
+
+    def clear(self) -> None:
+        if self.backend is None:
+            return
+        with self._lock:
+            self._generacion = [g + 1 for g in self._generacion]
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__ if self.backend is not None else "off",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+def crear_cache_resumen() -> ResumenCache:
+    tipo = os.getenv("RESUMEN_CACHE_BACKEND", "memory").strip().lower()
+    ttl = float(os.getenv("RESUMEN_CACHE_TTL", "30"))
+    if tipo == "off":
+        return ResumenCache(None)
+    if tipo == "shared":
+        import redis  # dependencia opcional: solo si se usa el backend compartido
+
+        return ResumenCache(SharedBackend(
+            redis.Redis.from_url(os.environ["CACHE_REDIS_URL"]), ttl=ttl, prefix="lealtad:cache:",
+        ))
+    return ResumenCache(MemoryBackend(max_items=int(os.getenv("RESUMEN_CACHE_MAX", "10000")), ttl=ttl))
+
+
+resumen_cache = crear_cache_resumen()
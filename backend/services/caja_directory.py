@@ -0,0 +1,225 @@
+# services/caja_directory.py
+"""
+Directorio en memoria de usuarios de caja (Moving).
+
+La BD de Moving no es nuestra y es lenta: en lugar de buscar al cajero por
+nombre en cada login, se guarda un snapshot de los usuarios activos indexado
+por usuario normalizado (mayúsculas) -> id, hash, rol, sucursal.
+
+Refresco (perezoso, lo dispara el login que encuentra el snapshot viejo):
+- incremental cada CAJA_DIR_REFRESH seg (60): solo usuarios con id mayor al
+  último visto (altas nuevas), una consulta barata por PK.
+- completo cada CAJA_DIR_FULL_REFRESH seg (900): recarga todo; así se
+  reflejan bajas, cambios de rol/sucursal y renombres.
+
+En un miss se consulta Moving por igualdad sobre `user` (usa el índice; con
+la collation _ci de MySQL la comparación ya ignora mayúsculas) y el usuario
+se agrega al snapshot. El login usa buscar(vigente=True): en un hit se relee
+el usuario por PK (activo, contraseña), porque el refresco incremental solo
+ve altas y una baja tardaría hasta el refresco completo en notarse.
+Si Moving falla durante un refresco se sigue sirviendo el snapshot anterior.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from models.moving_user import MovingUser
+
+logger = logging.getLogger("lealtad")
+
+_COLUMNAS = (
+    MovingUser.id_usuario,
+    MovingUser.user,
+    MovingUser.nombre,
+    MovingUser.paterno,
+    MovingUser.materno,
+    MovingUser.tipo,
+    MovingUser.pass_hash,
+    MovingUser.id_sucursal,
+)
+
+
+@dataclass(frozen=True)
+class UsuarioCaja:
+    """Copia inmutable de los campos de MovingUser que usan login y token."""
+    id_usuario: int
+    user: str
+    nombre: Optional[str]
+    paterno: Optional[str]
+    materno: Optional[str]
+    tipo: Optional[str]
+    pass_hash: Optional[str]
+    id_sucursal: Optional[str]
+
+    @classmethod
+    def desde_fila(cls, fila) -> "UsuarioCaja":
+        return cls(
+            id_usuario=fila.id_usuario,
+            user=fila.user,
+            nombre=fila.nombre,
+            paterno=fila.paterno,
+            materno=fila.materno,
+            tipo=fila.tipo,
+            pass_hash=fila.pass_hash,
+            id_sucursal=fila.id_sucursal,
+        )
+
+
+def _norm_user(username: str) -> str:
+    return (username or "").strip().upper()
+
+
+class DirectorioCaja:
+    def __init__(self, refresh_seg: float = 60.0, full_refresh_seg: float = 900.0):
+        self.refresh_seg = refresh_seg
+        self.full_refresh_seg = full_refresh_seg
+        self._usuarios: Dict[str, UsuarioCaja] = {}
+        self._max_id = 0
+        self._ultimo_refresh = 0.0
+        self._ultimo_full = 0.0
+        self._cargado = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks_encontrados = 0
+        self.refrescos_completos = 0
+        self.refrescos_incrementales = 0
+
+    # ---- refresco ----
+    def refrescar(self, db: Session, *, completo: bool = False) -> int:
+        """Recarga el snapshot desde Moving. Devuelve cuántos usuarios se leyeron."""
+        completo = completo or not self._cargado
+        q = db.query(*_COLUMNAS).filter(MovingUser.activo == 1)
+        if not completo:
+            q = q.filter(MovingUser.id_usuario > self._max_id)
+        filas = q.all()
+
+        nuevos = {
+            _norm_user(f.user): UsuarioCaja.desde_fila(f)
+            for f in filas
+            if f.user
+        }
+        ahora = time.monotonic()
+        with self._lock:
+            max_leido = max((f.id_usuario for f in filas), default=0)
+            if completo:
+                self._usuarios = nuevos
+                self._max_id = max_leido
+                self._ultimo_full = ahora
+                self.refrescos_completos += 1
+                self._cargado = True
+            else:
+                self._usuarios.update(nuevos)
+                self._max_id = max(self._max_id, max_leido)
+                self.refrescos_incrementales += 1
+            self._ultimo_refresh = ahora
+        return len(filas)
+
+    def _refrescar_si_toca(self, db: Session) -> None:
+        ahora = time.monotonic()
+        completo = not self._cargado or ahora - self._ultimo_full >= self.full_refresh_seg
+        if not completo and ahora - self._ultimo_refresh < self.refresh_seg:
+            return
+        # Un solo hilo refresca; los demás siguen con el snapshot actual
+        if not self._refresh_lock.acquire(blocking=not self._cargado):
+            return
+        try:
+            self.refrescar(db, completo=completo)
+        except Exception:
+            if not self._cargado:
+                raise
+            logger.warning("No se pudo refrescar el directorio de caja; se usa el snapshot anterior", exc_info=True)
+            with self._lock:
+                self._ultimo_refresh = ahora  # no reintentar en cada login
+        finally:
+            self._refresh_lock.release()
+
+    # ---- consultas ----
+    def _guardar(self, usuario: UsuarioCaja) -> None:
+        with self._lock:
+            self._usuarios[_norm_user(usuario.user)] = usuario
+
+    def buscar(self, db: Session, username: str, *, vigente: bool = False) -> Optional[UsuarioCaja]:
+        """
+        Usuario activo por nombre. Con vigente=True un hit del snapshot se
+        confirma contra Moving por PK (bajas y cambios de contraseña).
+        """
+        self._refrescar_si_toca(db)
+        clave = _norm_user(username)
+        usuario = self._usuarios.get(clave)
+        with self._lock:
+            if usuario is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if usuario is not None:
+            return self.recargar_usuario(db, usuario) if vigente else usuario
+
+        # Miss: alta reciente u otra capitalización. Igualdad simple => usa el índice.
+        fila = (
+            db.query(*_COLUMNAS)
+            .filter(MovingUser.user == username.strip(), MovingUser.activo == 1)
+            .first()
+        )
+        if fila is None:
+            return None
+        usuario = UsuarioCaja.desde_fila(fila)
+        self._guardar(usuario)
+        with self._lock:
+            self.fallbacks_encontrados += 1
+        return usuario
+
+    def recargar_usuario(self, db: Session, usuario: UsuarioCaja) -> Optional[UsuarioCaja]:
+        """Relee un usuario por PK; lo quita del snapshot si ya no está activo."""
+        fila = (
+            db.query(*_COLUMNAS)
+            .filter(MovingUser.id_usuario == usuario.id_usuario, MovingUser.activo == 1)
+            .first()
+        )
+        if fila is None or not fila.user:
+            with self._lock:
+                self._usuarios.pop(_norm_user(usuario.user), None)
+            return None
+        nuevo = UsuarioCaja.desde_fila(fila)
+        with self._lock:
+            self._usuarios.pop(_norm_user(usuario.user), None)
+            self._usuarios[_norm_user(nuevo.user)] = nuevo
+        return nuevo
+
+    def clear(self) -> None:
+        with self._lock:
+            self._usuarios = {}
+            self._max_id = 0
+            self._ultimo_refresh = 0.0
+            self._ultimo_full = 0.0
+            self._cargado = False
+
+    def stats(self) -> Dict[str, Any]:
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                "usuarios": len(self._usuarios),
+                "max_id": self._max_id,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fallbacks_encontrados": self.fallbacks_encontrados,
+                "refrescos_completos": self.refrescos_completos,
+                "refrescos_incrementales": self.refrescos_incrementales,
+                "edad_snapshot_seg": round(ahora - self._ultimo_full, 1) if self._cargado else None,
+            }
+
+
+def crear_directorio_caja() -> DirectorioCaja:
+    return DirectorioCaja(
+        refresh_seg=float(os.getenv("CAJA_DIR_REFRESH", "60")),
+        full_refresh_seg=float(os.getenv("CAJA_DIR_FULL_REFRESH", "900")),
+    )
+
+
+caja_directory = crear_directorio_caja()
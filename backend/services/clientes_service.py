@@ -1,24 +1,42 @@
 # services/clientes_service.py
-from typing import Optional, List, Tuple
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-import hashlib
 
+from db.database import run_in_session
+from db.replicas import marcar_escritura
 from models.clientes import Cliente
 from schemas.clientes import ClienteCreate
+from services.cache import resumen_cache
+from services.password_hashing import password_hasher
+from utils.cursor import decode_cursor, encode_cursor
+
+CLIENTES_LIMIT_MAX = 500
+
+# Columnas que expone ClienteOut: el listado no carga entidades completas
+_COLUMNAS_LISTADO = (
+    Cliente.id_cliente,
+    Cliente.nombre,
+    Cliente.correo,
+    Cliente.telefono,
+    Cliente.codigo_sap,
+    Cliente.fecha_registro,
+)
 
 # --- normalización / helpers ---
 def _norm_email(correo: str) -> str:
     return (correo or "").strip().lower()
 
 def _hash_password(plain: str) -> str:
-    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
+    # bcrypt en el pool de hashing (bloquea el hilo que llama, no el event loop)
+    return password_hasher.hash(plain)
 
 def verificar_password(plain: str, hashed: Optional[str]) -> bool:
-    if not hashed:
-        return False
-    return _hash_password(plain) == hashed
+    # Acepta bcrypt y los SHA-256 legacy
+    return password_hasher.verificar(plain, hashed)
 
 # --- CRUD básicos ---
 def crear_cliente(db: Session, payload: ClienteCreate) -> Cliente:
@@ -32,6 +50,7 @@ def crear_cliente(db: Session, payload: ClienteCreate) -> Cliente:
         db.add(obj)
         db.commit()
         db.refresh(obj)
+        marcar_escritura(obj.id_cliente)
         return obj
     except IntegrityError:
         db.rollback()
@@ -40,8 +59,59 @@ def crear_cliente(db: Session, payload: ClienteCreate) -> Cliente:
             detail="Correo o código SAP ya registrado.",
         )
 
-def listar_clientes(db: Session) -> List[Cliente]:
-    return db.query(Cliente).all()
+def listar_clientes(
+    db: Session,
+    *,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    orden: str = "id",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Listado paginado por keyset: por id_cliente (PK) o por (fecha_registro,
+    id_cliente) con el índice ix_clientes_fecha_registro_id. `orden` admite
+    "-" para descendente; `desde` es inclusivo y `hasta` exclusivo sobre
+    fecha_registro. Solo se leen las columnas de ClienteOut.
+    Devuelve {"items": [...], "next_cursor": str | None}.
+    """
+    limit = max(1, min(int(limit), CLIENTES_LIMIT_MAX))
+    desc = orden.startswith("-")
+    por_fecha = orden.lstrip("-") == "fecha_registro"
+
+    stmt = select(*_COLUMNAS_LISTADO)
+    if desde is not None:
+        stmt = stmt.where(Cliente.fecha_registro >= desde)
+    if hasta is not None:
+        stmt = stmt.where(Cliente.fecha_registro < hasta)
+
+    if por_fecha:
+        claves = (Cliente.fecha_registro, Cliente.id_cliente)
+    else:
+        claves = (Cliente.id_cliente,)
+    if cursor:
+        valores = decode_cursor(cursor, len(claves))
+        despues = (lambda col, v: col < v) if desc else (lambda col, v: col > v)
+        if por_fecha:
+            stmt = stmt.where(or_(
+                despues(claves[0], valores[0]),
+                and_(claves[0] == valores[0], despues(claves[1], valores[1])),
+            ))
+        else:
+            stmt = stmt.where(despues(claves[0], valores[0]))
+
+    filas = db.execute(
+        stmt.order_by(*(c.desc() if desc else c.asc() for c in claves)).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultimo = filas[-1]
+        next_cursor = encode_cursor(
+            [ultimo.fecha_registro, ultimo.id_cliente] if por_fecha else [ultimo.id_cliente]
+        )
+    return {"items": [dict(f._mapping) for f in filas], "next_cursor": next_cursor}
 
 def obtener_cliente(db: Session, cliente_id: int) -> Cliente:
     obj = db.query(Cliente).filter(Cliente.id_cliente == cliente_id).first()
@@ -55,13 +125,21 @@ def eliminar_cliente(db: Session, cliente_id: int) -> Cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     db.delete(obj)
     db.commit()
+    resumen_cache.invalidar(cliente_id)
+    marcar_escritura(cliente_id)
     return obj
 
 def obtener_por_correo(db: Session, correo: str) -> Optional[Cliente]:
     return db.query(Cliente).filter(Cliente.correo == _norm_email(correo)).first()
 
 # --- password & login para la app móvil ---
-def set_password_cliente(db: Session, correo: str, password: str) -> Cliente:
+def set_password_cliente(
+    db: Session, correo: str, password: str, *, password_hash: Optional[str] = None
+) -> Cliente:
+    """
+    `password_hash` permite pasar el hash ya calculado (los routers lo calculan
+    con password_hasher.hash_async antes de entrar a la sesión).
+    """
     correo_n = _norm_email(correo)
     cli = obtener_por_correo(db, correo_n)
     if not cli:
@@ -69,7 +147,7 @@ def set_password_cliente(db: Session, correo: str, password: str) -> Cliente:
     if not password or len(password.strip()) < 6:
         raise HTTPException(status_code=400, detail="La contraseña debe tener al menos 6 caracteres.")
 
-    cli.password_hash = _hash_password(password.strip())
+    cli.password_hash = password_hash or _hash_password(password.strip())
     try:
         db.add(cli)
         db.commit()
@@ -84,8 +162,39 @@ def autenticar_cliente(db: Session, correo: str, password: str) -> Optional[Clie
     cli = obtener_por_correo(db, correo_n)
     if not cli:
         return None
-    if not verificar_password(password.strip(), getattr(cli, "password_hash", None)):
+    hashed = getattr(cli, "password_hash", None)
+    if not verificar_password(password.strip(), hashed):
+        return None
+    if password_hasher.necesita_rehash(hashed):
+        _guardar_hash(db, cli, _hash_password(password.strip()))
+    return cli
+
+def _guardar_hash(db: Session, cli: Cliente, nuevo_hash: str) -> None:
+    cli.password_hash = nuevo_hash
+    try:
+        db.add(cli)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+async def login_cliente(db, correo: str, password: str) -> Optional[Cliente]:
+    """
+    Login para los routers (Session o AsyncSession). Las consultas van por
+    run_in_session y el KDF por el pool de hashing, así ni el event loop ni la
+    conexión quedan ocupados mientras corre bcrypt. Un hash legacy (SHA-256)
+    se reemplaza por bcrypt tras el primer login correcto.
+    """
+    plain = password.strip()
+    cli = await run_in_session(db, obtener_por_correo, correo)
+    if not cli:
+        return None
+    hashed = getattr(cli, "password_hash", None)
+    if not await password_hasher.verificar_async(plain, hashed):
         return None
+    if password_hasher.necesita_rehash(hashed):
+        nuevo = await password_hasher.hash_async(plain)
+        await run_in_session(db, _guardar_hash, cli, nuevo)
     return cli
 
 def get_or_create_cliente(
@@ -114,6 +223,7 @@ def get_or_create_cliente(
         db.add(nuevo)
         db.commit()
         db.refresh(nuevo)
+        marcar_escritura(nuevo.id_cliente)
         return nuevo, True
     except IntegrityError:
         db.rollback()
@@ -123,4 +233,4 @@ def get_or_create_cliente(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No se pudo crear el cliente (posible duplicado de correo/código SAP).",
-        )
\ No newline at end of file
+        )
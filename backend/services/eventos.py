@@ -0,0 +1,224 @@
+# services/eventos.py
+"""
+Eventos de saldo para la app móvil (Server-Sent Events).
+
+- BrokerEventos: pub/sub en proceso. Cada conexión SSE es una Suscripcion
+  (una asyncio.Queue acotada en el event loop del worker); publicar() se llama
+  desde los services (hilo del threadpool o el propio loop) después del commit
+  y entrega con call_soon_threadsafe, sin bloquear la escritura.
+- Backends entre workers (EVENTOS_BACKEND):
+  * "memory" (default): solo llegan los eventos publicados en el mismo
+    proceso. Con varios workers, la app ve el cambio al refrescar.
+  * "redis": publish en un canal; cada proceso con suscriptores tiene un hilo
+    que escucha el canal y reparte localmente. Dependencia opcional.
+- Conexiones inactivas baratas: una corrutina dormida en cola.get() por
+  conexión, sin polling; cada EVENTOS_KEEPALIVE seg se manda un comentario
+  para que proxies y NAT de datos móviles no corten la conexión.
+
+Los eventos son deltas ({"tipo", "puntos", ...}): si la cola de una conexión
+lenta se llena se descarta el más viejo y se avisa con un evento "resync"
+para que la app pida el resumen completo.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+EVENTOS_COLA_MAX = int(os.getenv("EVENTOS_COLA_MAX", "32"))
+EVENTOS_KEEPALIVE = float(os.getenv("EVENTOS_KEEPALIVE", "25"))
+EVENTOS_MAX_POR_CLIENTE = int(os.getenv("EVENTOS_MAX_POR_CLIENTE", "5"))
+EVENTOS_RETRY_MS = int(os.getenv("EVENTOS_RETRY_MS", "5000"))  # reconexión sugerida al cliente SSE
+
+logger = logging.getLogger("lealtad.eventos")
+
+
+class Suscripcion:
+    __slots__ = ("id_cliente", "loop", "cola", "desbordada")
+
+    def __init__(self, id_cliente: int, loop: asyncio.AbstractEventLoop, maximo: int):
+        self.id_cliente = id_cliente
+        self.loop = loop
+        self.cola: asyncio.Queue = asyncio.Queue(maximo)
+        self.desbordada = False
+
+    def _entregar(self, evento: Dict[str, Any]) -> None:
+        # Corre en el loop de la suscripción
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.desbordada = True
+        self.cola.put_nowait(evento)
+
+    async def siguiente(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Próximo evento, o None si pasaron `timeout` seg sin eventos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBackend:
+    """Pub/sub entre workers sobre un cliente tipo redis (publish / pubsub)."""
+
+    def __init__(self, client: Any, canal: str = "lealtad:eventos"):
+        self.client = client
+        self.canal = canal
+        self._hilo: Optional[threading.Thread] = None
+
+    def publicar(self, mensaje: str) -> None:
+        self.client.publish(self.canal, mensaje)
+
+    def escuchar(self, recibir: Callable[[str], None]) -> None:
+        """Arranca (una vez) el hilo que reparte lo que llega al canal."""
+        if self._hilo is not None:
+            return
+
+        def _bucle() -> None:
+            ps = self.client.pubsub(ignore_subscribe_messages=True)
+            ps.subscribe(self.canal)
+            for m in ps.listen():
+                try:
+                    recibir(m["data"].decode() if isinstance(m["data"], bytes) else m["data"])
+                except Exception:
+                    logger.exception("Evento inválido en %s", self.canal)
+
+        self._hilo = threading.Thread(target=_bucle, name="eventos-redis", daemon=True)
+        self._hilo.start()
+
+
+class BrokerEventos:
+    def __init__(self, backend: Optional[Any] = None, max_por_cliente: int = EVENTOS_MAX_POR_CLIENTE):
+        self.backend = backend
+        self.max_por_cliente = max_por_cliente
+        self._subs: Dict[int, Set[Suscripcion]] = {}
+        self._lock = threading.Lock()
+
+    # ---- conexiones ----
+    def suscribir(self, id_cliente: int) -> Suscripcion:
+        """Llamar desde el event loop. 429 si el cliente ya tiene demasiadas conexiones."""
+        sub = Suscripcion(id_cliente, asyncio.get_running_loop(), EVENTOS_COLA_MAX)
+        with self._lock:
+            subs = self._subs.setdefault(id_cliente, set())
+            if len(subs) >= self.max_por_cliente:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiadas conexiones de eventos para este cliente.",
+                )
+            subs.add(sub)
+        if self.backend is not None:
+            self.backend.escuchar(self._recibir)
+        return sub
+
+    def desuscribir(self, sub: Suscripcion) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.id_cliente)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.id_cliente]
+
+    def conexiones(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+    # ---- publicación ----
+    def publicar(self, id_cliente: int, evento: Dict[str, Any]) -> None:
+        """
+        Desde cualquier hilo, después del commit. Nunca lanza: la escritura ya
+        quedó confirmada y el evento es solo un aviso.
+        """
+        if self.backend is None:
+            self.difundir(id_cliente, evento)
+            return
+        try:
+            self.backend.publicar(json.dumps({"id_cliente": id_cliente, "evento": evento}))
+        except Exception:
+            logger.exception("No se pudo publicar el evento del cliente %s", id_cliente)
+
+    def _recibir(self, mensaje: str) -> None:
+        m = json.loads(mensaje)
+        self.difundir(int(m["id_cliente"]), m["evento"])
+
+    def difundir(self, id_cliente: int, evento: Dict[str, Any]) -> None:
+        """Fan-out a las conexiones de este proceso."""
+        with self._lock:
+            subs = tuple(self._subs.get(id_cliente, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._entregar, evento)
+            except RuntimeError:
+                self.desuscribir(sub)  # loop cerrado: la conexión ya no existe
+
+    def clear(self) -> None:
+        with self._lock:
+            self._subs.clear()
+
+
+def _sse(evento: str, datos: Dict[str, Any]) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n"
+
+
+async def stream_sse(
+    broker: "BrokerEventos", sub: Suscripcion, keepalive: float = EVENTOS_KEEPALIVE
+) -> AsyncIterator[str]:
+    """Cuerpo text/event-stream de una suscripción; la libera al cortarse la conexión."""
+    try:
+        yield f"retry: {EVENTOS_RETRY_MS}\n\n"
+        while True:
+            evento = await sub.siguiente(keepalive)
+            if evento is None:
+                yield ": keepalive\n\n"
+                continue
+            if sub.desbordada:
+                sub.desbordada = False
+                yield _sse("resync", {})
+            yield _sse("saldo", evento)
+    finally:
+        broker.desuscribir(sub)
+
+
+class RespuestaSSE(StreamingResponse):
+    """
+    StreamingResponse de una suscripción. La suscripción se toma en el
+    handler (para poder responder 429), así que se libera aquí: si el cliente
+    se va antes del primer chunk, el generador de stream_sse nunca arranca y
+    su finally no corre.
+    """
+
+    def __init__(self, broker: "BrokerEventos", sub: Suscripcion, **kwargs: Any):
+        super().__init__(
+            stream_sse(broker, sub),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            **kwargs,
+        )
+        self.broker = broker
+        self.sub = sub
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.broker.desuscribir(self.sub)
+
+
+def evento_saldo(tipo: str, puntos: int, **extra: Any) -> Dict[str, Any]:
+    """Delta de saldo: `puntos` siempre positivo; "acumulado" suma y el resto resta."""
+    return {"tipo": tipo, "puntos": int(puntos), **extra}
+
+
+def crear_broker() -> BrokerEventos:
+    tipo = os.getenv("EVENTOS_BACKEND", "memory").strip().lower()
+    if tipo == "redis":
+        import redis  # dependencia opcional: solo si se usa el backend compartido
+
+        url = os.getenv("EVENTOS_REDIS_URL") or os.environ["CACHE_REDIS_URL"]
+        return BrokerEventos(RedisBackend(redis.Redis.from_url(url)))
+    return BrokerEventos()
+
+
+broker_eventos = crear_broker()
@@ -0,0 +1,172 @@
+# services/export_service.py
+"""
+Exportación de movimientos (contabilidad / conciliación con SAP) en CSV o NDJSON.
+
+- Orden estable por (fecha, id) con el índice ix_mov_fecha_id.
+- Cursor del lado del servidor (stream_results + yield_per): memoria constante
+  sin importar cuántas filas salgan, y el encabezado se envía de inmediato.
+- Se seleccionan columnas, no entidades: nada se acumula en el identity map.
+- Reanudable: el cursor es (fecha, id) de la última fila recibida, codificado
+  con utils.cursor.encode_cursor (ver cursor_de_fila). La exportación sigue
+  justo después de esa fila, con los mismos filtros.
+- Con archivo frío (services/archivo_service.py), las filas archivadas del
+  rango salen primero (son más viejas que cualquier fila caliente), un mes a
+  la vez; el cursor vale igual en ambos lados.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterator, List, Literal, Optional, Sequence
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool
+
+from models.movimientos_puntos import MovimientoPuntos
+from services.archivo_service import filas_archivadas, partes_para_exportar
+from utils.cursor import decode_cursor, encode_cursor
+
+FormatoExport = Literal["csv", "ndjson"]
+
+EXPORT_BATCH = 2000  # filas por fetch del cursor y por chunk enviado
+
+# Mismo orden que services.archivo_service.COLUMNAS_ARCHIVO
+COLUMNAS_EXPORT = (
+    "id", "id_cliente", "tipo", "puntos", "referencia", "descripcion", "id_sucursal", "fecha",
+)
+
+
+def cursor_de_fila(fecha: datetime, id_movimiento: int) -> str:
+    """Cursor para reanudar después de la fila (fecha, id)."""
+    return encode_cursor([fecha, id_movimiento])
+
+
+def _consulta(
+    *,
+    desde: Optional[datetime],
+    hasta: Optional[datetime],
+    tipo: Optional[str],
+    id_sucursal: Optional[str],
+    cursor: Optional[str],
+):
+    m = MovimientoPuntos
+    stmt = select(*(getattr(m, c) for c in COLUMNAS_EXPORT))
+    if desde is not None:
+        stmt = stmt.where(m.fecha >= desde)
+    if hasta is not None:
+        stmt = stmt.where(m.fecha < hasta)
+    if tipo:
+        stmt = stmt.where(m.tipo == tipo)
+    if id_sucursal:
+        stmt = stmt.where(m.id_sucursal == id_sucursal)
+    if cursor:
+        c_fecha, c_id = decode_cursor(cursor, 2)
+        stmt = stmt.where(or_(m.fecha > c_fecha, and_(m.fecha == c_fecha, m.id > c_id)))
+    return (
+        stmt.order_by(m.fecha, m.id)
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH)
+    )
+
+
+def _cursor_archivo(cursor: Optional[str]):
+    return tuple(decode_cursor(cursor, 2)) if cursor else None
+
+
+def _archivadas(meses, **filtros: Any) -> Iterator[List[Sequence[Any]]]:
+    if not meses:
+        return iter(())
+    return filas_archivadas(meses, tamanio=EXPORT_BATCH, **filtros)
+
+
+def _fila_dict(fila: Sequence[Any]) -> dict:
+    d = dict(zip(COLUMNAS_EXPORT, fila))
+    d["fecha"] = d["fecha"].isoformat() if d["fecha"] is not None else None
+    return d
+
+
+def _encabezado(formato: str) -> str:
+    if formato == "csv":
+        return ",".join(COLUMNAS_EXPORT) + "\r\n"
+    return ""
+
+
+def _formatear(formato: str, filas: List[Sequence[Any]]) -> str:
+    if formato == "ndjson":
+        return "".join(
+            json.dumps(_fila_dict(f), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for f in filas
+        )
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    for f in filas:
+        d = _fila_dict(f)
+        w.writerow(d[c] for c in COLUMNAS_EXPORT)
+    return buf.getvalue()
+
+
+def exportar_movimientos(
+    db: Session,
+    *,
+    formato: FormatoExport = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    tipo: Optional[str] = None,
+    id_sucursal: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Generador de chunks de texto (uno por lote de EXPORT_BATCH filas). `desde`
+    es inclusivo y `hasta` exclusivo. Con un cursor no se repite el encabezado CSV.
+    """
+    stmt = _consulta(desde=desde, hasta=hasta, tipo=tipo, id_sucursal=id_sucursal, cursor=cursor)
+    c = _cursor_archivo(cursor)
+    meses = partes_para_exportar(db, desde=desde, hasta=hasta, cursor=c)
+    if not cursor and (h := _encabezado(formato)):
+        yield h
+    for filas in _archivadas(meses, cursor=c, desde=desde, hasta=hasta, tipo=tipo, id_sucursal=id_sucursal):
+        yield _formatear(formato, filas)
+    result = db.execute(stmt)
+    try:
+        for filas in result.partitions():
+            yield _formatear(formato, filas)
+    finally:
+        result.close()
+
+
+async def exportar_movimientos_async(
+    db: AsyncSession,
+    *,
+    formato: FormatoExport = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    tipo: Optional[str] = None,
+    id_sucursal: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Igual que exportar_movimientos, con AsyncSession.stream (cursor del servidor)."""
+    stmt = _consulta(desde=desde, hasta=hasta, tipo=tipo, id_sucursal=id_sucursal, cursor=cursor)
+    c = _cursor_archivo(cursor)
+    meses = await db.run_sync(partes_para_exportar, desde=desde, hasta=hasta, cursor=c)
+    if not cursor and (h := _encabezado(formato)):
+        yield h
+    # Lectura de archivos (memory map + descompresión): fuera del event loop
+    archivadas = _archivadas(meses, cursor=c, desde=desde, hasta=hasta, tipo=tipo, id_sucursal=id_sucursal)
+    async for filas in iterate_in_threadpool(archivadas):
+        yield _formatear(formato, filas)
+    result = await db.stream(stmt)
+    try:
+        async for filas in result.partitions():
+            yield _formatear(formato, filas)
+    finally:
+        await result.close()
+
+
+def exportar_stream(db, **kwargs: Any):
+    """Iterador adecuado a la sesión (AsyncSession -> async, Session -> sync)."""
+    if kwargs.get("cursor"):
+        decode_cursor(kwargs["cursor"], 2)  # 400 antes de empezar a enviar bytes
+    if isinstance(db, AsyncSession):
+        return exportar_movimientos_async(db, **kwargs)
+    return exportar_movimientos(db, **kwargs)
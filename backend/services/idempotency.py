@@ -0,0 +1,216 @@
+# services/idempotency.py
+"""
+Soporte de header Idempotency-Key para los POST de caja y movimientos.
+
+La caja reintenta cuando la red de la tienda falla. Con la misma clave:
+- se repite la respuesta original (status + cuerpo) sin tocar las tablas de
+  movimientos, con el header Idempotent-Replayed: true;
+- la misma clave con otro cuerpo -> 422;
+- si la solicitud original sigue en proceso -> 409.
+
+Flujo: reservar la clave (INSERT con status NULL + commit), ejecutar el caso
+de uso, guardar status y cuerpo. Solo se guardan las respuestas 2xx: un 4xx
+(HTTPException) se lanza antes de escribir y suele depender del estado (saldo
+insuficiente, cliente que aún no existe), así que se libera la reserva y el
+reintento se evalúa de nuevo.
+Con un error inesperado o una cancelación (el cliente se desconectó) el caso
+de uso pudo haber hecho commit -- el hilo del threadpool sigue corriendo --,
+así que la reserva se conserva: los reintentos reciben 409 hasta que venza.
+
+La reserva en proceso dura IDEMPOTENCY_LEASE seg (reservado_hasta): si el
+worker muere a media solicitud, pasado ese plazo un reintento toma la clave
+en vez de recibir 409 hasta que venza. Debe ser mayor que la duración máxima
+de un request.
+
+Las respuestas viven en la tabla idempotency_keys durante IDEMPOTENCY_TTL seg
+(24 h) y en un LRU en memoria (IDEMPOTENCY_CACHE_MAX entradas) que evita ir a la
+BD en los reintentos que llegan al mismo worker. La tabla se purga con
+jobs/purgar_idempotencia.py.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import bindparam, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.database import run_in_session
+from models.idempotency_keys import IdempotencyKey
+from services.cache import MemoryBackend
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_LEASE = int(os.getenv("IDEMPOTENCY_LEASE", "60"))
+IDEMPOTENCY_KEY_MAX_LEN = 100
+
+_respuestas = MemoryBackend(
+    max_items=int(os.getenv("IDEMPOTENCY_CACHE_MAX", "10000")),
+    ttl=min(IDEMPOTENCY_TTL, 600),
+)
+
+
+def _huella(payload: Any) -> str:
+    datos = payload.model_dump(mode="json") if isinstance(payload, BaseModel) else payload
+    raw = json.dumps(datos, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _validar_huella(guardada: str, huella: str) -> None:
+    if guardada != huella:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key ya usada con un cuerpo distinto.",
+        )
+
+
+def _en_proceso() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Hay otra solicitud en proceso con esta Idempotency-Key.",
+    )
+
+
+def _reservar(db: Session, endpoint: str, clave: str, huella: str) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve la respuesta guardada si la clave ya se completó; si no, reserva
+    la clave (commit) y devuelve None. Una reserva en proceso con el plazo
+    vencido se toma con un UPDATE condicional (solo un reintento la gana).
+    """
+    ahora = datetime.now()
+    lease = ahora + timedelta(seconds=IDEMPOTENCY_LEASE)
+    fila = db.get(IdempotencyKey, (endpoint, clave))
+    if fila is not None and fila.expira > ahora:
+        _validar_huella(fila.huella, huella)
+        if fila.status_code is not None:
+            return {"huella": fila.huella, "status_code": fila.status_code, "body": json.loads(fila.body)}
+        t = IdempotencyKey
+        tomada = db.execute(
+            update(t)
+            .where(
+                t.endpoint == endpoint,
+                t.clave == clave,
+                t.status_code.is_(None),
+                or_(t.reservado_hasta.is_(None), t.reservado_hasta <= ahora),
+            )
+            .values(reservado_hasta=lease)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if not tomada:
+            raise _en_proceso()
+        return None
+
+    if fila is not None:
+        db.delete(fila)  # vencida: se reutiliza la clave
+        db.flush()
+    db.add(IdempotencyKey(
+        endpoint=endpoint,
+        clave=clave,
+        huella=huella,
+        creado=ahora,
+        expira=ahora + timedelta(seconds=IDEMPOTENCY_TTL),
+        reservado_hasta=lease,
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro request reservó la misma clave entre el SELECT y el INSERT
+        db.rollback()
+        raise _en_proceso()
+    return None
+
+
+def _completar(db: Session, endpoint: str, clave: str, status_code: int, body: Any) -> None:
+    db.execute(
+        IdempotencyKey.__table__.update()
+        .where(IdempotencyKey.endpoint == endpoint, IdempotencyKey.clave == clave)
+        .values(status_code=status_code, body=json.dumps(body, ensure_ascii=False))
+    )
+    db.commit()
+
+
+def _liberar(db: Session, endpoint: str, clave: str) -> None:
+    db.rollback()
+    db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.endpoint == endpoint, IdempotencyKey.clave == clave)
+    )
+    db.commit()
+
+
+def _respuesta(guardada: Dict[str, Any], replay: bool) -> JSONResponse:
+    headers = {"Idempotent-Replayed": "true"} if replay else None
+    return JSONResponse(status_code=guardada["status_code"], content=guardada["body"], headers=headers)
+
+
+async def ejecutar_idempotente(
+    db,
+    clave: Optional[str],
+    endpoint: str,
+    payload: Any,
+    accion: Callable[[], Awaitable[Any]],
+    serializar: Callable[[Any], Any],
+    status_code: int = status.HTTP_200_OK,
+):
+    """
+    Ejecuta `accion` una sola vez por (endpoint, clave). Sin clave, devuelve el
+    resultado de `accion` tal cual (el router aplica su response_model).
+    `serializar` convierte el resultado al JSON que se guarda y se responde.
+    """
+    if clave is None:
+        return await accion()
+    clave = clave.strip()
+    if not clave or len(clave) > IDEMPOTENCY_KEY_MAX_LEN:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key inválida (1 a {IDEMPOTENCY_KEY_MAX_LEN} caracteres).",
+        )
+
+    huella = _huella(payload)
+    llave_cache = f"{endpoint}:{clave}"
+    guardada = _respuestas.get(llave_cache)
+    if guardada is not None:
+        _validar_huella(guardada["huella"], huella)
+        return _respuesta(guardada, replay=True)
+
+    guardada = await run_in_session(db, _reservar, endpoint, clave, huella)
+    if guardada is not None:
+        _respuestas.set(llave_cache, guardada)
+        return _respuesta(guardada, replay=True)
+
+    try:
+        resultado = await accion()
+        guardada = {"huella": huella, "status_code": status_code, "body": serializar(resultado)}
+    except HTTPException as e:
+        # 4xx: se lanza antes de escribir, el reintento se ejecuta de nuevo
+        if 400 <= e.status_code < 500:
+            await run_in_session(db, _liberar, endpoint, clave)
+        raise
+
+    await run_in_session(db, _completar, endpoint, clave, guardada["status_code"], guardada["body"])
+    _respuestas.set(llave_cache, guardada)
+    return _respuesta(guardada, replay=False)
+
+
+def purgar_vencidas(db: Session, lote: int = 5000) -> int:
+    """Borra claves vencidas en lotes cortos (usa el índice por expira). Devuelve cuántas borró."""
+    t = IdempotencyKey.__table__
+    borrar = delete(t).where(t.c.endpoint == bindparam("b_e"), t.c.clave == bindparam("b_c"))
+    total = 0
+    while True:
+        claves = db.execute(
+            select(t.c.endpoint, t.c.clave).where(t.c.expira <= datetime.now()).limit(lote)
+        ).all()
+        if not claves:
+            return total
+        db.execute(borrar, [{"b_e": e, "b_c": c} for e, c in claves])
+        db.commit()
+        total += len(claves)
+
+
+def limpiar_cache() -> None:
+    _respuestas.clear()
@@ -0,0 +1,303 @@
+# services/import_service.py
+"""
+Importación masiva de clientes desde SAP (CSV o NDJSON), en streaming.
+
+- Columnas: nombre, correo, telefono, codigo_sap (CSV con encabezado; en
+  NDJSON un objeto por línea). El correo se normaliza con _norm_email.
+- Upsert por codigo_sap o correo (los dos índices únicos de clientes):
+  * MySQL: INSERT multi-fila ... ON DUPLICATE KEY UPDATE, una sentencia por lote.
+  * Otros motores (sqlite en pruebas): set-based como acumular_lote, un SELECT
+    por lote para ubicar existentes + UPDATE/INSERT con executemany.
+  Un cliente existente conserva contraseña y fecha de registro; telefono y
+  codigo_sap vacíos no borran los que ya tenía.
+- Commit por lote (IMPORT_BATCH filas). Las filas inválidas, repetidas en el
+  archivo o en conflicto (correo de un cliente y codigo_sap de otro) se
+  reportan con su número de línea y no detienen la carga: si un lote falla en
+  la BD se reintenta fila por fila para aislar solo las que chocan.
+
+La validación del correo es la misma que la de EmailStr, pero la parte cara
+(el dominio) se valida una vez por dominio: con email_validator fila por fila
+la carga no pasa de ~8 mil filas/seg.
+"""
+import csv
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple
+
+from email_validator import EmailNotValidError, validate_email
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.replicas import marcar_escritura
+from models.clientes import Cliente
+from services.cache import resumen_cache
+from services.clientes_service import _norm_email
+
+FormatoImport = Literal["csv", "ndjson"]
+
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "2000"))
+IMPORT_BATCH_MAX = 10000
+IMPORT_MAX_RECHAZOS = 1000  # rechazos detallados en el resultado (el conteo es total)
+
+_COLUMNAS = ("nombre", "correo", "telefono", "codigo_sap")
+_MAX_LEN = {"nombre": 120, "correo": 255, "telefono": 20, "codigo_sap": 50}
+
+# dot-atom ASCII de RFC 5322: lo que email_validator acepta sin normalizar
+_LOCAL_RE = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
+Fila = Tuple[int, Dict[str, Optional[str]]]  # (línea, valores)
+
+
+# -----------------------------
+# Lectura y validación
+# -----------------------------
+@lru_cache(maxsize=4096)
+def _dominio_valido(dominio: str) -> bool:
+    try:
+        validate_email(f"a@{dominio}", check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def _correo_valido(correo: str) -> bool:
+    local, arroba, dominio = correo.rpartition("@")
+    if arroba and len(correo) <= 254 and len(local) <= 64 and _LOCAL_RE.fullmatch(local):
+        return _dominio_valido(dominio)
+    # Unicode, comillas, etc.: validación completa
+    try:
+        validate_email(correo, check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def _texto(valor: Any) -> Optional[str]:
+    if valor is None:
+        return None
+    v = str(valor).strip()
+    return v or None
+
+
+def _validar_fila(datos: Dict[str, Any]) -> Tuple[Optional[Dict[str, Optional[str]]], Optional[str]]:
+    """(valores normalizados, None) o (None, motivo del rechazo)."""
+    fila = {c: _texto(datos.get(c)) for c in _COLUMNAS}
+    if not fila["nombre"]:
+        return None, "nombre vacío"
+    if not fila["correo"]:
+        return None, "correo vacío"
+    fila["correo"] = _norm_email(fila["correo"])
+    for c in _COLUMNAS:
+        if fila[c] is not None and len(fila[c]) > _MAX_LEN[c]:
+            return None, f"{c} excede {_MAX_LEN[c]} caracteres"
+    if not _correo_valido(fila["correo"]):
+        return None, "correo inválido"
+    return fila, None
+
+
+def leer_filas(lineas: Iterable[str], formato: FormatoImport) -> Iterator[Tuple[int, Any]]:
+    """
+    (número de línea, dict) por registro; si la línea no se puede leer,
+    (número de línea, str con el motivo). No carga el archivo en memoria.
+    """
+    if formato == "ndjson":
+        for n, linea in enumerate(lineas, 1):
+            if not linea.strip():
+                continue
+            try:
+                d = json.loads(linea)
+            except ValueError:
+                yield n, "JSON inválido"
+                continue
+            yield n, d if isinstance(d, dict) else "se esperaba un objeto JSON"
+        return
+
+    lector = csv.DictReader(lineas)
+    encabezado = [(c or "").strip().lower() for c in (lector.fieldnames or [])]
+    faltan = [c for c in ("nombre", "correo") if c not in encabezado]
+    if faltan:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Faltan columnas en el encabezado CSV: {', '.join(faltan)}.",
+        )
+    lector.fieldnames = encabezado
+    for d in lector:
+        yield lector.line_num, d
+
+
+# -----------------------------
+# Escritura por lote
+# -----------------------------
+def _existentes(db: Session, filas: List[Fila]):
+    """(id_cliente, correo, codigo_sap) de los clientes que el lote puede actualizar."""
+    t = Cliente.__table__
+    correos = [v["correo"] for _, v in filas]
+    saps = [v["codigo_sap"] for _, v in filas if v["codigo_sap"]]
+    cond = t.c.correo.in_(correos)
+    if saps:
+        cond = or_(cond, t.c.codigo_sap.in_(saps))
+    return db.execute(select(t.c.id_cliente, t.c.correo, t.c.codigo_sap).where(cond)).all()
+
+
+def _upsert_mysql(db: Session, filas: List[Fila]) -> Tuple[List[Tuple[int, str]], Set[int]]:
+    # Los ids solo hacen falta para invalidar la caché del resumen tras el commit
+    tocados = {cid for cid, _, _ in _existentes(db, filas)}
+    stmt = mysql_insert(Cliente.__table__).values([v for _, v in filas])
+    nuevo = stmt.inserted
+    db.execute(stmt.on_duplicate_key_update(
+        nombre=nuevo.nombre,
+        correo=nuevo.correo,
+        telefono=func.coalesce(nuevo.telefono, Cliente.__table__.c.telefono),
+        codigo_sap=func.coalesce(nuevo.codigo_sap, Cliente.__table__.c.codigo_sap),
+    ))
+    return [], tocados
+
+
+def _upsert_generico(db: Session, filas: List[Fila]) -> Tuple[List[Tuple[int, str]], Set[int]]:
+    t = Cliente.__table__
+    por_correo: Dict[str, int] = {}
+    por_sap: Dict[str, int] = {}
+    for cid, correo, sap in _existentes(db, filas):
+        por_correo[correo] = cid
+        if sap:
+            por_sap[sap] = cid
+
+    rechazos: List[Tuple[int, str]] = []
+    nuevos: List[Dict[str, Any]] = []
+    cambios: List[Dict[str, Any]] = []
+    tocados: Set[int] = set()
+    for linea, v in filas:
+        a = por_correo.get(v["correo"])
+        b = por_sap.get(v["codigo_sap"]) if v["codigo_sap"] else None
+        if a is not None and b is not None and a != b:
+            rechazos.append((linea, "el correo y el codigo_sap pertenecen a clientes distintos"))
+            continue
+        destino = a if a is not None else b
+        if destino is None:
+            nuevos.append(v)
+        elif destino in tocados:
+            rechazos.append((linea, "otra fila del archivo ya actualiza a este cliente"))
+        else:
+            tocados.add(destino)
+            cambios.append({"b_id": destino, **v})
+
+    if cambios:
+        db.execute(
+            update(t).where(t.c.id_cliente == bindparam("b_id")).values(
+                nombre=bindparam("nombre"),
+                correo=bindparam("correo"),
+                telefono=func.coalesce(bindparam("telefono"), t.c.telefono),
+                codigo_sap=func.coalesce(bindparam("codigo_sap"), t.c.codigo_sap),
+            ),
+            cambios,
+        )
+    if nuevos:
+        db.execute(insert(t), nuevos)
+    return rechazos, tocados
+
+
+def _aplicar_lote(db: Session, filas: List[Fila]) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Upsert + commit del lote. Devuelve (filas aplicadas, rechazos). Tras el
+    commit invalida el resumen en caché de los clientes actualizados (el
+    nombre sale en el resumen), como update_cliente.
+    """
+    upsert = _upsert_mysql if db.get_bind().dialect.name == "mysql" else _upsert_generico
+    try:
+        rechazos, tocados = upsert(db, filas)
+        db.commit()
+        aplicadas = len(filas) - len(rechazos)
+    except IntegrityError:
+        db.rollback()
+        # Algo del lote choca con otro cliente (o una carga concurrente): fila por fila
+        aplicadas, rechazos, tocados = 0, [], set()
+        for linea, v in filas:
+            try:
+                with db.begin_nested():
+                    r, t = upsert(db, [(linea, v)])
+            except IntegrityError:
+                r, t = [(linea, "conflicto de correo o codigo_sap con otro cliente")], set()
+            if r:
+                rechazos.extend(r)
+            else:
+                aplicadas += 1
+                tocados |= t
+        db.commit()
+    if tocados:
+        resumen_cache.invalidar(*tocados)
+        marcar_escritura(*tocados)
+    return aplicadas, rechazos
+
+
+def importar_clientes(
+    db: Session,
+    lineas: Iterable[str],
+    *,
+    formato: FormatoImport = "csv",
+    lote: int = IMPORT_BATCH,
+    on_rechazo: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progreso: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Importa clientes desde `lineas` (archivo de texto abierto, o cualquier
+    iterable de líneas). `on_rechazo` recibe cada rechazo {"linea", "motivo"};
+    `progreso` el acumulado tras cada lote confirmado.
+    """
+    lote = max(1, min(int(lote), IMPORT_BATCH_MAX))
+    t0 = time.perf_counter()
+    res: Dict[str, Any] = {"procesados": 0, "aplicados": 0, "rechazados": 0, "lotes": 0, "rechazos": []}
+    vistos_correo: Set[str] = set()
+    vistos_sap: Set[str] = set()
+
+    def rechazar(linea: int, motivo: str) -> None:
+        res["rechazados"] += 1
+        r = {"linea": linea, "motivo": motivo}
+        if len(res["rechazos"]) < IMPORT_MAX_RECHAZOS:
+            res["rechazos"].append(r)
+        if on_rechazo is not None:
+            on_rechazo(r)
+
+    def confirmar(pendientes: List[Fila]) -> None:
+        aplicadas, rechazos = _aplicar_lote(db, pendientes)
+        res["aplicados"] += aplicadas
+        res["lotes"] += 1
+        for linea, motivo in rechazos:
+            rechazar(linea, motivo)
+        if progreso is not None:
+            progreso({k: v for k, v in res.items() if k != "rechazos"})
+
+    pendientes: List[Fila] = []
+    for linea, datos in leer_filas(lineas, formato):
+        res["procesados"] += 1
+        if isinstance(datos, str):
+            rechazar(linea, datos)
+            continue
+        fila, motivo = _validar_fila(datos)
+        if fila is None:
+            rechazar(linea, motivo)
+            continue
+        # Una fila por cliente en todo el archivo: así el resultado no depende del lote
+        if fila["correo"] in vistos_correo or (fila["codigo_sap"] and fila["codigo_sap"] in vistos_sap):
+            rechazar(linea, "correo o codigo_sap repetido en el archivo")
+            continue
+        vistos_correo.add(fila["correo"])
+        if fila["codigo_sap"]:
+            vistos_sap.add(fila["codigo_sap"])
+
+        pendientes.append((linea, fila))
+        if len(pendientes) >= lote:
+            confirmar(pendientes)
+            pendientes = []
+    if pendientes:
+        confirmar(pendientes)
+
+    segundos = time.perf_counter() - t0
+    res["segundos"] = round(segundos, 3)
+    res["filas_por_seg"] = round(res["procesados"] / segundos, 1) if segundos else 0.0
+    return res
@@ -1,20 +1,43 @@
 # services/movimientos_service.py
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, lazyload
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update, insert, case, delete, and_, or_, bindparam
 from sqlalchemy.exc import IntegrityError, DataError
 
 from models.movimientos_puntos import MovimientoPuntos
 from models.clientes import Cliente
+from models.saldos_clientes import SaldoCliente
+from models.archivo import SaldoApertura
 from schemas.movimientos_puntos import (
     MovimientoPuntosCreate,
+    MovimientoPuntosOut,
     AcumularRequest,
     CanjearRequest,
 )
+from utils.cursor import encode_cursor, decode_cursor
+from db.database import run_in_session
+from db.replicas import marcar_escritura
+from services.archivo_service import corte_de_cliente, leer_historial, plan_historial
+from services.cache import resumen_cache
+from services.eventos import broker_eventos, evento_saldo
 
 MOV_TIPOS_VALIDOS = {"acumulado", "canjeado"}
+# Filtros de consulta: además los "vencido" que escribe services/vencimiento_service.py
+MOV_TIPOS_CONSULTA = MOV_TIPOS_VALIDOS | {"vencido"}
 MAX_REF_LEN = 64  # debe coincidir con la columna en el modelo (String(64))
+HISTORIAL_LIMIT_MAX = 200
+LOTE_MAX_ITEMS = 5000  # máximo de tickets por request de lote
+LOTE_CHUNK = 500  # filas por INSERT multi-fila / transacción
+_IN_CHUNK = 1000  # tamaño máximo de listas IN (...)
+
+# Columnas de salida del historial, en el orden de MovimientoPuntosOut
+HISTORIAL_CAMPOS = tuple(MovimientoPuntosOut.model_fields)
+_COLUMNAS_HISTORIAL = tuple(getattr(MovimientoPuntos, c) for c in HISTORIAL_CAMPOS)
 
 
 # -----------------------------
@@ -29,13 +52,21 @@ def _validar_cliente(db: Session, id_cliente: int) -> Cliente:
     return cli
 
 
+def _ahora() -> datetime:
+    """
+    Fecha del movimiento a resolución de segundo (igual que DATETIME en MySQL).
+    Se fija desde la app para que el cursor (fecha, id) compare igual en cualquier motor.
+    """
+    return datetime.now().replace(microsecond=0)
+
+
 def _norm_tipo(tipo: str) -> str:
     return (tipo or "").strip().lower()
 
 
-def _validar_tipo(tipo: str) -> str:
+def _validar_tipo(tipo: str, validos: Iterable[str] = MOV_TIPOS_VALIDOS) -> str:
     t = _norm_tipo(tipo)
-    if t not in MOV_TIPOS_VALIDOS:
+    if t not in validos:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Tipo inválido"
         )
@@ -59,113 +90,310 @@ def _validar_referencia(referencia: Optional[str]) -> Optional[str]:
     return ref
 
 
-def _existe_referencia(
-    db: Session, id_cliente: int, referencia: Optional[str], tipo: Optional[str] = None
-) -> bool:
+def _totales_cliente(db: Session, id_cliente: int) -> Dict[str, int]:
     """
-    Verifica existencia de (id_cliente, referencia[, tipo]).
-    IMPORTANTE: convertir el resultado a bool; no usar `is True` porque `1 is True` es False.
+    Lee el saldo materializado (búsqueda por PK en saldos_clientes).
+    Si el cliente aún no tiene movimientos, no hay fila y el saldo es 0.
     """
-    ref = _validar_referencia(referencia)
-    if not ref:
-        return False
+    row = db.execute(
+        select(
+            SaldoCliente.acumulado,
+            SaldoCliente.canjeado,
+            SaldoCliente.vencido,
+            SaldoCliente.disponible,
+        ).where(SaldoCliente.id_cliente == id_cliente)
+    ).first()
+    if row is None:
+        return {"acumulado": 0, "canjeado": 0, "vencido": 0, "disponible": 0}
+
+    return {
+        "acumulado": int(row.acumulado),
+        "canjeado": int(row.canjeado),
+        "vencido": int(row.vencido),
+        "disponible": int(row.disponible),
+    }
 
-    q = db.query(MovimientoPuntos).filter(
-        MovimientoPuntos.id_cliente == id_cliente,
-        MovimientoPuntos.referencia == ref,
+
+def _aplicar_saldo(
+    db: Session, id_cliente: int, tipo: str, puntos: int, movimiento_id: int
+) -> None:
+    """
+    Aplica el movimiento al saldo materializado dentro de la transacción en curso
+    (no hace commit). Primero intenta un UPDATE incremental; si el cliente aún no
+    tiene fila de saldo, la crea.
+    """
+    d_acum = puntos if tipo == "acumulado" else 0
+    d_canj = puntos if tipo == "canjeado" else 0
+    d_venc = puntos if tipo == "vencido" else 0
+
+    stmt = (
+        update(SaldoCliente)
+        .where(SaldoCliente.id_cliente == id_cliente)
+        .values(
+            acumulado=SaldoCliente.acumulado + d_acum,
+            canjeado=SaldoCliente.canjeado + d_canj,
+            vencido=SaldoCliente.vencido + d_venc,
+            disponible=SaldoCliente.disponible + d_acum - d_canj - d_venc,
+            last_movimiento_id=movimiento_id,
+        )
+        .execution_options(synchronize_session=False)
     )
-    if tipo:
-        q = q.filter(MovimientoPuntos.tipo == _norm_tipo(tipo))
+    if db.execute(stmt).rowcount:
+        return
 
-    # En SQLAlchemy 1.4/2.0, .scalar() devuelve 1/0 (o True/False). Convierte a bool explícitamente.
-    return bool(db.query(q.exists()).scalar())
+    try:
+        # SAVEPOINT: si otra transacción creó la fila en paralelo, reintentamos el UPDATE
+        with db.begin_nested():
+            db.add(
+                SaldoCliente(
+                    id_cliente=id_cliente,
+                    acumulado=d_acum,
+                    canjeado=d_canj,
+                    vencido=d_venc,
+                    disponible=d_acum - d_canj - d_venc,
+                    last_movimiento_id=movimiento_id,
+                )
+            )
+    except IntegrityError:
+        db.execute(stmt)
 
 
-def _totales_cliente(db: Session, id_cliente: int) -> Dict[str, int]:
-    acumulado = (
-        db.query(func.coalesce(func.sum(MovimientoPuntos.puntos), 0))
-        .filter(
-            MovimientoPuntos.id_cliente == id_cliente,
-            MovimientoPuntos.tipo == "acumulado",
+def _descontar_saldo(db: Session, id_cliente: int, puntos: int, movimiento_id: int) -> bool:
+    """
+    Canje contra el saldo materializado: UPDATE condicional que solo descuenta si
+    el disponible alcanza. El WHERE se evalúa con el lock de la fila de saldo, así
+    que dos canjes del mismo cliente se serializan (el segundo ve el saldo ya
+    descontado) y los de clientes distintos no se bloquean entre sí.
+    Devuelve False si no alcanzó (o si el cliente no tiene saldo).
+    """
+    stmt = (
+        update(SaldoCliente)
+        .where(SaldoCliente.id_cliente == id_cliente, SaldoCliente.disponible >= puntos)
+        .values(
+            canjeado=SaldoCliente.canjeado + puntos,
+            disponible=SaldoCliente.disponible - puntos,
+            last_movimiento_id=movimiento_id,
         )
-        .scalar()
-        or 0
+        .execution_options(synchronize_session=False)
     )
+    return bool(db.execute(stmt).rowcount)
 
-    canjeado = (
-        db.query(func.coalesce(func.sum(MovimientoPuntos.puntos), 0))
-        .filter(
-            MovimientoPuntos.id_cliente == id_cliente,
-            MovimientoPuntos.tipo == "canjeado",
+
+def _aplicar_saldos_lote(db: Session, tipo: str, deltas: Dict[int, int]) -> None:
+    """
+    Versión set-based de _aplicar_saldo para muchos clientes a la vez
+    (no hace commit). `deltas` = {id_cliente: puntos}. last_movimiento_id se toma
+    del MAX(id) del cliente, ya con los movimientos del lote insertados.
+    """
+    if not deltas:
+        return
+    t = SaldoCliente.__table__
+    m = MovimientoPuntos.__table__
+    d_acum = 1 if tipo == "acumulado" else 0
+    d_canj = 1 if tipo == "canjeado" else 0
+    d_venc = 1 if tipo == "vencido" else 0
+
+    ids = list(deltas)
+    con_saldo = set()
+    for i in range(0, len(ids), _IN_CHUNK):
+        con_saldo.update(
+            db.scalars(select(t.c.id_cliente).where(t.c.id_cliente.in_(ids[i:i + _IN_CHUNK])))
+        )
+
+    existentes = [{"b_id": cid, "b_p": deltas[cid]} for cid in ids if cid in con_saldo]
+    if existentes:
+        db.execute(
+            t.update()
+            .where(t.c.id_cliente == bindparam("b_id"))
+            .values(
+                acumulado=t.c.acumulado + bindparam("b_p") * d_acum,
+                canjeado=t.c.canjeado + bindparam("b_p") * d_canj,
+                vencido=t.c.vencido + bindparam("b_p") * d_venc,
+                disponible=t.c.disponible + bindparam("b_p") * (d_acum - d_canj - d_venc),
+                last_movimiento_id=(
+                    select(func.max(m.c.id))
+                    .where(m.c.id_cliente == t.c.id_cliente)
+                    .scalar_subquery()
+                ),
+            ),
+            existentes,
         )
-        .scalar()
-        or 0
+
+    nuevos = [cid for cid in ids if cid not in con_saldo]
+    for i in range(0, len(nuevos), _IN_CHUNK):
+        parte = nuevos[i:i + _IN_CHUNK]
+        last_ids = dict(
+            db.execute(
+                select(m.c.id_cliente, func.max(m.c.id))
+                .where(m.c.id_cliente.in_(parte))
+                .group_by(m.c.id_cliente)
+            ).all()
+        )
+        db.execute(
+            t.insert(),
+            [
+                {
+                    "id_cliente": cid,
+                    "acumulado": deltas[cid] * d_acum,
+                    "canjeado": deltas[cid] * d_canj,
+                    "vencido": deltas[cid] * d_venc,
+                    "disponible": deltas[cid] * (d_acum - d_canj - d_venc),
+                    "last_movimiento_id": last_ids.get(cid),
+                }
+                for cid in parte
+            ],
+        )
+
+
+def recalcular_saldos(db: Session, ids_cliente: Optional[Iterable[int]] = None) -> int:
+    """
+    Reconstruye saldos_clientes a partir de movimientos_puntos más los saldos de
+    apertura de lo archivado (backfill / reparación). Si no se pasan ids,
+    recalcula todos. Devuelve cuántos saldos se escribieron.
+    """
+    ids = list(ids_cliente) if ids_cliente is not None else None
+
+    q = select(
+        MovimientoPuntos.id_cliente,
+        func.coalesce(
+            func.sum(case((MovimientoPuntos.tipo == "acumulado", MovimientoPuntos.puntos), else_=0)), 0
+        ).label("acumulado"),
+        func.coalesce(
+            func.sum(case((MovimientoPuntos.tipo == "canjeado", MovimientoPuntos.puntos), else_=0)), 0
+        ).label("canjeado"),
+        func.coalesce(
+            func.sum(case((MovimientoPuntos.tipo == "vencido", MovimientoPuntos.puntos), else_=0)), 0
+        ).label("vencido"),
+        func.max(MovimientoPuntos.id).label("last_id"),
+    ).group_by(MovimientoPuntos.id_cliente)
+
+    a = SaldoApertura
+    apertura = select(
+        a.id_cliente, a.acumulado, a.canjeado, a.vencido, a.last_movimiento_id.label("last_id")
     )
 
-    return {
-        "acumulado": int(acumulado),
-        "canjeado": int(canjeado),
-        "disponible": int(acumulado) - int(canjeado),
-    }
+    borrar = delete(SaldoCliente)
+    if ids is not None:
+        q = q.where(MovimientoPuntos.id_cliente.in_(ids))
+        apertura = apertura.where(a.id_cliente.in_(ids))
+        borrar = borrar.where(SaldoCliente.id_cliente.in_(ids))
+
+    totales: Dict[int, Dict[str, Any]] = {}
+    for r in [*db.execute(apertura), *db.execute(q)]:
+        t = totales.setdefault(r.id_cliente, {"acumulado": 0, "canjeado": 0, "vencido": 0, "last_id": None})
+        t["acumulado"] += int(r.acumulado)
+        t["canjeado"] += int(r.canjeado)
+        t["vencido"] += int(r.vencido)
+        if r.last_id is not None:
+            t["last_id"] = max(t["last_id"] or 0, r.last_id)
+    filas = [
+        {
+            "id_cliente": cid,
+            "acumulado": t["acumulado"],
+            "canjeado": t["canjeado"],
+            "vencido": t["vencido"],
+            "disponible": t["acumulado"] - t["canjeado"] - t["vencido"],
+            "last_movimiento_id": t["last_id"],
+        }
+        for cid, t in totales.items()
+    ]
+
+    db.execute(borrar.execution_options(synchronize_session=False))
+    if filas:
+        db.execute(SaldoCliente.__table__.insert(), filas)
+    db.commit()
+    if ids is None:
+        resumen_cache.clear()
+    else:
+        resumen_cache.invalidar(*ids)
+        marcar_escritura(*ids)
+    return len(filas)
 
 
 # -----------------------------
 # Casos de uso (API)
 # -----------------------------
-def registrar_movimiento(db: Session, mov: MovimientoPuntosCreate) -> MovimientoPuntos:
+def _insertar_movimiento(
+    db: Session,
+    *,
+    id_cliente: int,
+    tipo: str,
+    puntos: int,
+    descripcion: Optional[str],
+    referencia: Optional[str],
+    detalle_409: str,
+    id_sucursal: Optional[str] = None,
+    detalle_saldo: str = "Saldo insuficiente para canje",
+) -> MovimientoPuntos:
     """
-    Crea un movimiento genérico. Para acumulados, bloquea duplicado por (id_cliente, referencia[, tipo]).
+    INSERT del movimiento + UPDATE del saldo + COMMIT, sin lecturas previas:
+    la existencia del cliente la valida la FK y la duplicidad el índice único
+    (id_cliente, referencia, tipo). Solo si el INSERT falla se consulta al
+    cliente, para distinguir 404 de 409.
+    Los canjes descuentan con un UPDATE condicional (_descontar_saldo): si entre
+    la validación y el UPDATE otro canje consumió el saldo, se hace rollback y
+    se responde 400 con `detalle_saldo`; el saldo nunca queda negativo.
+    No hay refresh posterior: id y fecha ya se conocen tras el flush.
     """
-    _validar_cliente(db, mov.id_cliente)
-    tipo = _validar_tipo(mov.tipo)
-    referencia = _validar_referencia(mov.referencia)
-
-    # Regla de duplicidad: solo bloqueamos acumulados por la misma referencia
-    if tipo == "acumulado" and _existe_referencia(
-        db, mov.id_cliente, referencia, tipo="acumulado"
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Este ticket ya fue acumulado para este cliente.",
-        )
-
     obj = MovimientoPuntos(
-        id(cliente=mov.id_cliente),
-        id_cliente=mov.id_cliente,
+        id_cliente=id_cliente,
         tipo=tipo,
-        puntos=mov.puntos,
-        descripcion=mov.descripcion,
+        puntos=puntos,
+        descripcion=descripcion,
         referencia=referencia,
+        id_sucursal=id_sucursal,
+        fecha=_ahora(),
     )
-
     db.add(obj)
     try:
+        db.flush()
+        if tipo == "canjeado":
+            if not _descontar_saldo(db, id_cliente, puntos, obj.id):
+                db.rollback()
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detalle_saldo)
+        else:
+            _aplicar_saldo(db, id_cliente, tipo, puntos, obj.id)
         db.commit()
     except IntegrityError:
         db.rollback()
-        # Por si el índice único a nivel DB saltó (condición de carrera).
-        # Ajusta el mensaje a tu política:
-        # - Si el índice único es (id_cliente, referencia, tipo): este mensaje es correcto para 'acumulado'.
-        # - Si es (id_cliente, referencia): también bloqueará canjes con misma referencia.
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Este ticket ya fue acumulado para este cliente.",
-        )
+        _validar_cliente(db, id_cliente)  # 404 si la FK fue la que saltó
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detalle_409)
     except DataError as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Datos inválidos"
         ) from e
 
-    db.refresh(obj)
+    resumen_cache.invalidar(id_cliente)
+    marcar_escritura(id_cliente)
+    broker_eventos.publicar(
+        id_cliente, evento_saldo(tipo, puntos, movimiento_id=obj.id, fecha=obj.fecha.isoformat())
+    )
     return obj
 
 
+def registrar_movimiento(db: Session, mov: MovimientoPuntosCreate) -> MovimientoPuntos:
+    """
+    Crea un movimiento genérico. Los duplicados por (id_cliente, referencia, tipo)
+    los bloquea el índice único.
+    """
+    return _insertar_movimiento(
+        db,
+        id_cliente=mov.id_cliente,
+        tipo=_validar_tipo(mov.tipo),
+        puntos=mov.puntos,
+        descripcion=mov.descripcion,
+        referencia=_validar_referencia(mov.referencia),
+        detalle_409="Este ticket ya fue acumulado para este cliente.",
+        id_sucursal=mov.id_sucursal,
+    )
+
+
 def acumular_puntos(db: Session, data: AcumularRequest) -> MovimientoPuntos:
     """
-    Crea un movimiento de 'acumulado' validando duplicidad por referencia.
+    Crea un movimiento de 'acumulado'; el índice único bloquea la doble
+    acumulación del mismo ticket. Sentencias: INSERT + UPDATE saldo.
     """
-    _validar_cliente(db, data.id_cliente)
     referencia = _validar_referencia(data.referencia)
 
     if not referencia:
@@ -174,96 +402,440 @@ def acumular_puntos(db: Session, data: AcumularRequest) -> MovimientoPuntos:
             detail="La referencia es obligatoria.",
         )
 
-    # Bloqueo de doble acumulación por referencia
-    if _existe_referencia(db, data.id_cliente, referencia, tipo="acumulado"):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Este ticket ya fue acumulado para este cliente.",
-        )
-
-    obj = MovimientoPuntos(
+    return _insertar_movimiento(
+        db,
         id_cliente=data.id_cliente,
         tipo="acumulado",
         puntos=data.puntos,
         descripcion=data.descripcion,
         referencia=referencia,
+        detalle_409="Este ticket ya fue acumulado para este cliente.",
+        id_sucursal=data.id_sucursal,
     )
-    db.add(obj)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
+
+
+def acumular_lote(db: Session, items: Sequence[AcumularRequest]) -> List[Dict[str, Any]]:
+    """
+    Acumula muchos tickets a la vez (reenvíos de SAP / sucursal que se pone al día).
+    - Valida clientes y referencias existentes con consultas set-based (IN).
+    - Inserta con INSERT multi-fila en transacciones de LOTE_CHUNK filas.
+    - Devuelve un resultado por item, en el mismo orden:
+      {"indice", "id_cliente", "referencia", "estado"} con estado
+      "creado" | "duplicado" | "cliente_no_encontrado" | "invalido".
+    """
+    if len(items) > LOTE_MAX_ITEMS:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Este ticket ya fue acumulado para este cliente.",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El lote excede el máximo de {LOTE_MAX_ITEMS} items.",
         )
-    except DataError as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Datos inválidos"
-        ) from e
 
-    db.refresh(obj)
-    return obj
+    resultados: List[Dict[str, Any]] = []
+    for i, it in enumerate(items):
+        try:
+            ref = _validar_referencia(it.referencia)
+        except HTTPException:
+            ref = None
+        resultados.append({
+            "indice": i,
+            "id_cliente": it.id_cliente,
+            "referencia": ref or it.referencia,
+            "estado": None if ref else "invalido",
+        })
+
+    validos = [r for r in resultados if r["estado"] is None]
+    ids = list({r["id_cliente"] for r in validos})
+    pares = list({(r["id_cliente"], r["referencia"]) for r in validos})
+
+    # 1) Clientes existentes (set-based)
+    clientes_ok = set()
+    for i in range(0, len(ids), _IN_CHUNK):
+        clientes_ok.update(
+            db.scalars(select(Cliente.id_cliente).where(Cliente.id_cliente.in_(ids[i:i + _IN_CHUNK])))
+        )
+
+    # 2) Referencias ya acumuladas (set-based, por bloques de pares: ambas listas
+    #    IN quedan en <= _IN_CHUNK; se cruza el par exacto en memoria)
+    ya_acumuladas = set()
+    for i in range(0, len(pares), _IN_CHUNK):
+        bloque = set(pares[i:i + _IN_CHUNK])
+        ya_acumuladas.update(
+            (cid, ref)
+            for cid, ref in db.execute(
+                select(MovimientoPuntos.id_cliente, MovimientoPuntos.referencia).where(
+                    MovimientoPuntos.tipo == "acumulado",
+                    MovimientoPuntos.referencia.in_(sorted({ref for _, ref in bloque})),
+                    MovimientoPuntos.id_cliente.in_(sorted({cid for cid, _ in bloque})),
+                )
+            )
+            if (cid, ref) in bloque
+        )
+
+    pendientes = []
+    for r in validos:
+        clave = (r["id_cliente"], r["referencia"])
+        if r["id_cliente"] not in clientes_ok:
+            r["estado"] = "cliente_no_encontrado"
+        elif clave in ya_acumuladas:
+            r["estado"] = "duplicado"
+        else:
+            ya_acumuladas.add(clave)  # repetidos dentro del mismo lote
+            pendientes.append(r)
+
+    # 3) Inserción por bloques, una transacción por bloque
+    for i in range(0, len(pendientes), LOTE_CHUNK):
+        bloque = pendientes[i:i + LOTE_CHUNK]
+        ahora = _ahora()
+        filas = [
+            {
+                "id_cliente": r["id_cliente"],
+                "tipo": "acumulado",
+                "puntos": items[r["indice"]].puntos,
+                "descripcion": items[r["indice"]].descripcion,
+                "referencia": r["referencia"],
+                "id_sucursal": items[r["indice"]].id_sucursal,
+                "fecha": ahora,
+            }
+            for r in bloque
+        ]
+        deltas: Dict[int, int] = {}
+        for f in filas:
+            deltas[f["id_cliente"]] = deltas.get(f["id_cliente"], 0) + f["puntos"]
+
+        try:
+            db.execute(insert(MovimientoPuntos), filas)
+            _aplicar_saldos_lote(db, "acumulado", deltas)
+            db.commit()
+            resumen_cache.invalidar(*deltas)
+            marcar_escritura(*deltas)
+            for cid, puntos in deltas.items():
+                broker_eventos.publicar(cid, evento_saldo("acumulado", puntos))
+        except IntegrityError:
+            # Carrera con otra acumulación: reintenta el bloque item por item
+            db.rollback()
+            for r in bloque:
+                it = items[r["indice"]]
+                try:
+                    acumular_puntos(db, it)
+                except HTTPException as e:
+                    r["estado"] = {
+                        status.HTTP_409_CONFLICT: "duplicado",
+                        status.HTTP_404_NOT_FOUND: "cliente_no_encontrado",
+                    }.get(e.status_code, "invalido")
+                    continue
+                r["estado"] = "creado"
+            continue
+        except DataError as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Datos inválidos"
+            ) from e
+
+        for r in bloque:
+            r["estado"] = "creado"
+
+    return resultados
+
+
+def _saldo_para_canje(db: Session, id_cliente: int) -> int:
+    """
+    Disponible del cliente para validar un canje (1 búsqueda por PK). Si no hay
+    fila de saldo se distingue cliente sin movimientos (0) de cliente inexistente (404).
+    """
+    disponible = db.execute(
+        select(SaldoCliente.disponible).where(SaldoCliente.id_cliente == id_cliente)
+    ).scalar()
+    if disponible is None:
+        _validar_cliente(db, id_cliente)
+        return 0
+    return int(disponible)
+
+
+def escaneo_cliente(db: Session, id_cliente: int) -> Dict[str, Any]:
+    """
+    Lo que la caja necesita al escanear el QR, en una sola sentencia: el cliente
+    JOIN su saldo materializado (búsqueda por PK en ambas). Sin fila de saldo el
+    disponible es 0; sin cliente, 404.
+    """
+    fila = db.execute(
+        select(
+            Cliente.id_cliente,
+            Cliente.nombre,
+            Cliente.codigo_sap,
+            func.coalesce(SaldoCliente.disponible, 0).label("disponible"),
+        )
+        .outerjoin(SaldoCliente, SaldoCliente.id_cliente == Cliente.id_cliente)
+        .where(Cliente.id_cliente == id_cliente)
+    ).first()
+    if fila is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado"
+        )
+    return {
+        "id_cliente": fila.id_cliente,
+        "nombre": fila.nombre,
+        "codigo_sap": fila.codigo_sap,
+        "puntos_disponibles": int(fila.disponible),
+    }
 
 
 def canjear_puntos(db: Session, data: CanjearRequest) -> MovimientoPuntos:
     """
     Registra un canje, valida saldo y normaliza referencia.
     (No bloquea por referencia salvo que tu índice único lo imponga.)
+    La lectura del saldo solo adelanta el 400; contra canjes concurrentes del
+    mismo cliente protege el UPDATE condicional de _insertar_movimiento.
+    Sentencias: SELECT saldo + INSERT + UPDATE saldo.
     """
-    _validar_cliente(db, data.id_cliente)
-    tot = _totales_cliente(db, data.id_cliente)
-    if data.puntos > tot["disponible"]:
+    disponible = _saldo_para_canje(db, data.id_cliente)
+    if data.puntos > disponible:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Saldo insuficiente para canje"
         )
 
-    referencia = _validar_referencia(data.referencia)
-
-    obj = MovimientoPuntos(
+    # Si tu índice es (id_cliente, referencia) también bloqueará canjes repetidos.
+    return _insertar_movimiento(
+        db,
         id_cliente=data.id_cliente,
         tipo="canjeado",
         puntos=data.puntos,
         descripcion=data.descripcion,
-        referencia=referencia,
+        referencia=_validar_referencia(data.referencia),
+        detalle_409="Movimiento duplicado (índice único).",
+        id_sucursal=data.id_sucursal,
     )
-    db.add(obj)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        # Si tu índice es (id_cliente, referencia) también bloqueará canjes repetidos.
+
+
+def canjear_hasta(
+    db: Session,
+    id_cliente: int,
+    *,
+    max_por_importe: int,
+    importe: Decimal,
+    puntos: Optional[int] = None,
+    descripcion: Optional[str] = None,
+    referencia: Optional[str] = None,
+    id_sucursal: Optional[str] = None,
+) -> MovimientoPuntos:
+    """
+    Canje de caja acotado por el importe del ticket: lee el saldo una sola vez y
+    con él calcula el máximo canjeable (min(saldo, max_por_importe)).
+    Si `puntos` es None se canjea ese máximo. Si otro canje consumió el saldo
+    entre la lectura y el UPDATE condicional, se responde 400 sin canjear.
+    Sentencias: SELECT saldo + INSERT + UPDATE saldo.
+    """
+    disponible = _saldo_para_canje(db, id_cliente)
+    max_canjeable = max(0, min(disponible, max_por_importe))
+
+    if max_canjeable <= 0:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Movimiento duplicado (índice único).",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No hay puntos suficientes o el importe es muy bajo para canjear."
         )
-    except DataError as e:
-        db.rollback()
+
+    puntos_req = puntos if puntos is not None else max_canjeable
+    if puntos_req <= 0:
+        raise HTTPException(status_code=400, detail="puntos debe ser > 0.")
+    if puntos_req > max_canjeable:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Datos inválidos"
-        ) from e
+            status_code=400,
+            detail=f"Máximo canjeable: {max_canjeable} puntos (saldo: {disponible}, importe: {importe})."
+        )
 
-    db.refresh(obj)
-    return obj
+    return _insertar_movimiento(
+        db,
+        id_cliente=id_cliente,
+        tipo="canjeado",
+        puntos=puntos_req,
+        descripcion=descripcion,
+        referencia=_validar_referencia(referencia),
+        detalle_409="Movimiento duplicado (índice único).",
+        id_sucursal=id_sucursal,
+    )
 
 
 def historial_de_cliente(db: Session, id_cliente: int) -> List[MovimientoPuntos]:
+    """Historial como objetos ORM. Los endpoints usan historial_filas."""
     _validar_cliente(db, id_cliente)
     return (
         db.query(MovimientoPuntos)
+        # El historial no usa el cliente: evitamos el JOIN del lazy="joined"
+        .options(lazyload(MovimientoPuntos.cliente))
         .filter(MovimientoPuntos.id_cliente == id_cliente)
         .order_by(MovimientoPuntos.fecha.desc())
         .all()
     )
 
 
+def version_cliente(db: Session, id_cliente: int) -> int:
+    """
+    Versión de los movimientos del cliente para ETags, en una sola búsqueda por
+    PK: last_movimiento_id del saldo (0 sin movimientos), que todo movimiento
+    nuevo actualiza en su misma transacción. 404 si el cliente no existe.
+    """
+    fila = db.execute(
+        select(SaldoCliente.last_movimiento_id)
+        .select_from(Cliente)
+        .outerjoin(SaldoCliente, SaldoCliente.id_cliente == Cliente.id_cliente)
+        .where(Cliente.id_cliente == id_cliente)
+    ).first()
+    if fila is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado"
+        )
+    return fila.last_movimiento_id or 0
+
+
+def _filas_historial(resultado) -> List[Dict[str, Any]]:
+    return [dict(zip(HISTORIAL_CAMPOS, fila)) for fila in resultado]
+
+
+def _filas_archivadas(filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{c: f[c] for c in HISTORIAL_CAMPOS} for f in filas]
+
+
+# Lectura del archivo frío pendiente: un callable sin BD que hace el trabajo de
+# CPU (descomprimir y filtrar Arrow). Las variantes *_async lo corren en el
+# threadpool; run_sync lo correría en el event loop.
+Pendiente = Optional[Callable[[], List[Dict[str, Any]]]]
+
+
+def _leer_archivo(plan, id_cliente: int, **filtros: Any) -> List[Dict[str, Any]]:
+    return _filas_archivadas(leer_historial(plan, id_cliente, **filtros))
+
+
+def historial_filas_db(db: Session, id_cliente: int) -> Tuple[List[Dict[str, Any]], Pendiente]:
+    """
+    Parte de BD de historial_filas: filas calientes como tuplas con solo las
+    columnas de MovimientoPuntosOut (sin identity map ni objetos ORM) y, si el
+    cliente tiene movimientos archivados, la lectura pendiente del archivo
+    (va al final: es más viejo que cualquier fila caliente).
+    """
+    _validar_cliente(db, id_cliente)
+    filas = _filas_historial(db.execute(
+        select(*_COLUMNAS_HISTORIAL)
+        .where(MovimientoPuntos.id_cliente == id_cliente)
+        .order_by(MovimientoPuntos.fecha.desc(), MovimientoPuntos.id.desc())
+    ))
+    if corte_de_cliente(db, id_cliente) is None:
+        return filas, None
+    return filas, partial(_leer_archivo, plan_historial(db, id_cliente), id_cliente)
+
+
+def historial_filas(db: Session, id_cliente: int) -> List[Dict[str, Any]]:
+    """
+    Mismo historial que historial_de_cliente, listo para serializar (ver
+    utils/json_rapido.py). Todo en el hilo que llama: los routers usan
+    historial_filas_async.
+    """
+    filas, pendiente = historial_filas_db(db, id_cliente)
+    return filas + pendiente() if pendiente else filas
+
+
+def _historial_paginado_db(
+    db: Session,
+    id_cliente: int,
+    *,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    tipo: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> Tuple[List[Dict[str, Any]], int, Pendiente]:
+    _validar_cliente(db, id_cliente)
+    limit = max(1, min(int(limit), HISTORIAL_LIMIT_MAX))
+    tipo = _validar_tipo(tipo, MOV_TIPOS_CONSULTA) if tipo else None
+    c_fecha = c_id = None
+
+    q = select(*_COLUMNAS_HISTORIAL).where(MovimientoPuntos.id_cliente == id_cliente)
+    if tipo:
+        q = q.where(MovimientoPuntos.tipo == tipo)
+    if desde is not None:
+        q = q.where(MovimientoPuntos.fecha >= desde)
+    if hasta is not None:
+        q = q.where(MovimientoPuntos.fecha < hasta)
+    if cursor:
+        c_fecha, c_id = decode_cursor(cursor, 2)
+        q = q.where(
+            or_(
+                MovimientoPuntos.fecha < c_fecha,
+                and_(MovimientoPuntos.fecha == c_fecha, MovimientoPuntos.id < c_id),
+            )
+        )
+
+    filas = _filas_historial(db.execute(
+        q.order_by(MovimientoPuntos.fecha.desc(), MovimientoPuntos.id.desc()).limit(limit + 1)
+    ))
+    pendiente = None
+    if len(filas) <= limit:
+        corte = corte_de_cliente(db, id_cliente)
+        if corte is not None and (desde is None or desde < corte):
+            c = (c_fecha, c_id) if cursor else None
+            pendiente = partial(
+                _leer_archivo,
+                plan_historial(db, id_cliente, cursor=c, desde=desde, hasta=hasta),
+                id_cliente,
+                limit=limit + 1 - len(filas), cursor=c, tipo=tipo, desde=desde, hasta=hasta,
+            )
+    return filas, limit, pendiente
+
+
+def _pagina(filas: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    next_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultimo = filas[-1]
+        next_cursor = encode_cursor([ultimo["fecha"], ultimo["id"]])
+    return {"items": filas, "next_cursor": next_cursor}
+
+
+def historial_paginado(db: Session, id_cliente: int, **filtros: Any) -> Dict[str, Any]:
+    """
+    Historial paginado por keyset sobre (fecha, id) descendente, usando el índice
+    (id_cliente, fecha, id). Filtros: limit, cursor, tipo, desde (inclusivo) y
+    hasta (exclusivo). Devuelve {"items": [...], "next_cursor": str | None}; los
+    items son dicts con las columnas de MovimientoPuntosOut, como en historial_filas.
+    Si las filas calientes no llenan la página y el rango llega a lo archivado
+    del cliente, se completa con el archivo (mismo orden y mismo cursor).
+    Todo en el hilo que llama: los routers usan historial_paginado_async.
+    """
+    filas, limit, pendiente = _historial_paginado_db(db, id_cliente, **filtros)
+    return _pagina(filas + pendiente() if pendiente else filas, limit)
+
+
 def resumen_de_cliente(db: Session, id_cliente: int) -> Dict[str, Any]:
+    """
+    Resumen de puntos con caché (LRU + TTL, ver services/cache.py). Los casos de
+    uso que escriben invalidan la entrada al confirmar; las validaciones de saldo
+    dentro de escrituras (p. ej. canjear_puntos) leen siempre de la BD.
+    """
+    return resumen_cache.get_or_load(id_cliente, lambda: _resumen_de_cliente_db(db, id_cliente))
+
+
+def _resumen_de_cliente_db(db: Session, id_cliente: int) -> Dict[str, Any]:
     cli = _validar_cliente(db, id_cliente)
     tot = _totales_cliente(db, id_cliente)
     return {
         "cliente": cli.nombre,
         "puntos_acumulados": tot["acumulado"],
         "puntos_canjeados": tot["canjeado"],
+        "puntos_vencidos": tot["vencido"],
         "puntos_disponibles": tot["disponible"],
-    }
\ No newline at end of file
+    }
+
+
+# -----------------------------
+# Entradas de los routers (Session o AsyncSession)
+# -----------------------------
+# Las consultas van por run_in_session; la lectura del archivo frío (CPU) por
+# el threadpool, para no correrla en el event loop con AsyncSession.run_sync.
+async def completar_historial(filas: List[Dict[str, Any]], pendiente: Pendiente) -> List[Dict[str, Any]]:
+    return filas + await run_in_threadpool(pendiente) if pendiente else filas
+
+
+async def historial_filas_async(db, id_cliente: int) -> List[Dict[str, Any]]:
+    return await completar_historial(*await run_in_session(db, historial_filas_db, id_cliente))
+
+
+async def historial_paginado_async(db, id_cliente: int, **filtros: Any) -> Dict[str, Any]:
+    filas, limit, pendiente = await run_in_session(db, _historial_paginado_db, id_cliente, **filtros)
+    return _pagina(await completar_historial(filas, pendiente), limit)
@@ -0,0 +1,168 @@
+# services/password_hashing.py
+"""
+Hash de contraseñas de clientes (app móvil) con bcrypt, fuera del event loop.
+
+El KDF es caro a propósito (~250 ms con 12 rondas), así que se ejecuta en un
+pool de hilos dedicado y acotado. bcrypt libera el GIL mientras calcula, por
+eso los hilos escalan por núcleo sin el costo de serializar hacia procesos.
+
+- PASSWORD_HASH_WORKERS  hilos del pool                         (núcleos)
+- PASSWORD_HASH_QUEUE    trabajos en espera además de los hilos (4 x hilos)
+- BCRYPT_ROUNDS          costo de bcrypt                        (12)
+
+Si el pool está lleno se responde 503 de inmediato (con Retry-After) en lugar
+de encolar sin límite: un pico de logins no debe arrastrar al resto de la API.
+
+Los hashes SHA-256 sin sal de la versión anterior (64 hex) se siguen aceptando;
+necesita_rehash() indica que conviene reemplazarlos tras un login correcto.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+# bcrypt solo usa los primeros 72 bytes; se recorta explícitamente
+_BCRYPT_MAX_BYTES = 72
+
+
+def _env_int(nombre: str, default: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(default)))
+    except ValueError:
+        return default
+
+
+def _es_legacy(hashed: str) -> bool:
+    if len(hashed) != 64:
+        return False
+    try:
+        int(hashed, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def _hash_legacy(plain: str) -> str:
+    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
+
+
+def _bcrypt_hash(plain: str, rounds: int) -> str:
+    return bcrypt.hashpw(plain.encode("utf-8")[:_BCRYPT_MAX_BYTES], bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def _bcrypt_check(plain: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain.encode("utf-8")[:_BCRYPT_MAX_BYTES], hashed.encode("ascii"))
+    except ValueError:
+        # Hash con formato desconocido o corrupto
+        return False
+
+
+def _rondas_de(hashed: str) -> Optional[int]:
+    # "$2b$12$..." -> 12
+    partes = hashed.split("$")
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, cola_max: int, rounds: int):
+        self.workers = max(1, workers)
+        self.cola_max = max(0, cola_max)
+        self.rounds = rounds
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kdf")
+        self._cupos = threading.BoundedSemaphore(self.workers + self.cola_max)
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.rechazados = 0
+        self.en_curso = 0
+
+    # ---- pool ----
+    def _liberar(self, _fut: Future) -> None:
+        with self._lock:
+            self.en_curso -= 1
+        self._cupos.release()
+
+    def _enviar(self, fn, *args) -> Future:
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self.rechazados += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado, intenta de nuevo en unos segundos.",
+                headers={"Retry-After": "1"},
+            )
+        with self._lock:
+            self.enviados += 1
+            self.en_curso += 1
+        try:
+            fut = self._pool.submit(fn, *args)
+        except BaseException:
+            self._liberar(None)
+            raise
+        fut.add_done_callback(self._liberar)
+        return fut
+
+    # ---- API sync (bloquea el hilo que llama hasta que el pool responde) ----
+    def hash(self, plain: str) -> str:
+        return self._enviar(_bcrypt_hash, plain, self.rounds).result()
+
+    def verificar(self, plain: str, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        if _es_legacy(hashed):
+            # SHA-256 es barato: no vale la pena pasar por el pool
+            return hmac.compare_digest(_hash_legacy(plain), hashed.lower())
+        return self._enviar(_bcrypt_check, plain, hashed).result()
+
+    # ---- API async (para routers: el event loop queda libre) ----
+    async def hash_async(self, plain: str) -> str:
+        return await asyncio.wrap_future(self._enviar(_bcrypt_hash, plain, self.rounds))
+
+    async def verificar_async(self, plain: str, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        if _es_legacy(hashed):
+            return hmac.compare_digest(_hash_legacy(plain), hashed.lower())
+        return await asyncio.wrap_future(self._enviar(_bcrypt_check, plain, hashed))
+
+    def necesita_rehash(self, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        if _es_legacy(hashed):
+            return True
+        rondas = _rondas_de(hashed)
+        return rondas is not None and rondas < self.rounds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "cola_max": self.cola_max,
+                "rounds": self.rounds,
+                "en_curso": self.en_curso,
+                "enviados": self.enviados,
+                "rechazados": self.rechazados,
+            }
+
+    def cerrar(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+def crear_password_hasher() -> PasswordHasher:
+    workers = _env_int("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+    return PasswordHasher(
+        workers=workers,
+        cola_max=_env_int("PASSWORD_HASH_QUEUE", 4 * workers),
+        rounds=_env_int("BCRYPT_ROUNDS", 12),
+    )
+
+
+password_hasher = crear_password_hasher()
@@ -0,0 +1,187 @@
+# services/vencimiento_service.py
+"""
+Vencimiento de puntos (regla del programa: los puntos vencen a los N meses).
+
+Regla FIFO: los canjes y vencimientos previos consumen primero los puntos más
+viejos. Para una fecha de corte C (hoy - N meses), lo que vence por cliente es
+
+    min(disponible, acumulado_antes_de_C - canjeado_total - vencido_total)
+
+si es positivo. Como lo ya vencido se descuenta, volver a correr con el mismo
+corte (o uno anterior) no genera nada nuevo: el proceso es idempotente, y se
+puede reanudar desde cualquier id (ver jobs/vencer_puntos.py). La referencia
+VENC-<corte> y el índice único (id_cliente, referencia, tipo) cubren además dos
+ejecuciones simultáneas del mismo corte.
+
+Se procesa por rangos de id_cliente (VENC_CHUNK), una transacción corta por
+rango: el cálculo es una sola consulta agregada, los movimientos se insertan en
+bloque y el saldo se ajusta con _aplicar_saldos_lote. Solo se bloquean (FOR
+UPDATE) las filas de saldos_clientes del rango, y solo durante ese commit, para
+que un canje concurrente no deje el disponible por debajo de lo calculado.
+
+Con archivo frío (services/archivo_service.py), acumulado_antes_de_C suma el
+saldo de apertura del cliente; por eso C no puede caer dentro de lo archivado.
+"""
+import calendar
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.replicas import marcar_escritura
+from models.archivo import SaldoApertura
+from models.movimientos_puntos import MovimientoPuntos
+from models.saldos_clientes import SaldoCliente
+from services.archivo_service import max_fecha_archivada
+from services.cache import resumen_cache
+from services.eventos import broker_eventos, evento_saldo
+from services.movimientos_service import _ahora, _aplicar_saldos_lote
+
+VENC_CHUNK = 1000  # clientes (rango de ids) por transacción
+
+
+def restar_meses(fecha: datetime, meses: int) -> datetime:
+    """fecha - meses, ajustando el día al último del mes si no existe (31 -> 30/28)."""
+    total = fecha.year * 12 + (fecha.month - 1) - meses
+    anio, mes = divmod(total, 12)
+    mes += 1
+    dia = min(fecha.day, calendar.monthrange(anio, mes)[1])
+    return fecha.replace(year=anio, month=mes, day=dia)
+
+
+def fecha_corte(meses: int, hoy: Optional[datetime] = None) -> datetime:
+    """Inicio del día de hace `meses` meses: vence lo acumulado antes de ese instante."""
+    hoy = hoy or datetime.now()
+    return restar_meses(hoy, meses).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def referencia_vencimiento(corte: datetime) -> str:
+    return f"VENC-{corte:%Y%m%d}"
+
+
+def _por_vencer(db: Session, corte: datetime, desde_id: int, hasta_id: int) -> Dict[int, int]:
+    """{id_cliente: puntos a vencer} del rango (desde_id, hasta_id]."""
+    s = SaldoCliente
+    m = MovimientoPuntos
+    a = SaldoApertura
+    rango = (s.id_cliente > desde_id, s.id_cliente <= hasta_id, s.disponible > 0)
+
+    # Bloquea solo los saldos candidatos del rango hasta el commit
+    if not db.scalars(select(s.id_cliente).where(*rango).with_for_update()).first():
+        return {}
+
+    calientes = (
+        select(m.id_cliente, func.sum(m.puntos).label("puntos"))
+        .where(m.id_cliente > desde_id, m.id_cliente <= hasta_id, m.tipo == "acumulado", m.fecha < corte)
+        .group_by(m.id_cliente)
+        .subquery()
+    )
+    filas = db.execute(
+        select(
+            s.id_cliente,
+            s.canjeado,
+            s.vencido,
+            s.disponible,
+            (func.coalesce(calientes.c.puntos, 0) + func.coalesce(a.acumulado, 0)).label("acumulado_antes"),
+        )
+        .outerjoin(calientes, calientes.c.id_cliente == s.id_cliente)
+        .outerjoin(a, a.id_cliente == s.id_cliente)
+        .where(*rango)
+    ).all()
+
+    deltas: Dict[int, int] = {}
+    for f in filas:
+        vence = min(int(f.disponible), int(f.acumulado_antes) - int(f.canjeado) - int(f.vencido))
+        if vence > 0:
+            deltas[f.id_cliente] = vence
+    return deltas
+
+
+def vencer_puntos(
+    db: Session,
+    *,
+    corte: datetime,
+    desde_id: int = 0,
+    hasta_id: Optional[int] = None,
+    chunk: int = VENC_CHUNK,
+    dry_run: bool = False,
+    progreso: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Vence los puntos acumulados antes de `corte` para los clientes con
+    id_cliente > desde_id (hasta `hasta_id`, o el máximo con saldo).
+    `progreso` recibe el acumulado tras cada rango confirmado; su "ultimo_id"
+    es el desde_id para reanudar.
+    ValueError si el corte cae dentro del archivo frío (el acumulado anterior
+    al corte ya no se puede separar del saldo de apertura).
+    """
+    archivado = max_fecha_archivada(db)
+    if archivado is not None and archivado >= corte:
+        raise ValueError(
+            f"El corte {corte:%Y-%m-%d} cae dentro del archivo (movimientos hasta {archivado:%Y-%m-%d})."
+        )
+    fin = hasta_id
+    if fin is None:
+        fin = db.scalar(select(func.max(SaldoCliente.id_cliente))) or 0
+    db.rollback()  # no retener el snapshot de la lectura anterior
+
+    referencia = referencia_vencimiento(corte)
+    descripcion = f"Vencimiento de puntos acumulados antes de {corte:%Y-%m-%d}"
+    res: Dict[str, Any] = {
+        "corte": corte.isoformat(),
+        "referencia": referencia,
+        "clientes": 0,
+        "puntos": 0,
+        "rangos": 0,
+        "conflictos": 0,
+        "ultimo_id": desde_id,
+    }
+
+    actual = desde_id
+    while actual < fin:
+        siguiente = min(actual + chunk, fin)
+        try:
+            deltas = _por_vencer(db, corte, actual, siguiente)
+            if deltas and not dry_run:
+                ahora = _ahora()
+                db.execute(
+                    insert(MovimientoPuntos),
+                    [
+                        {
+                            "id_cliente": cid,
+                            "tipo": "vencido",
+                            "puntos": puntos,
+                            "descripcion": descripcion,
+                            "referencia": referencia,
+                            "fecha": ahora,
+                        }
+                        for cid, puntos in deltas.items()
+                    ],
+                )
+                _aplicar_saldos_lote(db, "vencido", deltas)
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+        except IntegrityError:
+            # Otra ejecución del mismo corte ya procesó este rango
+            db.rollback()
+            res["conflictos"] += 1
+            deltas = {}
+
+        if deltas and not dry_run:
+            resumen_cache.invalidar(*deltas)
+            marcar_escritura(*deltas)
+            for cid, puntos in deltas.items():
+                broker_eventos.publicar(cid, evento_saldo("vencido", puntos))
+        res["clientes"] += len(deltas)
+        res["puntos"] += sum(deltas.values())
+        res["rangos"] += 1
+        res["ultimo_id"] = siguiente
+        actual = siguiente
+        if progreso is not None:
+            progreso(dict(res))
+
+    return res
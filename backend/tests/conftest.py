@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+# Las URLs de MySQL se arman al importar db.database; con valores vacíos
+# el puerto queda como "None" y create_engine falla. Para pruebas basta con
+# que la URL sea válida: nunca se conecta (se sobreescriben las dependencias).
+for _var in ("DB_PORT", "MOVING_PORT"):
+    os.environ.setdefault(_var, "3306")
+# bcrypt con costo mínimo: las pruebas validan el flujo, no el costo del KDF
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# /metrics e /internal/* abiertos en pruebas (test_metrics cubre el token)
+os.environ.setdefault("INTERNAL_OPEN", "1")
+
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from main import app
+from db.database import Base, get_db, get_session, get_async_db
+from services.cache import resumen_cache
+from services import idempotency
+from utils import request_context
+from utils.metrics import instrumentar_sql
+
+
+# DB de pruebas: un archivo sqlite compartido por el engine sync y el async
+# (aiosqlite), así ambos modos ven el mismo esquema y los mismos datos.
+@pytest.fixture(scope="session")
+def db_url(tmp_path_factory):
+    return f"sqlite:///{tmp_path_factory.mktemp('db') / 'lealtad_test.db'}"
+
+
+def _sqlite_fk_on(dbapi_conn, conn_record):
+    # Como en MySQL: las FKs validan la existencia del cliente
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.close()
+
+
+@pytest.fixture(scope="session")
+def engine_test(db_url):
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _sqlite_fk_on)
+    instrumentar_sql(engine, "lealtad")  # como db.database con los engines reales
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def TestingSessionLocal(engine_test):
+    return sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine_test)
+
+
+@pytest.fixture(autouse=True)
+def setup_db(engine_test):
+    Base.metadata.create_all(bind=engine_test)
+    resumen_cache.clear()  # los ids se reutilizan entre pruebas
+    idempotency.limpiar_cache()
+    yield
+    Base.metadata.drop_all(bind=engine_test)
+
+
+@pytest.fixture(autouse=True)
+def sin_n_mas_1(monkeypatch):
+    """
+    Detector de N+1 en modo "error": si un request repite la misma sentencia
+    SQL_N1_UMBRAL veces o más, la prueba falla.
+    """
+    monkeypatch.setattr(request_context, "SQL_N1_DETECT", "error")
+    request_context.hallazgos_n_mas_1.clear()
+    yield
+    hallazgos = list(request_context.hallazgos_n_mas_1)
+    request_context.hallazgos_n_mas_1.clear()
+    assert not hallazgos, "Posible N+1:\n" + "\n".join(f"{h['veces']}x {h['ruta']}: {h['sql']}" for h in hallazgos)
+
+
+@pytest.fixture(params=["sync", "async"])
+def modo_db(request, db_url, TestingSessionLocal):
+    """
+    Corre cada prueba que use `client` en ambos modos de sesión:
+    - sync: Session clásica (endpoint -> threadpool)
+    - async: AsyncSession sobre aiosqlite (endpoint -> run_sync)
+    """
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    overrides = {get_db: override_get_db}
+    async_engine = None
+    if request.param == "sync":
+        overrides[get_session] = override_get_db
+    else:
+        # NullPool: TestClient puede usar un event loop distinto por request
+        async_engine = create_async_engine(
+            db_url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool
+        )
+        event.listen(async_engine.sync_engine, "connect", _sqlite_fk_on)
+        instrumentar_sql(async_engine.sync_engine, "lealtad_async")
+        AsyncTestingSession = async_sessionmaker(
+            bind=async_engine, autoflush=False, expire_on_commit=False
+        )
+
+        async def override_get_async_db():
+            async with AsyncTestingSession() as db:
+                yield db
+
+        overrides[get_session] = override_get_async_db
+        overrides[get_async_db] = override_get_async_db
+
+    app.dependency_overrides.update(overrides)
+    yield request.param
+    for dep in overrides:
+        app.dependency_overrides.pop(dep, None)
+
+
+@pytest.fixture
+def client(modo_db):
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(TestingSessionLocal):
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def presupuesto_sql():
+    """
+    Cuenta las sentencias SQL que llegan al cursor (cualquier engine) y falla
+    si se excede el presupuesto:
+
+        with presupuesto_sql(3) as sentencias:
+            client.post(...)
+    """
+    @contextmanager
+    def _presupuesto(maximo: int):
+        sentencias = []
+
+        def _antes(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        event.listen(Engine, "before_cursor_execute", _antes)
+        try:
+            yield sentencias
+        finally:
+            event.remove(Engine, "before_cursor_execute", _antes)
+        assert len(sentencias) <= maximo, (
+            f"{len(sentencias)} sentencias (presupuesto {maximo}):\n" + "\n".join(sentencias)
+        )
+
+    return _presupuesto
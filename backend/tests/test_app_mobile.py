@@ -0,0 +1,94 @@
+import hashlib
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from models import Cliente
+from services import password_hashing
+from utils import token as token_mod
+
+
+def test_login_app_entrega_token_con_id_cliente_y_resumen_sin_buscar_cliente(client, presupuesto_sql):
+    r = client.post("/clientes/", json={"nombre": "Ines", "correo": "ines@example.com", "password": "secreto1"})
+    cid = r.json()["id_cliente"]
+    assert client.post("/app/set-password", json={"correo": "ines@example.com", "password": "secreto1"}).status_code == 200
+
+    r = client.post("/app/login", json={"correo": "INES@example.com", "password": "secreto1"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["id_cliente"] == cid and body["token_type"] == "bearer"
+    assert token_mod.decode_access_token(body["access_token"])["id_cliente"] == cid
+
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+    client.get("/app/resumen", headers=headers)  # calienta la caché de resumen
+    # Token ya verificado + identidad desde el claim + resumen cacheado: cero SQL
+    with presupuesto_sql(0):
+        r = client.get("/app/resumen", headers=headers)
+    assert r.status_code == 200 and r.json()["cliente"] == "Ines"
+
+    assert client.get("/app/resumen", headers={"Authorization": "Bearer basura"}).status_code == 401
+
+
+def test_cache_de_tokens_vence_con_exp(monkeypatch):
+    cache = token_mod._VerifiedTokenCache(max_items=2)
+    cache.put("a", {"exp": 2_000, "sub": "x"})
+    monkeypatch.setattr(token_mod.time, "time", lambda: 1_000)
+    assert cache.get("a")["sub"] == "x"
+    monkeypatch.setattr(token_mod.time, "time", lambda: 2_000)
+    assert cache.get("a") is None
+
+
+def test_login_reemplaza_hash_legacy_por_bcrypt(client, db):
+    cli = Cliente(
+        nombre="Legado",
+        correo="legado@example.com",
+        password_hash=hashlib.sha256(b"secreto1").hexdigest(),
+    )
+    db.add(cli)
+    db.commit()
+
+    assert client.post("/app/login", json={"correo": "legado@example.com", "password": "otra123"}).status_code == 401
+    db.refresh(cli)
+    assert len(cli.password_hash) == 64  # un login fallido no toca el hash
+
+    r = client.post("/app/login", json={"correo": "legado@example.com", "password": "secreto1"})
+    assert r.status_code == 200, r.text
+    db.refresh(cli)
+    assert cli.password_hash.startswith("$2")
+
+    # El hash nuevo sigue validando la misma contraseña
+    assert client.post("/app/login", json={"correo": "legado@example.com", "password": "secreto1"}).status_code == 200
+
+
+def test_pool_de_hashing_saturado_responde_503_sin_esperar():
+    hasher = password_hashing.PasswordHasher(workers=1, cola_max=1, rounds=4)
+    liberar = threading.Event()
+    try:
+        ocupado = hasher._enviar(liberar.wait)  # el único hilo
+        en_cola = hasher._enviar(liberar.wait)  # el único lugar en la cola
+        with pytest.raises(HTTPException) as exc:
+            hasher.hash("secreto1")
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
+        assert hasher.stats()["rechazados"] == 1
+
+        liberar.set()
+        ocupado.result(timeout=5)
+        en_cola.result(timeout=5)
+        assert hasher.verificar("secreto1", hasher.hash("secreto1"))
+        assert hasher.stats()["en_curso"] == 0
+    finally:
+        liberar.set()
+        hasher.cerrar()
+
+
+def test_necesita_rehash():
+    hasher = password_hashing.PasswordHasher(workers=1, cola_max=0, rounds=5)
+    try:
+        assert hasher.necesita_rehash(hashlib.sha256(b"x").hexdigest())
+        assert hasher.necesita_rehash(password_hashing._bcrypt_hash("x", 4))
+        assert not hasher.necesita_rehash(password_hashing._bcrypt_hash("x", 5))
+        assert not hasher.verificar("x", "no-es-un-hash")
+    finally:
+        hasher.cerrar()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from models import Cliente, MovimientoPuntos, ParteArchivo, SaldoApertura, SaldoCliente  # noqa: E402
+from services import archivo_service, export_service  # noqa: E402
+from services.archivo_service import archivar_movimientos, corte_archivo  # noqa: E402
+from services.movimientos_service import recalcular_saldos  # noqa: E402
+from services.vencimiento_service import vencer_puntos  # noqa: E402
+
+CORTE = datetime(2024, 4, 1)
+
+
+@pytest.fixture
+def archivo(tmp_path, monkeypatch):
+    directorio = str(tmp_path / "archivo")
+    monkeypatch.setattr(archivo_service, "ARCHIVO_DIR", directorio)
+    yield directorio
+    archivo_service._lector.cache_clear()
+
+
+def _sembrar(db):
+    """Dos clientes con movimientos de ene-mar 2024 (fríos) y de 2025 (calientes)."""
+    ids = []
+    for n, correo in enumerate(("arc-a@example.com", "arc-b@example.com")):
+        cli = Cliente(nombre=f"Arc{n}", correo=correo)
+        db.add(cli)
+        db.flush()
+        ids.append(cli.id_cliente)
+    movs = [
+        (ids[0], "acumulado", 100, "2024-01-10T10:00:00", "S01"),
+        (ids[1], "acumulado", 40, "2024-01-15T09:00:00", "S02"),
+        (ids[0], "canjeado", 30, "2024-02-01T12:00:00", "S01"),
+        (ids[0], "acumulado", 20, "2024-02-01T12:00:00", "S01"),
+        (ids[1], "acumulado", 5, "2024-03-31T23:59:59", None),
+        (ids[0], "acumulado", 60, "2025-06-01T08:00:00", "S01"),
+        (ids[1], "canjeado", 10, "2025-07-01T08:00:00", "S02"),
+    ]
+    for i, (cid, tipo, puntos, fecha, suc) in enumerate(movs):
+        db.add(MovimientoPuntos(
+            id_cliente=cid, tipo=tipo, puntos=puntos, referencia=f"AR-{i}",
+            id_sucursal=suc, fecha=datetime.fromisoformat(fecha),
+        ))
+    db.commit()
+    recalcular_saldos(db)
+    return ids
+
+
+def _saldos(db):
+    db.expire_all()
+    return {s.id_cliente: (s.acumulado, s.canjeado, s.vencido, s.disponible) for s in db.query(SaldoCliente)}
+
+
+def _paginas(client, cid, **params):
+    items, cursor = [], None
+    while True:
+        r = client.get(f"/movimientos/historial/{cid}/paginado", params={**params, "cursor": cursor} if cursor else params)
+        assert r.status_code == 200, r.text
+        items += r.json()["items"]
+        cursor = r.json()["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_archivar_y_leer_transparente(client, db, archivo, monkeypatch):
+    a, b = _sembrar(db)
+    antes = {
+        "saldos": _saldos(db),
+        "historial": client.get(f"/movimientos/historial/{a}").json(),
+        "paginado": _paginas(client, a, limit=2),
+        "filtrado": _paginas(client, a, limit=1, tipo="acumulado", desde="2024-01-20T00:00:00"),
+        "export": client.get("/movimientos/export", params={"formato": "ndjson"}).text,
+        "export_suc": client.get("/movimientos/export", params={"formato": "ndjson", "id_sucursal": "S01"}).text,
+    }
+
+    res = archivar_movimientos(db, corte=CORTE, lote=2)
+    assert res["meses"] == 3 and res["filas"] == 5
+    assert sorted(os.listdir(archivo)) == ["2024-01", "2024-02", "2024-03"]
+    assert db.query(MovimientoPuntos).count() == 2
+    db.expire_all()
+    aperturas = {x.id_cliente: (x.acumulado, x.canjeado, x.vencido) for x in db.query(SaldoApertura)}
+    assert aperturas == {a: (120, 30, 0), b: (45, 0, 0)}
+
+    # El saldo materializado no cambia y recalcular desde lo caliente + apertura da lo mismo
+    assert _saldos(db) == antes["saldos"]
+    recalcular_saldos(db)
+    assert _saldos(db) == antes["saldos"]
+
+    monkeypatch.setattr(export_service, "EXPORT_BATCH", 2)
+    assert client.get(f"/movimientos/historial/{a}").json() == antes["historial"]
+    assert _paginas(client, a, limit=2) == antes["paginado"]
+    assert _paginas(client, a, limit=1, tipo="acumulado", desde="2024-01-20T00:00:00") == antes["filtrado"]
+    assert client.get("/movimientos/export", params={"formato": "ndjson"}).text == antes["export"]
+    assert client.get("/movimientos/export", params={"formato": "ndjson", "id_sucursal": "S01"}).text == antes["export_suc"]
+
+    # Reanudar la exportación con un cursor dentro del archivo
+    todas = [json.loads(x) for x in antes["export"].splitlines()]
+    cursor = export_service.cursor_de_fila(datetime.fromisoformat(todas[1]["fecha"]), todas[1]["id"])
+    r = client.get("/movimientos/export", params={"formato": "ndjson", "cursor": cursor})
+    assert [json.loads(x)["id"] for x in r.text.splitlines()] == [x["id"] for x in todas[2:]]
+
+    # Sin rango que llegue al archivo no se lee nada de él
+    r = client.get(f"/movimientos/historial/{a}/paginado", params={"desde": "2025-01-01T00:00:00"})
+    assert [x["fecha"] for x in r.json()["items"]] == ["2025-06-01T08:00:00"]
+
+    # Volver a correr no encuentra nada que mover
+    assert archivar_movimientos(db, corte=CORTE)["meses"] == 0
+    assert db.query(ParteArchivo).count() == 3
+
+
+def test_lectura_del_archivo_fuera_del_event_loop(client, db, archivo, monkeypatch):
+    from services import movimientos_service
+
+    a, _ = _sembrar(db)
+    archivar_movimientos(db, corte=CORTE)
+    en_loop = []
+    leer = movimientos_service.leer_historial
+
+    def _leer(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            en_loop.append(True)
+        except RuntimeError:
+            en_loop.append(False)
+        return leer(*args, **kwargs)
+
+    monkeypatch.setattr(movimientos_service, "leer_historial", _leer)
+    assert len(client.get(f"/movimientos/historial/{a}").json()) == 4
+    assert len(client.get(f"/movimientos/historial/{a}/paginado").json()["items"]) == 4
+    assert en_loop == [False, False]
+
+
+def test_vencimiento_usa_apertura_y_no_corta_dentro_del_archivo(db, archivo):
+    a, b = _sembrar(db)
+    archivar_movimientos(db, corte=CORTE)
+
+    with pytest.raises(ValueError):
+        vencer_puntos(db, corte=datetime(2024, 3, 1))
+
+    res = vencer_puntos(db, corte=datetime(2025, 1, 1))
+    # a: 120 acumulados antes del corte - 30 canjeados; b: 45 (su canje es posterior y también cuenta)
+    assert res["puntos"] == 90 + 35
+    assert _saldos(db)[a] == (180, 30, 90, 60)
+
+
+def test_falla_en_la_transaccion_no_deja_archivo_ni_borra_filas(db, archivo, monkeypatch):
+    _sembrar(db)
+
+    def _falla(*args, **kwargs):
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(archivo_service, "_sumar_aperturas", _falla)
+    with pytest.raises(RuntimeError):
+        archivar_movimientos(db, corte=CORTE)
+    assert db.query(MovimientoPuntos).count() == 7
+    assert db.query(ParteArchivo).count() == 0
+    assert os.listdir(os.path.join(archivo, "2024-01")) == []
+
+
+def test_corte_archivo_es_inicio_de_mes():
+    assert corte_archivo(24, datetime(2026, 10, 18, 15, 30)) == datetime(2024, 10, 1)
+    assert corte_archivo(10, datetime(2026, 3, 31)) == datetime(2025, 5, 1)
+
+
+def test_archivo_apagado_con_partes_falla_en_vez_de_omitir(db, archivo, monkeypatch):
+    a, b = _sembrar(db)
+    archivar_movimientos(db, corte=CORTE)
+    monkeypatch.setattr(archivo_service, "ARCHIVO_DIR", "")
+
+    with pytest.raises(ValueError):
+        archivar_movimientos(db, corte=CORTE)
+    with pytest.raises(RuntimeError):
+        archivo_service.verificar_archivo(db)
+    with pytest.raises(RuntimeError):
+        archivo_service.corte_de_cliente(db, a)
+    with pytest.raises(RuntimeError):
+        list(export_service.exportar_movimientos(db, formato="ndjson"))
+    # Un cliente sin nada archivado se sigue leyendo normal
+    nuevo = Cliente(nombre="Nuevo", correo="arc-c@example.com")
+    db.add(nuevo)
+    db.commit()
+    assert archivo_service.corte_de_cliente(db, nuevo.id_cliente) is None
@@ -0,0 +1,127 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.database import BaseMoving, get_moving_db
+from main import app
+from models.moving_user import MovingUser
+from services.caja_directory import caja_directory
+from utils.token import decode_access_token
+
+
+def _sha1(p: str) -> str:
+    return hashlib.sha1(p.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture
+def moving():
+    """BD de Moving en memoria (sqlite) y el directorio de caja vacío."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    BaseMoving.metadata.create_all(bind=engine)
+    MovingSession = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    def override_get_moving_db():
+        db = MovingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_moving_db] = override_get_moving_db
+    caja_directory.clear()
+    s = MovingSession()
+    s.add_all([
+        MovingUser(id_usuario=1, user="CAJERO1", nombre="Ana", paterno="Ruiz", tipo="Cajero",
+                   pass_hash=_sha1("clave1").upper(), id_sucursal="S01", activo=1),
+        MovingUser(id_usuario=2, user="BAJA", nombre="Beto", tipo="Cajero",
+                   pass_hash=_sha1("clave2"), id_sucursal="S01", activo=0),
+    ])
+    s.commit()
+    yield s
+    s.close()
+    app.dependency_overrides.pop(get_moving_db, None)
+    caja_directory.clear()
+    engine.dispose()
+
+
+def _login(client, username, password):
+    return client.post("/login", json={"username": username, "password": password, "origin": "caja"})
+
+
+def test_login_caja_desde_snapshot_solo_consulta_moving_por_pk(moving, presupuesto_sql):
+    client = TestClient(app)
+    r = _login(client, "cajero1", "clave1")  # carga el snapshot
+    assert r.status_code == 200, r.text
+    claims = decode_access_token(r.json()["access_token"])
+    assert claims["uid"] == 1 and claims["sucursal"] == "S01" and claims["name"] == "Ana Ruiz"
+    assert claims["role"] == "cajero"
+
+    with presupuesto_sql(1) as sentencias:
+        assert _login(client, " Cajero1 ", "clave1").status_code == 200
+    assert "usuarios.\"Id_usuario\" = " in sentencias[0]
+
+    assert _login(client, "BAJA", "clave2").status_code == 401
+    stats = caja_directory.stats()
+    assert stats["usuarios"] == 1 and stats["refrescos_completos"] == 1
+
+
+def test_alta_nueva_y_cambio_de_password_se_resuelven_contra_moving(moving, presupuesto_sql):
+    client = TestClient(app)
+    assert _login(client, "CAJERO1", "clave1").status_code == 200
+
+    # Alta posterior al snapshot: miss -> una consulta a Moving y queda en el snapshot
+    moving.add(MovingUser(id_usuario=3, user="NUEVO", nombre="Caro", tipo="Admin",
+                          pass_hash=_sha1("clave3"), id_sucursal="S02", activo=1))
+    # Cambio de contraseña en Moving
+    moving.query(MovingUser).filter(MovingUser.id_usuario == 1).update({"pass_hash": _sha1("nueva1")})
+    moving.commit()
+
+    with presupuesto_sql(1):
+        assert _login(client, "NUEVO", "clave3").status_code == 200
+    with presupuesto_sql(1):
+        assert _login(client, "nuevo", "clave3").status_code == 200
+
+    # Hash del snapshot no coincide -> relectura por PK
+    assert _login(client, "CAJERO1", "nueva1").status_code == 200
+    assert _login(client, "CAJERO1", "clave1").status_code == 401
+    assert _login(client, "NADIE", "x").status_code == 401
+
+
+def test_refresco_incremental_y_completo(moving, monkeypatch):
+    db = moving
+    assert caja_directory.buscar(db, "cajero1").id_usuario == 1
+
+    moving.add(MovingUser(id_usuario=4, user="TARDE", pass_hash=_sha1("x"), activo=1))
+    moving.query(MovingUser).filter(MovingUser.id_usuario == 1).update({"activo": 0})
+    moving.commit()
+
+    # Incremental: trae el alta nueva, pero la baja sigue en el snapshot
+    monkeypatch.setattr(caja_directory, "refresh_seg", 0)
+    caja_directory.misses = 0
+    assert caja_directory.buscar(db, "tarde").id_usuario == 4
+    assert caja_directory.misses == 0
+    assert caja_directory.stats()["max_id"] == 4
+    assert caja_directory.buscar(db, "cajero1") is not None
+
+    # Completo: refleja la baja
+    monkeypatch.setattr(caja_directory, "full_refresh_seg", 0)
+    assert caja_directory.buscar(db, "cajero1") is None
+    assert caja_directory.stats()["usuarios"] == 1
+
+
+def test_baja_en_moving_rechaza_el_login_antes_del_refresco_completo(moving):
+    client = TestClient(app)
+    assert _login(client, "CAJERO1", "clave1").status_code == 200
+
+    moving.query(MovingUser).filter(MovingUser.id_usuario == 1).update({"activo": 0})
+    moving.commit()
+
+    # El snapshot todavía lo tiene (refresco completo cada 900 s), pero el login relee por PK
+    assert _login(client, "CAJERO1", "clave1").status_code == 401
+    assert caja_directory.stats()["usuarios"] == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+from benchmarks import bench_historial
+from benchmarks.bench_historial import cliente_con_historial
+from benchmarks.bench_endpoints import ESCENARIOS_DEFAULT, comparar, correr, percentil
+from benchmarks.generar_datos import crear_engine_carga, generar
+
+
+def test_percentil_rango_mas_cercano():
+    datos = [float(x) for x in range(1, 101)]
+    assert percentil(datos, 50) == 50.0
+    assert percentil(datos, 95) == 95.0
+    assert percentil(datos, 99) == 99.0
+    assert percentil([], 50) == 0.0
+
+
+def test_suite_de_endpoints_en_proceso(tmp_path):
+    engine = crear_engine_carga(f"sqlite:///{tmp_path / 'bench.db'}")
+    try:
+        r = generar(engine, clientes=50, movimientos=2000, con_password=5, lote=500)
+        assert r["acumulados"] + r["canjes"] == 2000
+        assert r["saldos"] == 50
+
+        resultados = asyncio.run(correr(
+            engine, ESCENARIOS_DEFAULT + ("historial_completo", "escaneo"),
+            concurrencia=2, peticiones=10, calentamiento=2,
+        ))
+    finally:
+        engine.dispose()
+
+    assert [x["escenario"] for x in resultados] == list(ESCENARIOS_DEFAULT) + ["historial_completo", "escaneo"]
+    for x in resultados:
+        assert x["peticiones"] == 10
+        assert x["errores_5xx"] == 0, x
+        assert x["p50_ms"] <= x["p95_ms"] <= x["p99_ms"] <= x["max_ms"]
+    por_nombre = {x["escenario"]: x for x in resultados}
+    assert por_nombre["acumular_qr"]["codigos"] == {"201": 10}
+    assert por_nombre["canjear_qr"]["codigos"] == {"201": 10}
+    assert por_nombre["login"]["codigos"] == {"200": 10}
+
+    delta = comparar(resultados, resultados)
+    assert all(d["rps_delta_pct"] == 0.0 for d in delta)
+
+
+def test_bench_historial_mismo_json_en_ambos_caminos(tmp_path):
+    engine = crear_engine_carga(f"sqlite:///{tmp_path / 'hist.db'}")
+    try:
+        id_cliente, filas = cliente_con_historial(engine, 300)
+        resultados = bench_historial.correr(engine, id_cliente, repeticiones=3, calentamiento=1)
+    finally:
+        engine.dispose()
+
+    assert filas == 300
+    assert [r["camino"] for r in resultados] == ["orm", "tuplas"]
+    orm, tuplas = resultados
+    assert orm["filas"] == tuplas["filas"] == 300
+    assert orm["bytes"] == tuplas["bytes"]
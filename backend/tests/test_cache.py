@@ -0,0 +1,102 @@
+from fnmatch import fnmatchcase
+
+import pytest
+
+from services.cache import MemoryBackend, SharedBackend, ResumenCache
+import services.cache as cache_mod
+
+
+class FakeRedis:
+    """Sustituto local de un cliente redis (get / set(ex=) / delete)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+    def scan_iter(self, match="*", count=None):
+        return [k for k in list(self.data) if fnmatchcase(k, match)]
+
+
+def test_memory_backend_lru_y_ttl(monkeypatch):
+    b = MemoryBackend(max_items=2, ttl=10)
+    b.set("a", 1)
+    b.set("b", 2)
+    b.get("a")           # "a" pasa a ser el más reciente
+    b.set("c", 3)        # expulsa "b"
+    assert (b.get("a"), b.get("b"), b.get("c")) == (1, None, 3)
+
+    ahora = cache_mod.time.monotonic()
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: ahora + 11)
+    assert b.get("a") is None
+
+
+def test_resumen_cacheado_e_invalidado_al_escribir(client, monkeypatch):
+    cache = ResumenCache(SharedBackend(FakeRedis()))
+    monkeypatch.setattr("services.movimientos_service.resumen_cache", cache)
+
+    cid = client.post("/clientes/", json={
+        "nombre": "Fer", "correo": "fer@example.com", "password": "secreto1",
+    }).json()["id_cliente"]
+
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 0
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 30, "referencia": "C-1"})
+    assert r.status_code == 201, r.text
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 30
+    assert cache.stats()["invalidations"] == 1 and cache.misses == 2
+
+
+@pytest.mark.parametrize("compartida", [False, True])
+def test_carga_concurrente_con_invalidar_no_guarda_valor_viejo(compartida):
+    redis = FakeRedis()
+    backend = (lambda: SharedBackend(redis)) if compartida else MemoryBackend
+    cache = ResumenCache(backend())
+    # Con "shared" la invalidación llega desde otro worker (otra instancia, mismo almacén)
+    otro_worker = ResumenCache(SharedBackend(redis)) if compartida else cache
+
+    def _loader():
+        # Un escritor hace commit e invalida mientras esta carga sigue en vuelo
+        otro_worker.invalidar(7)
+        return {"puntos_disponibles": 10}
+
+    assert cache.get_or_load(7, _loader) == {"puntos_disponibles": 10}
+    assert cache.backend.get(cache._key(7)) is None
+    assert cache.get_or_load(7, lambda: {"puntos_disponibles": 40}) == {"puntos_disponibles": 40}
+    assert cache.backend.get(cache._key(7)) == {"puntos_disponibles": 40}
+
+
+def test_clear_compartido_borra_los_resumenes_y_frena_cargas_en_vuelo():
+    redis = FakeRedis()
+    redis.set("otro:1", "x")  # llaves de otro prefijo no se tocan
+    cache = ResumenCache(SharedBackend(redis, prefix="lealtad:cache:"))
+    for cid in (1, 2):
+        cache.get_or_load(cid, lambda: {"puntos_disponibles": 5})
+    cache.invalidar(2)  # deja un contador de generación que clear() no borra
+    assert redis.get("lealtad:cache:resumen:1") is not None
+
+    def _loader():
+        cache.clear()  # recalcular_saldos(None) termina mientras esta carga sigue en vuelo
+        return {"puntos_disponibles": 5}
+
+    cache.get_or_load(3, _loader)
+    assert not any(k.startswith("lealtad:cache:resumen:") for k in redis.data)
+    assert redis.get("lealtad:cache:gen:2") == 1 and redis.get("otro:1") == "x"
+    assert cache.get_or_load(1, lambda: {"puntos_disponibles": 9}) == {"puntos_disponibles": 9}
@@ -0,0 +1,69 @@
+def _cliente_con_saldo(client, correo, puntos):
+    cid = client.post("/clientes/", json={
+        "nombre": "Gabo", "correo": correo, "password": "secreto1",
+    }).json()["id_cliente"]
+    r = client.post("/caja/acumular-qr", json={
+        "qr_data": f"CLI:{cid}", "puntos": puntos, "referencia": "INI",
+    })
+    assert r.status_code == 201, r.text
+    return cid
+
+
+def test_acumular_qr_dentro_de_presupuesto(client, presupuesto_sql):
+    cid = _cliente_con_saldo(client, "gabo@example.com", 10)
+
+    # INSERT movimiento + UPDATE saldo
+    with presupuesto_sql(2):
+        r = client.post("/caja/acumular-qr", json={
+            "qr_data": f"CLI:{cid}", "puntos": 25, "referencia": "T-100",
+        })
+    assert r.status_code == 201, r.text
+    assert r.json()["fecha"] and r.json()["id"]
+
+    # El duplicado lo detecta el índice único (+1 lectura para decidir 404/409)
+    with presupuesto_sql(3):
+        r = client.post("/caja/acumular-qr", json={
+            "qr_data": f"CLI:{cid}", "puntos": 25, "referencia": "T-100",
+        })
+    assert r.status_code == 409
+
+    r = client.post("/caja/acumular-qr", json={"qr_data": "CLI:424242", "puntos": 5, "referencia": "X"})
+    assert r.status_code == 404
+
+
+def test_canjear_qr_dentro_de_presupuesto(client, presupuesto_sql):
+    cid = _cliente_con_saldo(client, "hugo@example.com", 100)
+
+    # SELECT saldo + INSERT movimiento + UPDATE saldo
+    with presupuesto_sql(3):
+        r = client.post("/caja/canjear-qr", json={"qr_data": f"CLI:{cid}", "importe": "30.50"})
+    assert r.status_code == 201, r.text
+    assert r.json()["puntos"] == 30
+
+    r = client.post("/caja/canjear-qr", json={"qr_data": f"CLI:{cid}", "importe": "500", "puntos": 80})
+    assert r.status_code == 400
+    assert "Máximo canjeable: 70" in r.json()["detail"]
+
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 70
+
+
+def test_escaneo_en_una_sentencia(client, presupuesto_sql):
+    cid = _cliente_con_saldo(client, "ines@example.com", 40)
+
+    with presupuesto_sql(1):
+        r = client.get("/caja/escaneo", params={"qr_data": f"CLI:{cid}", "importe": "25.99"})
+    assert r.status_code == 200, r.text
+    assert r.json() == {
+        "id_cliente": cid, "nombre": "Gabo", "codigo_sap": None, "puntos_disponibles": 40,
+        "max_por_importe": 25, "max_canjeable": 25, "point_value": 1.0,
+    }
+    sugerencia = client.get("/caja/canjear-sugerencia", params={"qr_data": f"CLI:{cid}", "importe": 25.99}).json()
+    assert sugerencia["max_canjeable"] == r.json()["max_canjeable"]
+
+    sin_saldo = client.post("/clientes/", json={"nombre": "Nuevo", "correo": "nuevo@example.com", "password": "secreto1"}).json()["id_cliente"]
+    r = client.get("/caja/escaneo", params={"qr_data": f"CLI:{sin_saldo}", "importe": "100"})
+    assert (r.json()["puntos_disponibles"], r.json()["max_canjeable"]) == (0, 0)
+
+    assert client.get("/caja/escaneo", params={"qr_data": "CLI:424242", "importe": "10"}).status_code == 404
+    assert client.get("/caja/escaneo", params={"qr_data": "XYZ:1", "importe": "10"}).status_code == 400
+    assert client.get("/caja/escaneo", params={"qr_data": f"CLI:{cid}", "importe": "0"}).status_code == 422
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_canje import correr_estres, crear_engine_estres, sembrar_clientes, verificar_saldos
+from models import MovimientoPuntos, SaldoCliente
+from schemas.movimientos_puntos import CanjearRequest
+from services import movimientos_service
+from services.movimientos_service import canjear_puntos
+
+
+def test_canjes_concurrentes_no_dejan_saldo_negativo(db_url):
+    engine = crear_engine_estres(db_url)
+    Fabrica = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    try:
+        with Fabrica() as s:
+            ids = sembrar_clientes(s, 3, 100)
+        # 8 cajeros x 30 canjes de 7 = 1680 puntos pedidos contra 300 disponibles
+        r = correr_estres(Fabrica, ids, hilos=8, intentos=30, puntos=7)
+        with Fabrica() as s:
+            r.update(verificar_saldos(s, ids))
+    finally:
+        engine.dispose()
+
+    assert r["bloqueos"] == 0
+    assert r["descuadres"] == 0
+    assert r["min_disponible"] >= 0
+    assert r["min_disponible_visto"] is None or r["min_disponible_visto"] >= 0
+    # 100 // 7 = 14 canjes por cliente: se agota lo canjeable, sin pasarse
+    assert r["canjes_ok"] == 3 * 14
+    assert r["canjes_ok"] + r["rechazados_saldo"] == r["intentos"]
+
+
+def test_canje_con_lectura_vieja_no_sobregira(db, monkeypatch):
+    # Simula el choque: la validación vio un saldo que otro canje ya consumió
+    [cid] = sembrar_clientes(db, 1, 10)
+    monkeypatch.setattr(movimientos_service, "_saldo_para_canje", lambda _db, _id: 10)
+    canjear_puntos(db, CanjearRequest(id_cliente=cid, puntos=8))
+
+    with pytest.raises(HTTPException) as exc:
+        canjear_puntos(db, CanjearRequest(id_cliente=cid, puntos=8))
+    assert exc.value.status_code == 400
+
+    db.expire_all()
+    assert db.get(SaldoCliente, cid).disponible == 2
+    canjes = db.scalar(
+        select(func.count()).where(MovimientoPuntos.id_cliente == cid, MovimientoPuntos.tipo == "canjeado")
+    )
+    assert canjes == 1
+
+
+def test_movimiento_generico_de_canje_valida_saldo(client, db):
+    [cid] = sembrar_clientes(db, 1, 5)
+    r = client.post("/movimientos/", json={"id_cliente": cid, "tipo": "canjeado", "puntos": 6})
+    assert r.status_code == 400
+    r = client.post("/movimientos/", json={"id_cliente": cid, "tipo": "canjeado", "puntos": 5})
+    assert r.status_code == 201
+    db.expire_all()
+    assert db.get(SaldoCliente, cid).disponible == 0
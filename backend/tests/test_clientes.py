@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from models import Cliente
+
+
+def _sembrar(db, n=7):
+    base = datetime(2026, 1, 1, 9, 0, 0)
+    for i in range(n):
+        # Fechas repetidas a propósito: el desempate es id_cliente
+        db.add(Cliente(nombre=f"C{i}", correo=f"c{i}@example.com", fecha_registro=base + timedelta(days=i // 2)))
+    db.commit()
+    return [c.id_cliente for c in db.query(Cliente).order_by(Cliente.id_cliente)]
+
+
+def _todas(client, **params):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        r = client.get("/clientes/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        body = r.json()
+        ids += [c["id_cliente"] for c in body["items"]]
+        paginas += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, paginas
+
+
+def test_listado_paginado_por_id_y_fecha(client, db):
+    ids = _sembrar(db)
+
+    r = client.get("/clientes/", params={"limit": 3})
+    body = r.json()
+    assert [c["id_cliente"] for c in body["items"]] == ids[:3]
+    assert set(body["items"][0]) == {"id_cliente", "nombre", "correo", "telefono", "codigo_sap", "fecha_registro"}
+
+    assert _todas(client, limit=3) == (ids, 3)
+    assert _todas(client, limit=3, orden="-id")[0] == ids[::-1]
+    assert _todas(client, limit=2, orden="fecha_registro")[0] == ids
+    assert _todas(client, limit=2, orden="-fecha_registro")[0] == ids[::-1]
+
+    # Rango de fecha_registro: días 1 y 2 -> clientes 2..5
+    en_rango, _ = _todas(client, limit=2, desde="2026-01-02T00:00:00", hasta="2026-01-04T00:00:00")
+    assert en_rango == ids[2:6]
+
+    assert client.get("/clientes/", params={"cursor": "basura"}).status_code == 400
+    assert client.get("/clientes/", params={"limit": 10_000}).status_code == 422
@@ -0,0 +1,70 @@
+from services.cache import resumen_cache
+from utils.etag import etag_coincide
+
+
+def _cliente_con_puntos(client, correo="elsa@example.com"):
+    r = client.post("/clientes/", json={"nombre": "Elsa", "correo": correo, "password": "secreto1"})
+    cid = r.json()["id_cliente"]
+    r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 50, "referencia": "E-1"})
+    assert r.status_code == 201, r.text
+    return cid
+
+
+def test_historial_304_con_una_busqueda_por_pk(client, presupuesto_sql):
+    cid = _cliente_con_puntos(client)
+    r = client.get(f"/movimientos/historial/{cid}")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert etag.startswith('W/"') and r.headers["cache-control"] == "private, no-cache"
+
+    for ruta in (f"/movimientos/historial/{cid}", f"/movimientos/cliente/{cid}/historial"):
+        with presupuesto_sql(1):
+            r = client.get(ruta, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b"" and r.headers["etag"] == etag
+
+    r = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 10})
+    assert r.status_code == 201, r.text
+    r = client.get(f"/movimientos/historial/{cid}", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and len(r.json()) == 2
+    assert r.headers["etag"] != etag
+
+    r = client.get("/movimientos/historial/999999", headers={"If-None-Match": "*"})
+    assert r.status_code == 404
+
+
+def test_resumen_304_desde_cache_y_cambia_con_movimientos(client, presupuesto_sql):
+    cid = _cliente_con_puntos(client, "fer@example.com")
+    r = client.get(f"/movimientos/resumen/{cid}")
+    etag = r.headers["etag"]
+    assert r.json()["puntos_disponibles"] == 50
+
+    with presupuesto_sql(0):
+        r = client.get(f"/movimientos/cliente/{cid}/resumen", headers={"If-None-Match": f'"otro", {etag}'})
+    assert r.status_code == 304
+
+    client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 5, "referencia": "E-2"})
+    r = client.get(f"/movimientos/resumen/{cid}", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["puntos_disponibles"] == 55
+    assert r.headers["etag"] != etag
+
+
+def test_comparacion_debil_de_etags():
+    assert etag_coincide('W/"h-7"', 'W/"h-7"')
+    assert etag_coincide('"h-7"', 'W/"h-7"')
+    assert etag_coincide('"a", W/"h-7"', 'W/"h-7"')
+    assert etag_coincide("*", 'W/"h-7"')
+    assert not etag_coincide('W/"h-8"', 'W/"h-7"')
+    assert not etag_coincide(None, 'W/"h-7"')
+
+
+def test_resumen_304_en_miss_de_cache_lee_el_resumen(client, presupuesto_sql):
+    cid = _cliente_con_puntos(client, "gil@example.com")
+    etag = client.get(f"/movimientos/resumen/{cid}").headers["etag"]
+    resumen_cache.clear()
+
+    # Sin la entrada en caché, el 304 lee el resumen (cliente + saldo por PK)
+    with presupuesto_sql(2):
+        r = client.get(f"/movimientos/resumen/{cid}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
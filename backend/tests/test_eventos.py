@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from main import app
+from models import Cliente
+from services import eventos
+from services.eventos import BrokerEventos, RedisBackend, broker_eventos, stream_sse
+from utils.token import build_token_claims_for_app, create_access_token
+
+
+@pytest.fixture(autouse=True)
+def _broker_limpio():
+    broker_eventos.clear()
+    yield
+    broker_eventos.clear()
+
+
+def _token_app(db, correo="sara@example.com"):
+    cli = Cliente(nombre="Sara", correo=correo)
+    db.add(cli)
+    db.commit()
+    return cli.id_cliente, create_access_token(build_token_claims_for_app(cli))
+
+
+async def _esperar(condicion, segundos=5.0):
+    for _ in range(int(segundos / 0.01)):
+        if condicion():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timeout")
+
+
+def test_sse_entrega_deltas_de_acumular_y_canjear(client, db):
+    cid, token = _token_app(db)
+
+    async def _main():
+        cuerpo, fin = [], asyncio.Event()
+
+        async def receive():
+            await fin.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(m):
+            if m["type"] == "http.response.start":
+                cuerpo.append(m["status"])
+            elif m.get("body"):
+                cuerpo.append(m["body"].decode())
+                if sum("event: saldo" in c for c in cuerpo[1:]) == 2:
+                    fin.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/app/eventos", "raw_path": b"/app/eventos", "query_string": b"",
+            "root_path": "", "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        tarea = asyncio.create_task(app(scope, receive, send))
+        await _esperar(lambda: broker_eventos.conexiones() == 1)
+
+        # Las escrituras pasan por el app real en otro hilo (TestClient), como un worker
+        def escribir():
+            r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 30, "referencia": "S-1"})
+            assert r.status_code == 201, r.text
+            r = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 10})
+            assert r.status_code == 201, r.text
+
+        await asyncio.to_thread(escribir)
+        await asyncio.wait_for(tarea, 5)
+        return cuerpo
+
+    cuerpo = asyncio.run(_main())
+    assert cuerpo[0] == 200
+    assert cuerpo[1].startswith("retry:")
+    datos = [json.loads(c.split("data: ", 1)[1]) for c in cuerpo[2:] if c.startswith("event: saldo")]
+    assert [(d["tipo"], d["puntos"]) for d in datos] == [("acumulado", 30), ("canjeado", 10)]
+    assert broker_eventos.conexiones() == 0  # se liberó al desconectarse
+
+
+def test_sse_requiere_token_de_app(client):
+    assert client.get("/app/eventos").status_code == 401
+    assert client.get("/app/eventos", headers={"Authorization": "Bearer basura"}).status_code == 401
+
+
+def test_broker_keepalive_limite_y_desborde(monkeypatch):
+    monkeypatch.setattr(eventos, "EVENTOS_COLA_MAX", 2)
+    broker = BrokerEventos(max_por_cliente=1)
+
+    async def _main():
+        sub = broker.suscribir(7)
+        with pytest.raises(HTTPException) as e:
+            broker.suscribir(7)
+        assert e.value.status_code == 429
+
+        salida = stream_sse(broker, sub, keepalive=0.01)
+        assert (await salida.__anext__()).startswith("retry:")
+        assert await salida.__anext__() == ": keepalive\n\n"
+
+        # Publicado desde otro hilo (como un service en el threadpool); 3 eventos en cola de 2
+        hilo = threading.Thread(target=lambda: [broker.publicar(7, {"tipo": "acumulado", "puntos": p}) for p in (1, 2, 3)])
+        hilo.start()
+        hilo.join()
+        await _esperar(lambda: sub.cola.qsize() == 2)
+        assert (await salida.__anext__()).startswith("event: resync")
+        assert '"puntos":2' in await salida.__anext__()
+        assert '"puntos":3' in await salida.__anext__()
+        await salida.aclose()
+
+    asyncio.run(_main())
+    assert broker.conexiones() == 0
+
+
+def test_broker_con_backend_compartido_reparte_lo_que_llega_del_canal():
+    class _Redis:
+        """Canal en memoria con la API de redis que usa RedisBackend."""
+        def __init__(self):
+            self.cola = []
+            self.hay = threading.Condition()
+
+        def publish(self, canal, mensaje):
+            with self.hay:
+                self.cola.append({"type": "message", "data": mensaje.encode()})
+                self.hay.notify_all()
+
+        def pubsub(self, ignore_subscribe_messages):
+            redis = self
+
+            class _PS:
+                def subscribe(self, canal):
+                    pass
+
+                def listen(self):
+                    while True:
+                        with redis.hay:
+                            redis.hay.wait_for(lambda: redis.cola)
+                            m = redis.cola.pop(0)
+                        yield m
+            return _PS()
+
+    broker = BrokerEventos(RedisBackend(_Redis()))
+
+    async def _main():
+        sub = broker.suscribir(9)
+        broker.publicar(9, {"tipo": "canjeado", "puntos": 4})
+        broker.publicar(8, {"tipo": "canjeado", "puntos": 1})  # otro cliente: no llega
+        assert await sub.siguiente(5) == {"tipo": "canjeado", "puntos": 4}
+        assert await sub.siguiente(0.05) is None
+
+    asyncio.run(_main())
+
+
+def test_sse_libera_la_suscripcion_si_el_cliente_se_va_antes_del_stream(client, db):
+    cid, token = _token_app(db)
+
+    async def _main():
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(m):
+            # El cliente ya cerró: falla el envío de los headers, antes del primer chunk
+            raise OSError("conexión cerrada")
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/app/eventos", "raw_path": b"/app/eventos", "query_string": b"",
+            "root_path": "", "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        for _ in range(broker_eventos.max_por_cliente + 1):
+            with pytest.raises(OSError):
+                await app(scope, receive, send)
+            assert broker_eventos.conexiones() == 0
+
+    asyncio.run(_main())
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from jobs.exportar_movimientos import cursor_para_reanudar
+from services import export_service
+
+
+def _cliente(client, correo):
+    return client.post("/clientes/", json={"nombre": "Exp", "correo": correo, "password": "secreto1"}).json()["id_cliente"]
+
+
+def _sembrar(client):
+    a = _cliente(client, "exp-a@example.com")
+    b = _cliente(client, "exp-b@example.com")
+    for i in range(5):
+        r = client.post("/caja/acumular-qr", json={
+            "qr_data": f"CLI:{a}", "puntos": 10 + i, "referencia": f"A-{i}", "id_sucursal": "S01",
+        })
+        assert r.status_code == 201, r.text
+    client.post("/caja/acumular-qr", json={"qr_data": f"CLI:{b}", "puntos": 7, "referencia": "B-0", "id_sucursal": "S02"})
+    client.post("/caja/canjear-qr", json={"qr_data": f"CLI:{a}", "importe": "5", "id_sucursal": "S01"})
+    return a, b
+
+
+def test_export_csv_y_ndjson_con_filtros(client, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH", 2)  # varios chunks
+    a, b = _sembrar(client)
+
+    r = client.get("/movimientos/export", params={"formato": "csv"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(filas) == 7
+    assert [int(f["id"]) for f in filas] == sorted(int(f["id"]) for f in filas)
+
+    r = client.get("/movimientos/export", params={"formato": "ndjson", "id_sucursal": "S01", "tipo": "acumulado"})
+    lineas = [json.loads(x) for x in r.text.splitlines()]
+    assert len(lineas) == 5
+    assert {x["id_cliente"] for x in lineas} == {a} and {x["id_sucursal"] for x in lineas} == {"S01"}
+
+    r = client.get("/movimientos/export", params={"formato": "ndjson", "tipo": "canjeado"})
+    assert [x["puntos"] for x in map(json.loads, r.text.splitlines())] == [5]
+
+
+def test_export_se_reanuda_con_cursor(client):
+    _sembrar(client)
+    todas = [json.loads(x) for x in client.get("/movimientos/export", params={"formato": "ndjson"}).text.splitlines()]
+
+    corte = todas[2]
+    cursor = export_service.cursor_de_fila(datetime.fromisoformat(corte["fecha"]), corte["id"])
+    r = client.get("/movimientos/export", params={"formato": "csv", "cursor": cursor})
+    resto = list(csv.reader(io.StringIO(r.text)))
+    assert [int(f[0]) for f in resto] == [x["id"] for x in todas[3:]]  # sin encabezado
+
+    assert client.get("/movimientos/export", params={"cursor": "basura"}).status_code == 400
+
+
+def test_cli_reanuda_desde_la_ultima_fila_completa(tmp_path):
+    ruta = tmp_path / "export.csv"
+    ruta.write_text(
+        ",".join(export_service.COLUMNAS_EXPORT) + "\r\n"
+        "1,1,acumulado,10,A-0,,S01,2026-01-01T10:00:00\r\n"
+        "2,1,acumulado,11,A-1,,S01,2026-01-01T10:00:05\r\n"
+        "3,1,acumu",  # fila cortada
+        newline="",
+    )
+    cursor = cursor_para_reanudar(str(ruta), "csv")
+    assert export_service.decode_cursor(cursor, 2)[1] == 2
+    assert ruta.read_bytes().endswith(b"10:00:05\r\n")
+
+    solo_encabezado = tmp_path / "vacio.csv"
+    solo_encabezado.write_text(",".join(export_service.COLUMNAS_EXPORT) + "\r\n", newline="")
+    assert cursor_para_reanudar(str(solo_encabezado), "csv") is None
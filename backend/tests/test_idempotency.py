@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from db.database import run_in_session
+from models import IdempotencyKey, MovimientoPuntos
+from schemas.movimientos_puntos import AcumularRequest, CanjearRequest
+from services import idempotency
+from services.movimientos_service import canjear_puntos
+
+
+def _cliente_con_saldo(client, correo, puntos):
+    cid = client.post("/clientes/", json={"nombre": "Idem", "correo": correo, "password": "secreto1"}).json()["id_cliente"]
+    r = client.post("/caja/acumular-qr", json={"qr_data": f"CLI:{cid}", "puntos": puntos, "referencia": "INI"})
+    assert r.status_code == 201, r.text
+    return cid
+
+
+def test_reintento_de_acumulacion_repite_la_respuesta(client, presupuesto_sql):
+    cid = _cliente_con_saldo(client, "idem1@example.com", 10)
+    body = {"qr_data": f"CLI:{cid}", "puntos": 25, "referencia": "T-1"}
+    h = {"Idempotency-Key": "caja-7f3a"}
+
+    r1 = client.post("/caja/acumular-qr", json=body, headers=h)
+    assert r1.status_code == 201 and "Idempotent-Replayed" not in r1.headers
+
+    # Mismo worker: sale de la caché en memoria, sin SQL
+    with presupuesto_sql(0):
+        r2 = client.post("/caja/acumular-qr", json=body, headers=h)
+    assert (r2.status_code, r2.json()) == (201, r1.json())
+    assert r2.headers["Idempotent-Replayed"] == "true"
+
+    # Otro worker (caché vacía): solo lee idempotency_keys
+    idempotency.limpiar_cache()
+    with presupuesto_sql(1) as sentencias:
+        r3 = client.post("/caja/acumular-qr", json=body, headers=h)
+    assert (r3.status_code, r3.json()) == (201, r1.json())
+    assert not any("movimientos_puntos" in s or "saldos_clientes" in s for s in sentencias)
+
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 35
+
+    # Misma clave con otro cuerpo
+    r = client.post("/caja/acumular-qr", json={**body, "puntos": 99}, headers=h)
+    assert r.status_code == 422
+
+
+def test_canje_sin_referencia_no_se_duplica(client):
+    cid = _cliente_con_saldo(client, "idem2@example.com", 100)
+    body = {"qr_data": f"CLI:{cid}", "importe": "40"}
+    h = {"Idempotency-Key": "canje-1"}
+
+    r1 = client.post("/caja/canjear-qr", json=body, headers=h)
+    idempotency.limpiar_cache()
+    r2 = client.post("/caja/canjear-qr", json=body, headers=h)
+    assert r1.status_code == r2.status_code == 201 and r1.json() == r2.json()
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 60
+
+    # Los 4xx no se guardan: tras acumular más, el reintento con la misma clave canjea
+    h = {"Idempotency-Key": "canje-2"}
+    r1 = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 100}, headers=h)
+    assert r1.status_code == 400
+    client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 100, "referencia": "MAS"})
+    r2 = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 100}, headers=h)
+    assert r2.status_code == 201 and "Idempotent-Replayed" not in r2.headers
+
+    # Sin clave: comportamiento normal
+    assert client.post("/caja/canjear-qr", json=body).status_code == 201
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 20
+
+
+def test_clave_en_proceso_y_vencida(client, db):
+    cid = _cliente_con_saldo(client, "idem3@example.com", 10)
+    body = {"id_cliente": cid, "puntos": 5, "referencia": "X-1"}
+    ahora = datetime.now()
+    huella = idempotency._huella(AcumularRequest(**body))
+    db.add(IdempotencyKey(
+        endpoint="movimientos.acumular", clave="k-pendiente", huella=huella,
+        creado=ahora, expira=ahora + timedelta(hours=1), reservado_hasta=ahora + timedelta(seconds=30),
+    ))
+    # Worker caído a media solicitud: la reserva venció
+    db.add(IdempotencyKey(
+        endpoint="movimientos.acumular", clave="k-huerfana", huella=huella,
+        creado=ahora, expira=ahora + timedelta(hours=1), reservado_hasta=ahora - timedelta(seconds=1),
+    ))
+    db.add(IdempotencyKey(
+        endpoint="movimientos.acumular", clave="k-vieja", huella="x", status_code=201, body="{}",
+        creado=ahora - timedelta(days=2), expira=ahora - timedelta(days=1),
+    ))
+    db.commit()
+
+    r = client.post("/movimientos/acumular", json=body, headers={"Idempotency-Key": "k-pendiente"})
+    assert r.status_code == 409
+
+    r = client.post("/movimientos/acumular", json=body, headers={"Idempotency-Key": "k-huerfana"})
+    assert r.status_code == 201, r.text
+    body = {**body, "referencia": "X-2"}
+
+    # Una clave vencida se puede volver a usar
+    r = client.post("/movimientos/acumular", json=body, headers={"Idempotency-Key": "k-vieja"})
+    assert r.status_code == 201, r.text
+
+    assert client.post("/movimientos/acumular", json=body, headers={"Idempotency-Key": " "}).status_code == 400
+
+    db.add(IdempotencyKey(
+        endpoint="caja.acumular_qr", clave="k-otra-vieja", huella="x", status_code=201, body="{}",
+        creado=ahora - timedelta(days=2), expira=ahora - timedelta(days=1),
+    ))
+    db.commit()
+    assert idempotency.purgar_vencidas(db) == 1
+
+
+@pytest.mark.parametrize("error", [RuntimeError, asyncio.CancelledError])
+def test_falla_despues_del_commit_no_duplica_el_movimiento(client, db, error):
+    cid = _cliente_con_saldo(client, "idem4@example.com", 100)
+    payload = CanjearRequest(id_cliente=cid, puntos=30)
+
+    async def _canjear(falla):
+        async def accion():
+            mov = await run_in_session(db, canjear_puntos, payload)
+            if falla:
+                raise error()  # p. ej. el cliente se desconectó con el canje ya confirmado
+            return mov
+
+        return await idempotency.ejecutar_idempotente(
+            db, "k-cortada", "movimientos.canjear", payload, accion, lambda m: {"id": m.id},
+        )
+
+    with pytest.raises(error):
+        asyncio.run(_canjear(falla=True))
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(_canjear(falla=False))
+    assert e.value.status_code == 409
+    db.expire_all()
+    assert db.query(MovimientoPuntos).filter_by(id_cliente=cid, tipo="canjeado").count() == 1
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import json
+
+from sqlalchemy.dialects import mysql
+
+from models import Cliente
+from services import import_service
+from services.import_service import importar_clientes
+
+
+def _por_correo(db):
+    db.expire_all()
+    return {c.correo: c for c in db.query(Cliente)}
+
+
+def test_import_csv_upsert_y_rechazos(client, db):
+    db.add_all([
+        Cliente(nombre="Ana App", correo="ana@example.com", telefono="5550001", password_hash="h"),
+        Cliente(nombre="Beto", correo="beto.viejo@example.com", codigo_sap="SAP-2"),
+        Cliente(nombre="Caro", correo="caro@example.com", codigo_sap="SAP-3"),
+    ])
+    db.commit()
+
+    csv_txt = (
+        "Nombre,Correo,Telefono,Codigo_SAP\r\n"
+        "Ana SAP, ANA@Example.com ,,SAP-1\r\n"           # 2: liga por correo
+        "Beto Nuevo,beto@example.com,5550002,SAP-2\r\n"  # 3: actualiza por codigo_sap
+        "Dani,dani@example.com,,SAP-4\r\n"               # 4: alta
+        "Sin correo,,,\r\n"                              # 5: rechazo
+        "Eva,eva@@example.com,,\r\n"                     # 6: rechazo
+        "Dani Dup,otra@example.com,,SAP-4\r\n"           # 7: repetido en el archivo
+        "Caro Mix,caro@example.com,,SAP-2\r\n"           # 8: repetido (SAP-2 ya vino)
+        "Caro Cruce,caro@example.com,,SAP-1\r\n"         # 9: repetido (correo ya vino)
+    )
+    r = client.post(
+        "/clientes/import",
+        params={"lote": 2},
+        files={"archivo": ("clientes.csv", csv_txt.encode("utf-8"), "text/csv")},
+    )
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["procesados"] == 8
+    assert body["aplicados"] == 3
+    assert body["rechazados"] == 5
+    assert {x["linea"] for x in body["rechazos"]} == {5, 6, 7, 8, 9}
+
+    clientes = _por_correo(db)
+    ana = clientes["ana@example.com"]
+    assert (ana.nombre, ana.codigo_sap, ana.telefono, ana.password_hash) == ("Ana SAP", "SAP-1", "5550001", "h")
+    beto = clientes["beto@example.com"]
+    assert (beto.nombre, beto.codigo_sap, beto.telefono) == ("Beto Nuevo", "SAP-2", "5550002")
+    assert "beto.viejo@example.com" not in clientes
+    assert clientes["dani@example.com"].codigo_sap == "SAP-4"
+    assert clientes["caro@example.com"].nombre == "Caro"
+
+
+def test_import_ndjson_conflicto_entre_clientes(db):
+    db.add_all([
+        Cliente(nombre="A", correo="a@example.com", codigo_sap="SAP-A"),
+        Cliente(nombre="B", correo="b@example.com", codigo_sap="SAP-B"),
+    ])
+    db.commit()
+
+    lineas = [
+        json.dumps({"nombre": "A2", "correo": "a@example.com", "codigo_sap": "SAP-B"}),  # cruza dos clientes
+        "",
+        "{no es json",
+        json.dumps(["lista"]),
+    ] + [json.dumps({"nombre": f"N{i}", "correo": f"n{i}@example.com"}) for i in range(5)]
+    rechazos = []
+    res = importar_clientes(
+        db, io.StringIO("\n".join(lineas) + "\n"), formato="ndjson", lote=2, on_rechazo=rechazos.append,
+    )
+
+    assert res["aplicados"] == 5
+    assert res["lotes"] == 3
+    assert sorted(r["linea"] for r in rechazos) == [1, 3, 4]
+    clientes = _por_correo(db)
+    assert clientes["a@example.com"].codigo_sap == "SAP-A"
+    assert clientes["b@example.com"].codigo_sap == "SAP-B"
+    assert len(clientes) == 7
+
+
+def test_import_invalida_el_resumen_en_cache(client):
+    cid = client.post("/clientes/", json={"nombre": "Gil", "correo": "gil@example.com", "password": "secreto1"}).json()["id_cliente"]
+    assert client.get(f"/movimientos/resumen/{cid}").json()["cliente"] == "Gil"
+
+    r = client.post("/clientes/import", files={"archivo": ("c.csv", b"nombre,correo\nGil SAP,gil@example.com\n", "text/csv")})
+    assert r.json()["aplicados"] == 1
+    assert client.get(f"/movimientos/resumen/{cid}").json()["cliente"] == "Gil SAP"
+
+
+def test_import_corre_fuera_del_event_loop(client, monkeypatch):
+    from routers import clientes as router_clientes
+
+    en_loop = []
+
+    def _importar(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            en_loop.append(True)
+        except RuntimeError:
+            en_loop.append(False)
+        return importar_clientes(*args, **kwargs)
+
+    monkeypatch.setattr(router_clientes, "importar_clientes", _importar)
+    r = client.post("/clientes/import", files={"archivo": ("c.csv", b"nombre,correo\nHugo,hugo@example.com\n", "text/csv")})
+    assert r.json()["aplicados"] == 1
+    assert en_loop == [False]
+
+
+def test_import_csv_sin_columnas_obligatorias(client):
+    r = client.post("/clientes/import", files={"archivo": ("x.csv", b"nombre,telefono\nA,1\n", "text/csv")})
+    assert r.status_code == 400
+
+
+def test_upsert_mysql_usa_on_duplicate_key_update(db):
+    capturado = []
+
+    class _Resultado:
+        def all(self):
+            return [(7, "a@example.com", "S1")]
+
+    class _Sesion:
+        def execute(self, stmt):
+            capturado.append(str(stmt.compile(dialect=mysql.dialect())))
+            return _Resultado()
+
+    _, tocados = import_service._upsert_mysql(_Sesion(), [
+        (1, {"nombre": "A", "correo": "a@example.com", "telefono": None, "codigo_sap": "S1"}),
+        (2, {"nombre": "B", "correo": "b@example.com", "telefono": "1", "codigo_sap": None}),
+    ])
+    assert tocados == {7}  # existentes, para invalidar su resumen en caché
+    sql = capturado[-1]
+    assert "ON DUPLICATE KEY UPDATE" in sql
+    assert sql.count("(%s, %s, %s, %s)") == 2  # una sola sentencia multi-fila
+    assert "coalesce" in sql.lower()
@@ -0,0 +1,106 @@
+import asyncio
+import re
+
+from fastapi.testclient import TestClient
+
+from main import app
+from models import Cliente
+from utils.metrics import MetricsMiddleware, metricas
+
+
+def _valor(texto, serie):
+    m = re.search(r"^" + re.escape(serie) + r" (\S+)$", texto, re.M)
+    return float(m.group(1)) if m else None
+
+
+def test_metricas_por_ruta_y_sql(client, db):
+    cli = Cliente(nombre="Ana", correo="ana@example.com")
+    db.add(cli)
+    db.commit()
+    metricas.clear()
+
+    for _ in range(3):
+        assert client.get(f"/movimientos/resumen/{cli.id_cliente}").status_code == 200
+    assert client.get("/movimientos/resumen/999999").status_code == 404
+    assert client.get("/no-existe").status_code == 404
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    t = r.text
+
+    base = 'method="GET",route="/movimientos/resumen/{id_cliente}"'
+    assert _valor(t, f"http_requests_total{{{base},status=\"200\"}}") == 3
+    assert _valor(t, f"http_requests_total{{{base},status=\"404\"}}") == 1
+    assert _valor(t, 'http_requests_total{method="GET",route="sin_ruta",status="404"}') == 1
+    assert _valor(t, f"http_request_duration_seconds_count{{{base}}}") == 4
+    assert _valor(t, f'http_request_duration_seconds_bucket{{{base},le="+Inf"}}') == 4
+    # Las repeticiones salen de la caché de resumen: solo el primero y el 404 van a la BD
+    assert _valor(t, f"http_request_db_statements_sum{{{base}}}") >= 2
+    assert _valor(t, f'http_request_db_statements_bucket{{{base},le="0"}}') >= 1
+    assert _valor(t, f"http_request_db_seconds_sum{{{base}}}") > 0
+    assert re.search(r'^db_statement_duration_seconds_count\{engine="lealtad(_async)?"\} [1-9]', t, re.M)
+    # El request a /metrics está en curso mientras se exporta
+    assert _valor(t, "http_requests_in_flight") == 1
+
+
+def test_metricas_cuentan_500(modo_db, monkeypatch):
+    def _falla(*a, **k):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("routers.movimientos.resumen_de_cliente", _falla)
+    metricas.clear()
+
+    r = TestClient(app, raise_server_exceptions=False).get("/movimientos/resumen/1")
+    assert r.status_code == 500
+    assert 'route="/movimientos/resumen/{id_cliente}",status="500"} 1' in metricas.exportar()
+
+
+def test_endpoints_internos_cerrados_sin_token(client, monkeypatch):
+    monkeypatch.setattr("routers.internal.INTERNAL_TOKEN", "")
+    monkeypatch.setattr("routers.internal.INTERNAL_OPEN", False)
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/internal/pool-stats").status_code == 403
+
+    monkeypatch.setattr("routers.internal.INTERNAL_TOKEN", "s3creto")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"X-Internal-Token": "otro"}).status_code == 403
+    assert client.get("/metrics", headers={"X-Internal-Token": "s3creto"}).status_code == 200
+
+    monkeypatch.setattr("routers.internal.INTERNAL_TOKEN", "")
+    monkeypatch.setattr("routers.internal.INTERNAL_OPEN", True)
+    assert client.get("/internal/pool-stats").status_code == 200
+
+
+def test_stream_sse_no_cuenta_en_in_flight_ni_en_la_latencia():
+    abierto, cerrar = asyncio.Event(), asyncio.Event()
+
+    async def sse(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8")]})
+        abierto.set()
+        await cerrar.wait()  # conexión larga
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send(m):
+        pass
+
+    async def _main():
+        metricas.clear()
+        base = metricas.en_curso
+        scope = {"type": "http", "method": "GET", "path": "/app/eventos"}
+        tarea = asyncio.create_task(MetricsMiddleware(sse)(scope, None, _send))
+        await abierto.wait()
+        assert (metricas.en_curso, metricas.streams) == (base, 1)
+        await asyncio.sleep(0.3)
+        cerrar.set()
+        await tarea
+        assert (metricas.en_curso, metricas.streams) == (base, 0)
+
+    asyncio.run(_main())
+    t = metricas.exportar()
+    serie = 'method="GET",route="sin_ruta"'
+    assert _valor(t, f'http_requests_total{{{serie},status="200"}}') == 1
+    # La latencia registrada es hasta los headers, no la vida de la conexión
+    assert _valor(t, f"http_request_duration_seconds_sum{{{serie}}}") < 0.1
+    assert _valor(t, "http_streams_in_flight") == 0
@@ -1,43 +1,18 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-from main import app
-from db.database import Base, get_db
-
-# DB de pruebas (sqlite en memoria)
-engine_test = create_engine(
-    "sqlite://",
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine_test)
-
-@pytest.fixture(autouse=True, scope="function")
-def setup_db():
-    Base.metadata.create_all(bind=engine_test)
-    yield
-    Base.metadata.drop_all(bind=engine_test)
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
-
-def test_crear_cliente_y_acumular():
+import re
+
+from models import SaldoCliente
+from schemas.movimientos_puntos import MovimientoPuntosOut
+from services.movimientos_service import historial_de_cliente, recalcular_saldos
+
+
+def test_crear_cliente_y_acumular(client):
     # Crear cliente
     r = client.post("/clientes/", json={
         "nombre": "Ana",
         "correo": "ana@example.com",
         "telefono": "555-123",
-        "codigo_sap": "SAP-001"
+        "codigo_sap": "SAP-001",
+        "password": "secreto1"
     })
     assert r.status_code == 200, r.text
     cid = r.json()["id_cliente"]
@@ -50,7 +25,7 @@ def test_crear_cliente_y_acumular():
         "descripcion": "Ticket F-1",
         "referencia": "F-1"
     })
-    assert r2.status_code == 200, r2.text
+    assert r2.status_code == 201, r2.text
 
     # Duplicado mismo ticket -> debe fallar
     r3 = client.post("/movimientos/", json={
@@ -60,4 +35,157 @@ def test_crear_cliente_y_acumular():
         "descripcion": "Ticket F-1",
         "referencia": "F-1"
     })
-    assert r3.status_code in (400, 409)
\ No newline at end of file
+    assert r3.status_code in (400, 409)
+
+def _crear_cliente(client, correo="beto@example.com"):
+    r = client.post("/clientes/", json={
+        "nombre": "Beto",
+        "correo": correo,
+        "password": "secreto1"
+    })
+    assert r.status_code == 200, r.text
+    return r.json()["id_cliente"]
+
+
+def test_saldo_materializado_se_actualiza_con_cada_movimiento(client, db):
+    cid = _crear_cliente(client)
+
+    r = client.get(f"/movimientos/resumen/{cid}")
+    assert r.status_code == 200, r.text
+    assert r.json()["puntos_disponibles"] == 0
+
+    r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 120, "referencia": "T-1"})
+    assert r.status_code == 201, r.text
+    r = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 50})
+    assert r.status_code == 201, r.text
+    last_id = r.json()["id"]
+
+    # Canje mayor al saldo -> rechazado y sin tocar el saldo
+    r = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 500})
+    assert r.status_code == 400
+
+    r = client.get(f"/movimientos/resumen/{cid}")
+    assert r.json() == {
+        "cliente": "Beto",
+        "puntos_acumulados": 120,
+        "puntos_canjeados": 50,
+        "puntos_vencidos": 0,
+        "puntos_disponibles": 70,
+    }
+
+    saldo = db.get(SaldoCliente, cid)
+    assert saldo.last_movimiento_id == last_id
+
+    # El backfill desde movimientos debe coincidir con lo incremental
+    recalcular_saldos(db, [cid])
+    db.expire_all()
+    assert (saldo.acumulado, saldo.canjeado, saldo.disponible) == (120, 50, 70)
+
+
+def test_historial_paginado_por_cursor(client):
+    cid = _crear_cliente(client, "carla@example.com")
+    for i in range(5):
+        r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 10 + i, "referencia": f"H-{i}"})
+        assert r.status_code == 201, r.text
+    r = client.post("/movimientos/canjear", json={"id_cliente": cid, "puntos": 5})
+    assert r.status_code == 201, r.text
+
+    vistos, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get(f"/movimientos/historial/{cid}/paginado", params=params)
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert len(page["items"]) <= 2
+        vistos += [m["id"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    # Mismo contenido y orden que el historial legacy, sin repetidos
+    legacy = client.get(f"/movimientos/historial/{cid}").json()
+    assert sorted(vistos, reverse=True) == vistos
+    assert set(vistos) == {m["id"] for m in legacy}
+    assert len(vistos) == 6
+
+    r = client.get(f"/movimientos/historial/{cid}/paginado", params={"tipo": "canjeado"})
+    assert [m["puntos"] for m in r.json()["items"]] == [5]
+
+    r = client.get(f"/movimientos/historial/{cid}/paginado", params={"cursor": "basura"})
+    assert r.status_code == 400
+
+
+def test_historial_por_tuplas_igual_al_schema(client, db):
+    cid = _crear_cliente(client, "hugo@example.com")
+    for i in range(3):
+        r = client.post("/movimientos/acumular", json={
+            "id_cliente": cid, "puntos": 10 + i, "referencia": f"T-{i}", "id_sucursal": "S01" if i else None,
+        })
+        assert r.status_code == 201, r.text
+
+    r = client.get(f"/movimientos/historial/{cid}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    esperado = [
+        MovimientoPuntosOut.model_validate(m).model_dump(mode="json")
+        for m in historial_de_cliente(db, cid)
+    ]
+    assert r.json() == esperado
+    assert esperado[-1]["id_sucursal"] is None and esperado[-1]["descripcion"] is None
+
+    assert client.get("/movimientos/historial/999999").status_code == 404
+    assert client.get("/movimientos/historial/999999/paginado").status_code == 404
+
+
+def test_acumular_lote_resultado_por_item(client):
+    cid = _crear_cliente(client, "dora@example.com")
+    cid2 = _crear_cliente(client, "eva@example.com")
+    r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 10, "referencia": "L-0"})
+    assert r.status_code == 201, r.text
+
+    items = [
+        {"id_cliente": cid, "puntos": 5, "referencia": "L-1"},
+        {"id_cliente": cid, "puntos": 7, "referencia": "L-0"},       # ya acumulado antes
+        {"id_cliente": 999999, "puntos": 3, "referencia": "L-2"},    # cliente inexistente
+        {"id_cliente": cid, "puntos": 8, "referencia": "L-1"},       # repetido en el lote
+        {"id_cliente": cid, "puntos": 20, "referencia": "L-3"},
+        {"id_cliente": cid2, "puntos": 4, "referencia": "L-1"},      # mismo ticket, otro cliente
+    ]
+    r = client.post("/caja/acumular-lote", json={"items": items})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [x["estado"] for x in body["resultados"]] == [
+        "creado", "duplicado", "cliente_no_encontrado", "duplicado", "creado", "creado",
+    ]
+    assert (body["creados"], body["duplicados"], body["clientes_no_encontrados"]) == (3, 2, 1)
+
+    assert client.get(f"/movimientos/resumen/{cid}").json()["puntos_disponibles"] == 35
+    assert client.get(f"/movimientos/resumen/{cid2}").json()["puntos_disponibles"] == 4
+
+
+def test_acumular_lote_parte_las_listas_in(client, presupuesto_sql, monkeypatch):
+    monkeypatch.setattr("services.movimientos_service._IN_CHUNK", 2)
+    cid = _crear_cliente(client, "fina@example.com")
+    cid2 = _crear_cliente(client, "gala@example.com")
+    cid3 = _crear_cliente(client, "hada@example.com")
+    for c, ref in ((cid, "M-0"), (cid2, "M-1")):
+        r = client.post("/movimientos/acumular", json={"id_cliente": c, "puntos": 1, "referencia": ref})
+        assert r.status_code == 201, r.text
+
+    items = [
+        {"id_cliente": cid, "puntos": 1, "referencia": "M-0"},    # duplicado
+        {"id_cliente": cid, "puntos": 1, "referencia": "M-1"},    # el ticket es de otro cliente
+        {"id_cliente": cid2, "puntos": 1, "referencia": "M-0"},
+        {"id_cliente": cid2, "puntos": 1, "referencia": "M-1"},   # duplicado
+        {"id_cliente": cid, "puntos": 1, "referencia": "M-2"},
+        {"id_cliente": cid3, "puntos": 1, "referencia": "M-3"},
+    ]
+    with presupuesto_sql(20) as sentencias:
+        r = client.post("/caja/acumular-lote", json={"items": items})
+    assert [x["estado"] for x in r.json()["resultados"]] == [
+        "duplicado", "creado", "creado", "duplicado", "creado", "creado",
+    ]
+    listas_in = [m.count("?") for s in sentencias for m in re.findall(r"IN \(([^)]*)\)", s)]
+    assert listas_in and max(listas_in) <= 2
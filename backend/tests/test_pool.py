@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from db.pool import InstrumentedQueuePool, desregistrar_pool, instrumentar_pool, pool_stats
+
+
+def test_pool_instrumentado_registra_espera_overflow_y_timeouts(client):
+    engine = create_engine(
+        "sqlite://", poolclass=InstrumentedQueuePool,
+        pool_size=1, max_overflow=1, pool_timeout=0.2,
+    )
+    instrumentar_pool(engine, "prueba")
+    try:
+        c1, c2 = engine.connect(), engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        c1.close()
+        c2.close()
+
+        pools = {p["nombre"]: p for p in client.get("/internal/pool-stats").json()["pools"]}
+        st = pools["prueba"]
+        assert st["checkouts"] == 2 and st["timeouts"] == 1
+        assert st["peak_checked_out"] == 2 and st["peak_overflow"] == 1
+        assert st["wait_max_ms"] >= 150
+        assert {"lealtad", "moving"} <= set(pools)
+    finally:
+        desregistrar_pool("prueba")
+        engine.dispose()
+    assert "prueba" not in {p["nombre"] for p in pool_stats()}
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from db.database import Base
+from db.replicas import escrituras_recientes, replicas
+from models import Cliente
+from services.cache import resumen_cache
+from utils.token import build_token_claims_for_app, create_access_token
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """Segundo archivo sqlite como réplica: no recibe escrituras (retraso infinito)."""
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    lecturas = []
+    for eng in (engine, async_engine.sync_engine):
+        event.listen(eng, "before_cursor_execute", lambda *a: lecturas.append(a[2]))
+    replicas.configurar(
+        [sessionmaker(bind=engine, expire_on_commit=False)],
+        [async_sessionmaker(bind=async_engine, expire_on_commit=False)],
+    )
+    Replica = sessionmaker(bind=engine, expire_on_commit=False)
+    Replica.lecturas = lecturas
+    yield Replica
+    replicas.configurar()
+    escrituras_recientes.clear()
+    engine.dispose()
+
+
+def test_lecturas_van_a_la_replica_salvo_escritura_reciente(client, replica):
+    cid = client.post("/clientes/", json={"nombre": "Rita", "correo": "rita@example.com", "password": "secreto1"}).json()["id_cliente"]
+    r = client.post("/movimientos/acumular", json={"id_cliente": cid, "puntos": 50, "referencia": "R-1"})
+    assert r.status_code == 201, r.text
+
+    # Recién escribió: se lee del primario aunque la réplica no tenga nada
+    r = client.get(f"/movimientos/historial/{cid}")
+    assert r.status_code == 200 and len(r.json()) == 1
+    assert client.get(f"/clientes/{cid}").status_code == 200
+    assert replica.lecturas == []
+
+    # Pasada la ventana: réplica (que aún no tiene al cliente)
+    escrituras_recientes.clear()
+    assert client.get(f"/movimientos/historial/{cid}").status_code == 404
+    assert client.get(f"/clientes/{cid}").status_code == 404
+    assert replica.lecturas
+
+    with replica() as db:
+        db.add(Cliente(id_cliente=cid, nombre="Rita", correo="rita@example.com"))
+        db.commit()
+    assert client.get(f"/movimientos/historial/{cid}").json() == []
+    r = client.get("/caja/escaneo", params={"qr_data": f"CLI:{cid}", "importe": "100"})
+    assert r.json()["puntos_disponibles"] == 0
+
+    # La validación de saldo del canje es parte de la escritura: primario
+    r = client.post("/caja/canjear-qr", json={"qr_data": f"CLI:{cid}", "importe": "100", "puntos": 10})
+    assert r.status_code == 201, r.text
+    r = client.get("/caja/escaneo", params={"qr_data": f"CLI:{cid}", "importe": "100"})
+    assert r.json()["puntos_disponibles"] == 40
+
+
+def test_token_de_app_fija_al_primario_tras_escribir(client, db, replica):
+    cli = Cliente(nombre="Tere", correo="tere@example.com")
+    db.add(cli)
+    db.commit()
+    with replica() as rdb:
+        rdb.add(Cliente(id_cliente=cli.id_cliente, nombre="Tere", correo="tere@example.com"))
+        rdb.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(build_token_claims_for_app(cli))}"}
+
+    r = client.post("/movimientos/acumular", json={"id_cliente": cli.id_cliente, "puntos": 7, "referencia": "T-1"})
+    assert r.status_code == 201, r.text
+    assert client.get("/app/resumen", headers=headers).json()["puntos_disponibles"] == 7
+
+    escrituras_recientes.clear()
+    resumen_cache.clear()
+    assert client.get("/app/resumen", headers=headers).json()["puntos_disponibles"] == 0  # réplica atrasada
@@ -0,0 +1,65 @@
+import logging
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from models import Cliente
+from utils import request_context
+from utils.request_context import RequestIdMiddleware, forma_parametros
+
+
+def test_request_id_se_propaga_o_se_genera(client):
+    r = client.get("/", headers={"X-Request-ID": "caja-07.abc"})
+    assert r.headers["x-request-id"] == "caja-07.abc"
+
+    r = client.get("/", headers={"X-Request-ID": "no valido; drop table"})
+    assert re.fullmatch(r"[0-9a-f]{32}", r.headers["x-request-id"])
+    assert client.get("/").headers["x-request-id"] != r.headers["x-request-id"]
+
+
+def test_sql_lento_con_request_id_ruta_y_forma(client, db, monkeypatch, caplog):
+    db.add(Cliente(nombre="Ana", correo="ana@example.com", telefono="5551234"))
+    db.commit()
+    monkeypatch.setattr(request_context, "SLOW_QUERY_MS", 0.0)
+
+    with caplog.at_level(logging.WARNING, logger="lealtad.sql"):
+        r = client.get("/clientes/by-correo", params={"correo": "ana@example.com"}, headers={"X-Request-ID": "req-1"})
+    assert r.status_code == 200
+
+    lentos = [m.getMessage() for m in caplog.records if m.getMessage().startswith("SQL lento")]
+    assert lentos
+    msg = lentos[-1]
+    assert "req=req-1 GET /clientes/by-correo" in msg
+    assert "FROM clientes" in msg
+    assert "ana@example.com" not in msg  # solo la forma de los parámetros
+    assert "params=(str, int" in msg or "params={" in msg
+
+
+def test_detector_n_mas_1(engine_test, monkeypatch, caplog):
+    monkeypatch.setattr(request_context, "SQL_N1_DETECT", "log")
+    mini = FastAPI()
+
+    @mini.get("/clientes/{id_cliente}/n1")
+    def n_mas_1(id_cliente: int):
+        with engine_test.connect() as conn:
+            for i in range(request_context.SQL_N1_UMBRAL):
+                conn.execute(select(Cliente.id_cliente).where(Cliente.id_cliente == id_cliente + i)).all()
+            conn.execute(select(Cliente.correo)).all()
+        return {}
+
+    mini.add_middleware(RequestIdMiddleware)
+    with caplog.at_level(logging.WARNING, logger="lealtad.sql"):
+        TestClient(mini).get("/clientes/1/n1", headers={"X-Request-ID": "n1"})
+
+    avisos = [m.getMessage() for m in caplog.records if m.getMessage().startswith("Posible N+1")]
+    assert len(avisos) == 1
+    assert f"{request_context.SQL_N1_UMBRAL} veces" in avisos[0]
+    assert "req=n1 GET /clientes/{id_cliente}/n1" in avisos[0]
+
+
+def test_forma_parametros():
+    assert forma_parametros({"id": 1, "ref": "A", "ids": [1, 2, 3]}, False) == "{id:int, ref:str, ids:list[3]}"
+    assert forma_parametros((1, None), False) == "(int, NoneType)"
+    assert forma_parametros([(1, "a"), (2, "b")], True) == "2 x (int, str)"
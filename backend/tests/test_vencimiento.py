@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from models import Cliente, MovimientoPuntos, SaldoCliente
+from services.movimientos_service import recalcular_saldos
+from services.vencimiento_service import fecha_corte, restar_meses, vencer_puntos
+
+CORTE = datetime(2025, 1, 1)
+
+
+def _cliente(db, correo, movimientos):
+    cli = Cliente(nombre=correo.split("@")[0], correo=correo)
+    db.add(cli)
+    db.flush()
+    for i, (tipo, puntos, fecha) in enumerate(movimientos):
+        db.add(MovimientoPuntos(
+            id_cliente=cli.id_cliente, tipo=tipo, puntos=puntos,
+            referencia=f"R-{i}", fecha=datetime.fromisoformat(fecha),
+        ))
+    db.commit()
+    return cli.id_cliente
+
+
+def _saldo(db, cid):
+    db.expire_all()
+    return db.get(SaldoCliente, cid)
+
+
+def test_vence_fifo_y_es_idempotente(client, db):
+    a = _cliente(db, "ana@example.com", [
+        ("acumulado", 100, "2024-01-10T10:00:00"),
+        ("acumulado", 50, "2025-09-01T10:00:00"),
+        ("canjeado", 30, "2025-10-01T10:00:00"),  # consume primero lo más viejo
+    ])
+    b = _cliente(db, "beto@example.com", [
+        ("acumulado", 20, "2024-03-01T10:00:00"),
+        ("canjeado", 25, "2025-03-01T10:00:00"),
+        ("acumulado", 40, "2025-02-01T10:00:00"),
+    ])
+    c = _cliente(db, "caro@example.com", [("acumulado", 10, "2025-06-01T10:00:00")])
+    recalcular_saldos(db)
+
+    res = vencer_puntos(db, corte=CORTE)
+    assert (res["clientes"], res["puntos"]) == (1, 70)
+    assert (_saldo(db, a).vencido, _saldo(db, a).disponible) == (70, 50)
+    assert _saldo(db, b).disponible == 35 and _saldo(db, b).vencido == 0
+    assert _saldo(db, c).vencido == 0
+
+    # Mismo corte otra vez: nada nuevo
+    assert vencer_puntos(db, corte=CORTE)["puntos"] == 0
+    # Corte posterior: vence lo que quedó de antes del nuevo corte
+    assert vencer_puntos(db, corte=datetime(2025, 12, 1))["puntos"] == 50 + 35 + 10
+
+    r = client.get(f"/movimientos/resumen/{a}").json()
+    assert (r["puntos_vencidos"], r["puntos_disponibles"]) == (120, 0)
+
+    r = client.get(f"/movimientos/historial/{a}/paginado", params={"tipo": "vencido"})
+    assert r.status_code == 200, r.text
+    assert [(x["tipo"], x["puntos"], x["referencia"]) for x in r.json()["items"]] == [
+        ("vencido", 50, "VENC-20251201"), ("vencido", 70, "VENC-20250101"),
+    ]
+
+    # El saldo materializado coincide con recalcularlo desde los movimientos
+    antes = {s.id_cliente: (s.acumulado, s.canjeado, s.vencido, s.disponible) for s in db.query(SaldoCliente)}
+    recalcular_saldos(db)
+    db.expire_all()
+    assert antes == {s.id_cliente: (s.acumulado, s.canjeado, s.vencido, s.disponible) for s in db.query(SaldoCliente)}
+
+
+def test_vencimiento_por_rangos_reanudable(db):
+    ids = [_cliente(db, f"c{i}@example.com", [("acumulado", 10 + i, "2024-05-01T10:00:00")]) for i in range(5)]
+    recalcular_saldos(db)
+
+    avances = []
+    res = vencer_puntos(db, corte=CORTE, hasta_id=ids[2], chunk=2, progreso=avances.append)
+    assert res["clientes"] == 3 and res["ultimo_id"] == ids[2]
+    assert [p["ultimo_id"] for p in avances] == [min(ids[0] - 1 + 2 * (k + 1), ids[2]) for k in range(len(avances))]
+
+    # Reanuda desde el último id confirmado
+    res = vencer_puntos(db, corte=CORTE, desde_id=res["ultimo_id"], chunk=2)
+    assert res["clientes"] == 2
+    assert all(_saldo(db, cid).disponible == 0 for cid in ids)
+
+    # dry-run no escribe
+    otro = _cliente(db, "dry@example.com", [("acumulado", 5, "2024-05-01T10:00:00")])
+    recalcular_saldos(db, [otro])
+    assert vencer_puntos(db, corte=CORTE, dry_run=True)["puntos"] == 5
+    assert _saldo(db, otro).disponible == 5
+
+
+def test_fecha_corte():
+    assert restar_meses(datetime(2026, 3, 31), 1) == datetime(2026, 2, 28)
+    assert restar_meses(datetime(2026, 1, 15), 13) == datetime(2024, 12, 15)
+    assert fecha_corte(12, datetime(2026, 10, 18, 15, 30)) == datetime(2025, 10, 18)
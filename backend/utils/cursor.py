@@ -0,0 +1,38 @@
+# utils/cursor.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from fastapi import HTTPException, status
+
+# Cursor opaco para paginación keyset: base64url(JSON) de los valores de la
+# última fila entregada. Los datetime viajan en ISO y se marcan con "$dt".
+
+
+def encode_cursor(valores: Sequence[Any]) -> str:
+    payload = [
+        {"$dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in valores
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, n: int) -> List[Any]:
+    """
+    Decodifica un cursor con `n` valores. Lanza 400 si está mal formado.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != n:
+            raise ValueError("longitud")
+        return [
+            datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) else v
+            for v in payload
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido."
+        )
@@ -0,0 +1,46 @@
+# utils/etag.py
+"""
+GET condicional (ETag / If-None-Match) para las lecturas por cliente.
+
+El ETag no requiere armar la respuesta: el historial usa la versión del
+cliente (services.movimientos_service.version_cliente), así un cliente sin
+cambios recibe 304 tras una sola búsqueda por PK, sin leer ni serializar filas.
+El resumen, que es chico y sale de la caché, usa un hash de su contenido: hay
+que armarlo para compararlo, así que su 304 solo evita consultas con la
+entrada en caché; en un miss ahorra bytes, no la lectura. Son
+ETags débiles ("mismo contenido", no mismos bytes) y van con
+Cache-Control: private, no-cache para que el teléfono revalide siempre.
+"""
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_debil(*partes) -> str:
+    return 'W/"' + "-".join(str(p) for p in partes) + '"'
+
+
+def _opaco(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de RFC 9110 §13.1.2 contra la lista de If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    buscado = _opaco(etag)
+    return any(_opaco(e) == buscado for e in if_none_match.split(","))
+
+
+def cabeceras_etag(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def no_modificado(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras_etag(etag))
@@ -0,0 +1,22 @@
+# utils/json_rapido.py
+"""
+Respuestas JSON serializadas con orjson, para lecturas grandes que ya vienen
+como dicts/listas con tipos JSON nativos (int, str, None, datetime).
+
+Devolver un Response desde el endpoint hace que FastAPI no valide ni vuelva a
+serializar con el response_model (que se deja en la ruta solo para OpenAPI).
+El formato coincide con el de Pydantic: datetime naive en ISO 8601, con
+microsegundos solo si los hay. Tipos que orjson no conoce (p. ej. Decimal)
+fallan con TypeError en lugar de salir con otro formato.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+
+class RespuestaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -2,12 +2,17 @@
 import logging
 import os
 
+from utils.request_context import RequestIdFilter
+
 def setup_logging():
     level_name = os.getenv("LOG_LEVEL", "INFO").upper()
     level = getattr(logging, level_name, logging.INFO)
 
     logging.basicConfig(
         level=level,
-        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        format="%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s",
     )
+    # request_id del request en curso ("-" fuera de un request)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter())
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)  # menos ruido
\ No newline at end of file
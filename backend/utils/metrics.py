@@ -0,0 +1,291 @@
+# utils/metrics.py
+"""
+Métricas estilo Prometheus (formato de texto 0.0.4) sin dependencias externas.
+
+- MetricsMiddleware (ASGI puro, sin BaseHTTPMiddleware): por ruta (la
+  plantilla, p. ej. /movimientos/resumen/{id_cliente}, no la URL) registra
+  latencia (histograma), conteo por status y, por request, cuántas sentencias
+  SQL hizo y cuánto tiempo pasó en la BD. Gauge de requests en curso.
+  Las respuestas text/event-stream (SSE, /app/eventos) duran horas: pasan al
+  gauge http_streams_in_flight al enviar los headers y su latencia es la del
+  handler hasta ese momento, así no inflan el in-flight ni el p99.
+- instrumentar_sql(engine, nombre): before/after_cursor_execute. Suma al
+  request en curso (contextvar: llega también a los hilos del threadpool y a
+  run_sync) y a los totales por engine. El mismo hook alimenta el log de SQL
+  lento y el detector de N+1 (utils.request_context).
+
+Costo: dos perf_counter por sentencia y por request, y un lock con secciones
+de pocas instrucciones; se puede dejar activo en producción. Las URLs que no
+corresponden a una ruta se agrupan en route="sin_ruta" para acotar las series.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from utils.request_context import observar_sentencia
+
+# Límites (seg) de los histogramas de latencia
+LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SENTENCIAS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+SIN_RUTA = "sin_ruta"
+
+
+class Histograma:
+    __slots__ = ("limites", "cuentas", "suma", "total")
+
+    def __init__(self, limites: Sequence[float]):
+        self.limites = tuple(limites)
+        self.cuentas = [0] * (len(self.limites) + 1)  # último = +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class ConsultasRequest:
+    """Sentencias SQL y tiempo en BD del request en curso."""
+    __slots__ = ("sentencias", "segundos")
+
+    def __init__(self):
+        self.sentencias = 0
+        self.segundos = 0.0
+
+
+_consultas_actual: ContextVar[Optional[ConsultasRequest]] = ContextVar("consultas_request", default=None)
+
+
+def consultas_actuales() -> Optional[ConsultasRequest]:
+    return _consultas_actual.get()
+
+
+def _etiquetas(pares: Sequence[Tuple[str, str]]) -> str:
+    partes = []
+    for k, v in pares:
+        v = str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _histograma_texto(nombre: str, base: Sequence[Tuple[str, str]], h: Histograma, salida: List[str]) -> None:
+    acumulado = 0
+    for le, n in zip(h.limites, h.cuentas):
+        acumulado += n
+        salida.append(f"{nombre}_bucket{_etiquetas([*base, ('le', _fmt(le))])} {acumulado}")
+    salida.append(f"{nombre}_bucket{_etiquetas([*base, ('le', '+Inf')])} {h.total}")
+    salida.append(f"{nombre}_sum{_etiquetas(base)} {_fmt(h.suma)}")
+    salida.append(f"{nombre}_count{_etiquetas(base)} {h.total}")
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        self._duracion: Dict[Tuple[str, str], Histograma] = {}
+        self._status: Dict[Tuple[str, str, str], int] = {}
+        self._sql_sentencias: Dict[Tuple[str, str], Histograma] = {}
+        self._sql_segundos: Dict[Tuple[str, str], Histograma] = {}
+        self._engines: Dict[str, Histograma] = {}
+        self.en_curso = 0
+        self.streams = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            en_curso, streams = self.en_curso, self.streams
+            self._reiniciar()
+            # los requests y streams en curso siguen descontándose
+            self.en_curso, self.streams = en_curso, streams
+
+    # ---- registro ----
+    def entrar(self) -> None:
+        with self._lock:
+            self.en_curso += 1
+
+    def iniciar_stream(self) -> None:
+        """El request envió headers de un stream SSE: pasa de en_curso a streams."""
+        with self._lock:
+            self.en_curso -= 1
+            self.streams += 1
+
+    def registrar_request(
+        self,
+        metodo: str,
+        ruta: str,
+        status: int,
+        segundos: float,
+        consultas: ConsultasRequest,
+        stream: bool = False,
+    ) -> None:
+        clave = (metodo, ruta)
+        with self._lock:
+            if stream:
+                self.streams -= 1
+            else:
+                self.en_curso -= 1
+            h = self._duracion.get(clave)
+            if h is None:
+                h = self._duracion[clave] = Histograma(LATENCIA_BUCKETS)
+                self._sql_sentencias[clave] = Histograma(SENTENCIAS_BUCKETS)
+                self._sql_segundos[clave] = Histograma(LATENCIA_BUCKETS)
+            h.observar(segundos)
+            self._sql_sentencias[clave].observar(consultas.sentencias)
+            self._sql_segundos[clave].observar(consultas.segundos)
+            k = (metodo, ruta, str(status))
+            self._status[k] = self._status.get(k, 0) + 1
+
+    def registrar_sql(self, engine: str, segundos: float) -> None:
+        with self._lock:
+            h = self._engines.get(engine)
+            if h is None:
+                h = self._engines[engine] = Histograma(SQL_BUCKETS)
+            h.observar(segundos)
+
+    # ---- exposición ----
+    def exportar(self) -> str:
+        s: List[str] = []
+        with self._lock:
+            s.append("# HELP http_requests_in_flight Requests HTTP en curso.")
+            s.append("# TYPE http_requests_in_flight gauge")
+            s.append(f"http_requests_in_flight {self.en_curso}")
+            s.append("# HELP http_streams_in_flight Conexiones text/event-stream (SSE) abiertas.")
+            s.append("# TYPE http_streams_in_flight gauge")
+            s.append(f"http_streams_in_flight {self.streams}")
+
+            s.append("# HELP http_requests_total Requests HTTP por ruta y status.")
+            s.append("# TYPE http_requests_total counter")
+            for (m, r, st), n in sorted(self._status.items()):
+                s.append(f"http_requests_total{_etiquetas([('method', m), ('route', r), ('status', st)])} {n}")
+
+            for nombre, ayuda, datos in (
+                ("http_request_duration_seconds", "Latencia de los requests HTTP.", self._duracion),
+                ("http_request_db_statements", "Sentencias SQL por request.", self._sql_sentencias),
+                ("http_request_db_seconds", "Tiempo en la BD por request.", self._sql_segundos),
+            ):
+                s.append(f"# HELP {nombre} {ayuda}")
+                s.append(f"# TYPE {nombre} histogram")
+                for (m, r), h in sorted(datos.items()):
+                    _histograma_texto(nombre, [("method", m), ("route", r)], h, s)
+
+            s.append("# HELP db_statement_duration_seconds Duración de cada sentencia SQL por engine.")
+            s.append("# TYPE db_statement_duration_seconds histogram")
+            for eng, h in sorted(self._engines.items()):
+                _histograma_texto("db_statement_duration_seconds", [("engine", eng)], h, s)
+
+        self._pools_texto(s)
+        return "\n".join(s) + "\n"
+
+    @staticmethod
+    def _pools_texto(s: List[str]) -> None:
+        from db.pool import pool_stats  # db importa este módulo al crear los engines
+
+        pools = pool_stats()
+        for campo, nombre, tipo, ayuda in (
+            ("checked_out", "db_pool_checked_out", "gauge", "Conexiones prestadas."),
+            ("overflow", "db_pool_overflow", "gauge", "Conexiones de overflow abiertas."),
+            ("timeouts", "db_pool_timeouts_total", "counter", "Timeouts esperando una conexión."),
+            ("wait_total_ms", "db_pool_wait_ms_total", "counter", "Espera acumulada al sacar conexión (ms)."),
+        ):
+            s.append(f"# HELP {nombre} {ayuda}")
+            s.append(f"# TYPE {nombre} {tipo}")
+            for p in pools:
+                if campo in p:
+                    s.append(f"{nombre}{_etiquetas([('pool', p['nombre'])])} {_fmt(p[campo])}")
+
+
+metricas = Metricas()
+
+
+# -----------------------------
+# SQL
+# -----------------------------
+def instrumentar_sql(engine, nombre: str) -> None:
+    """Engancha los tiempos por sentencia a `engine` (sync o el sync_engine de uno async)."""
+    if getattr(engine, "_metricas_sql", None):
+        return
+    engine._metricas_sql = nombre
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_t_sql", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get("_t_sql")
+        if not pila:
+            return
+        segundos = time.perf_counter() - pila.pop()
+        c = _consultas_actual.get()
+        if c is not None:
+            c.sentencias += 1
+            c.segundos += segundos
+        metricas.registrar_sql(nombre, segundos)
+        observar_sentencia(statement, parameters, executemany, segundos)  # SQL lento / N+1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        conn = ctx.connection
+        if conn is not None and conn.info.get("_t_sql"):
+            conn.info["_t_sql"].pop()
+
+
+# -----------------------------
+# Middleware
+# -----------------------------
+def _ruta(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or SIN_RUTA
+
+
+def _es_stream(headers) -> bool:
+    return any(
+        k.lower() == b"content-type" and v.lower().startswith(b"text/event-stream")
+        for k, v in headers
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = [500]  # si la app revienta sin responder, cuenta como 500
+        t_stream: List[float] = []
+
+        async def _send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+                if _es_stream(mensaje.get("headers", ())):
+                    t_stream.append(time.perf_counter())
+                    metricas.iniciar_stream()
+            await send(mensaje)
+
+        consultas = ConsultasRequest()
+        token = _consultas_actual.set(consultas)
+        metricas.entrar()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            fin = t_stream[0] if t_stream else time.perf_counter()
+            metricas.registrar_request(
+                scope["method"], _ruta(scope), estado[0], fin - t0, consultas, stream=bool(t_stream)
+            )
+            _consultas_actual.reset(token)
@@ -0,0 +1,168 @@
+# utils/request_context.py
+"""
+Request ID, log de SQL lento y detector de N+1.
+
+- RequestIdMiddleware (ASGI puro): toma X-Request-ID del request (si es
+  válido) o genera uno, lo deja en un contextvar durante el request y lo
+  devuelve en la respuesta. RequestIdFilter lo agrega a cada línea de log.
+- observar_sentencia() la llama el hook after_cursor_execute de
+  utils.metrics.instrumentar_sql. Toda sentencia que tarde SLOW_QUERY_MS o más
+  se loguea (logger lealtad.sql) con request ID, método, ruta y la forma de los
+  parámetros (tipos y cantidad, nunca los valores: hay correos y teléfonos).
+- SQL_N1_DETECT=log|error (desarrollo / pruebas): cuenta las sentencias
+  idénticas (mismo texto SQL, cualquier parámetro) de cada request; al
+  terminar, las que se repitieron SQL_N1_UMBRAL veces o más se reportan como
+  posible N+1. En modo "error" además quedan en `hallazgos_n_mas_1`, que la
+  suite de pruebas revisa después de cada test. Con "off" (default) no se
+  cuenta nada.
+"""
+import logging
+import os
+import re
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SQL_N1_DETECT = os.getenv("SQL_N1_DETECT", "off").strip().lower()  # off | log | error
+SQL_N1_UMBRAL = int(os.getenv("SQL_N1_UMBRAL", "5"))
+
+_HEADER = b"x-request-id"
+_ID_VALIDO = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+_SQL_MAX_LOG = 1000  # caracteres de SQL en el log
+
+logger = logging.getLogger("lealtad.sql")
+
+hallazgos_n_mas_1: List[Dict[str, Any]] = []
+
+
+class ContextoRequest:
+    __slots__ = ("request_id", "scope", "sentencias")
+
+    def __init__(self, request_id: str, scope):
+        self.request_id = request_id
+        self.scope = scope
+        self.sentencias: Optional[Counter] = Counter() if SQL_N1_DETECT in ("log", "error") else None
+
+    @property
+    def metodo(self) -> str:
+        return self.scope.get("method", "-")
+
+    @property
+    def ruta(self) -> str:
+        # Plantilla de la ruta una vez que el router la resolvió; antes, el path
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "-")
+
+
+_contexto: ContextVar[Optional[ContextoRequest]] = ContextVar("contexto_request", default=None)
+
+
+def request_id_actual() -> Optional[str]:
+    ctx = _contexto.get()
+    return ctx.request_id if ctx is not None else None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_actual() or "-"
+        return True
+
+
+def _request_id_de(scope) -> str:
+    for k, v in scope.get("headers", ()):
+        if k == _HEADER:
+            valor = v.decode("latin-1").strip()
+            if _ID_VALIDO.fullmatch(valor):
+                return valor
+            break
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = ContextoRequest(_request_id_de(scope), scope)
+
+        async def _send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje = {
+                    **mensaje,
+                    "headers": [*mensaje.get("headers", ()), (_HEADER, ctx.request_id.encode("latin-1"))],
+                }
+            await send(mensaje)
+
+        token = _contexto.set(ctx)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            revisar_repeticiones(ctx)
+            _contexto.reset(token)
+
+
+# -----------------------------
+# SQL
+# -----------------------------
+def _forma(valor: Any) -> str:
+    if isinstance(valor, (list, tuple)):
+        return f"{type(valor).__name__}[{len(valor)}]"
+    return type(valor).__name__
+
+
+def forma_parametros(parameters: Any, executemany: bool) -> str:
+    """Tipos de los parámetros (sin valores): "{id_cliente:int, ref:str}", "(int, str)"."""
+    if executemany:
+        filas = list(parameters or ())
+        return f"{len(filas)} x {forma_parametros(filas[0], False)}" if filas else "0 filas"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}:{_forma(v)}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(_forma(v) for v in parameters) + ")"
+    return _forma(parameters)
+
+
+def _sql_corto(statement: str) -> str:
+    s = " ".join(statement.split())
+    return s if len(s) <= _SQL_MAX_LOG else s[:_SQL_MAX_LOG] + "..."
+
+
+def observar_sentencia(statement: str, parameters: Any, executemany: bool, segundos: float) -> None:
+    ctx = _contexto.get()
+    if ctx is not None and ctx.sentencias is not None:
+        ctx.sentencias[statement] += 1
+    if segundos * 1000.0 >= SLOW_QUERY_MS:
+        logger.warning(
+            "SQL lento %.1f ms req=%s %s %s | %s | params=%s",
+            segundos * 1000.0,
+            ctx.request_id if ctx else "-",
+            ctx.metodo if ctx else "-",
+            ctx.ruta if ctx else "-",
+            _sql_corto(statement),
+            forma_parametros(parameters, executemany),
+        )
+
+
+def revisar_repeticiones(ctx: ContextoRequest) -> List[Dict[str, Any]]:
+    """Sentencias repetidas SQL_N1_UMBRAL veces o más en el request (posible N+1)."""
+    if not ctx.sentencias:
+        return []
+    hallazgos = [
+        {"request_id": ctx.request_id, "metodo": ctx.metodo, "ruta": ctx.ruta, "veces": n, "sql": _sql_corto(s)}
+        for s, n in ctx.sentencias.items()
+        if n >= SQL_N1_UMBRAL
+    ]
+    for h in hallazgos:
+        logger.warning(
+            "Posible N+1: %d veces la misma sentencia req=%s %s %s | %s",
+            h["veces"], h["request_id"], h["metodo"], h["ruta"], h["sql"],
+        )
+    if SQL_N1_DETECT == "error":
+        hallazgos_n_mas_1.extend(hallazgos)
+    return hallazgos
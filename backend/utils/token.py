@@ -1,7 +1,11 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
+import hashlib
 import os
+import threading
+import time
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -17,10 +21,64 @@ SECRET_KEY = os.getenv("SECRET_KEY", "clave_super_secreta_para_jwt")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# Caché de tokens ya verificados (0 = desactivada)
+TOKEN_CACHE_MAX = int(os.getenv("TOKEN_CACHE_MAX", "10000"))
+# 1 = en tokens de app con id_cliente, confirmar igualmente contra la BD que el cliente existe
+APP_TOKEN_REVALIDATE = os.getenv("APP_TOKEN_REVALIDATE", "0").strip().lower() in ("1", "true", "yes")
+
 # Usa ruta absoluta para evitar 422 con OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 
+# =========================
+# Caché de tokens verificados
+# =========================
+class _VerifiedTokenCache:
+    """
+    LRU de claims ya verificados, indexado por SHA-256 del token (no se guarda
+    el token en claro). Cada entrada vence en el `exp` del propio token.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._data: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            exp, payload = item
+            if exp <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        exp = payload.get("exp")
+        if self.max_items <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._data[self._key(token)] = (float(exp), dict(payload))
+            self._data.move_to_end(self._key(token))
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_token_cache = _VerifiedTokenCache(TOKEN_CACHE_MAX)
+
+
 # =========================
 # Core JWT
 # =========================
@@ -39,11 +97,31 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Devuelve los claims o None si el token no es válido.
+    Los tokens ya verificados se sirven de la caché hasta su `exp`.
     """
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
+    _token_cache.put(token, payload)
+    return payload
+
+
+def build_token_claims_for_app(cliente: Cliente) -> Dict[str, Any]:
+    """
+    Claims del token de la app móvil. Incluye id_cliente para que los endpoints
+    autenticados no tengan que buscar al cliente por correo en cada request.
+    """
+    return {
+        "sub": cliente.correo,
+        "email": cliente.correo,
+        "id_cliente": cliente.id_cliente,
+        "origin": "app",
+        "name": cliente.nombre,
+    }
 
 
 # =========================
@@ -76,28 +154,54 @@ def get_current_caja_claims(payload: Dict[str, Any] = Depends(get_token_payload)
     return payload
 
 
+def _require_app_origin(payload: Dict[str, Any]) -> None:
+    if payload.get("origin") != "app":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Se requiere token de app (cliente).",
+        )
+
+
+def get_current_cliente_id(
+    payload: Dict[str, Any] = Depends(get_token_payload),
+    db: Session = Depends(get_db),
+) -> int:
+    """
+    Identidad del cliente (id_cliente) sin ir a la BD: sale del claim del token.
+    - Con APP_TOKEN_REVALIDATE=1 se confirma además que el cliente sigue existiendo.
+    - Tokens viejos sin id_cliente: se resuelve por correo (como antes).
+    La sesión no toma conexión del pool si no se consulta.
+    """
+    _require_app_origin(payload)
+    cid = payload.get("id_cliente")
+    if isinstance(cid, int) and not APP_TOKEN_REVALIDATE:
+        return cid
+    return get_current_cliente(payload=payload, db=db).id_cliente
+
+
 def get_current_cliente(
     payload: Dict[str, Any] = Depends(get_token_payload),
     db: Session = Depends(get_db),
 ) -> Cliente:
     """
     Valida que el token sea de origen 'app' y devuelve el Cliente.
-    - Busca el e-mail en 'email' o en 'sub' (compatibilidad).
+    - Con claim id_cliente: búsqueda por PK.
+    - Si no, busca el e-mail en 'email' o en 'sub' (compatibilidad).
     """
-    if payload.get("origin") != "app":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Se requiere token de app (cliente).",
-        )
+    _require_app_origin(payload)
 
+    cid = payload.get("id_cliente")
     email = payload.get("email") or payload.get("sub")
-    if not email:
+    if not isinstance(cid, int) and not email:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token sin identidad de cliente.",
         )
 
-    cliente = db.query(Cliente).filter(Cliente.correo == email).first()
+    if isinstance(cid, int):
+        cliente = db.get(Cliente, cid)
+    else:
+        cliente = db.query(Cliente).filter(Cliente.correo == email).first()
     if cliente is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
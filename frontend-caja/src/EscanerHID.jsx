@@ -1,6 +1,6 @@
 // src/EscanerHID.jsx
 import React, { useEffect, useRef, useState, useMemo } from "react";
-import api from "./api";
+import api, { postIdempotente } from "./api";
 
 // Normaliza (“CLIÑ123” -> “CLI:123”) y limpia CR/LF
 function normalizeQR(raw) {
@@ -166,7 +166,8 @@ export default function EscanerHID() {
         descripcion: descripcion || null,
         referencia: referencia.trim(),
       };
-      const { data } = await api.post("/caja/acumular-qr", payload);
+      // Clave nueva por intento; solo los reintentos por falla de red la repiten
+      const { data } = await postIdempotente("/caja/acumular-qr", payload);
       setUltimoMovimiento(data);
       setStatus({ type: "ok", msg: `Puntos acumulados correctamente. (+${data.puntos})` });
       setDescripcion("");
@@ -221,7 +222,7 @@ export default function EscanerHID() {
         descripcion: descripcion || null,
         referencia: referencia.trim(),
       };
-      const { data } = await api.post("/caja/canjear-qr", payload);
+      const { data } = await postIdempotente("/caja/canjear-qr", payload);
       setUltimoMovimiento(data);
       setStatus({ type: "ok", msg: `Canje realizado correctamente. (-${data.puntos} pts)` });
       setDescripcion("");
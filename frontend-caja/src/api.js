@@ -47,6 +47,36 @@ api.interceptors.response.use(
 
 export default api;
 
+/** Clave aleatoria por intento de operación (UUID v4; la caja puede no estar en HTTPS). */
+function nuevaClaveIdempotencia() {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+  const b = window.crypto.getRandomValues(new Uint8Array(16));
+  b[6] = (b[6] & 0x0f) | 0x40;
+  b[8] = (b[8] & 0x3f) | 0x80;
+  const h = Array.from(b, (x) => x.toString(16).padStart(2, "0")).join("");
+  return `${h.slice(0, 8)}-${h.slice(8, 12)}-${h.slice(12, 16)}-${h.slice(16, 20)}-${h.slice(20)}`;
+}
+
+/**
+ * POST con Idempotency-Key. Cada llamada (cada clic del cajero) usa una clave
+ * nueva; solo los reintentos automáticos por falla de red (sin respuesta del
+ * servidor) la reutilizan, y el backend repite la respuesta si la original sí
+ * llegó a procesarse.
+ */
+export async function postIdempotente(url, payload, { reintentos = 2, esperaMs = 800 } = {}) {
+  const headers = { "Idempotency-Key": nuevaClaveIdempotencia() };
+  for (let intento = 0; ; intento++) {
+    try {
+      return await api.post(url, payload, { headers });
+    } catch (err) {
+      const sinRespuesta = !err?.response;
+      const enProceso = err?.response?.status === 409 && /en proceso/i.test(err?.response?.data?.detail || "");
+      if ((!sinRespuesta && !enProceso) || intento >= reintentos) throw err;
+      await new Promise((r) => setTimeout(r, esperaMs * (intento + 1)));
+    }
+  }
+}
+
 /** Helper de login (usa la instancia pública) */
 export async function loginCaja(username, password) {
   try {